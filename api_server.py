@@ -0,0 +1,313 @@
+import os
+import gzip
+import json
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from data_loader import load_snapshot, resolve_source, to_display
+from history_store import DATASETS
+from screener import INDUSTRY_LEVELS, NUMERIC_COLUMNS, Screener
+from symbol_master import normalize_code
+
+# ====================== 只读数据接口（最新快照） ======================
+# 供其他内部工具读取股息率数据，不必拷贝整份CSV或抓取Streamlit页面：
+# - GET /v1/<数据集>/top?k=20&min_cap=1000            股息率前k名（可限定市值下限）
+# - GET /v1/<数据集>/screen?yield_min=4&pe_max=15&industry=银行&level=1&min_cap=500&sort=yield&k=50
+# - GET /v1/<数据集>/stocks/600036、/v1/<数据集>/stocks?codes=600036,601398   按代码查询
+# - GET /v1/health                                      各数据集的版本与行数
+# 每份快照加载时把每一行预先序列化为JSON字节，响应只是按行号拼接；完整响应体（含gzip压缩版本）
+# 按查询参数缓存在该快照自己的LRU里，新快照替换后旧缓存随旧快照一起丢弃
+# 支持 ETag/If-None-Match（304）和 gzip；后台线程发现快照文件变化时重新加载，加载完成后原子替换
+API_HOST = "127.0.0.1"
+API_PORT = 8600
+RELOAD_INTERVAL = 5      # 检查快照文件变化的间隔（秒）
+DEFAULT_K = 20
+MAX_K = 500
+CACHE_ENTRIES = 1024     # 每份快照缓存的响应数
+GZIP_MIN_BYTES = 1024    # 小于该大小的响应不压缩
+# 查询参数里的短列名 -> 快照列名
+SORT_ALIASES = {"yield": "股息率(%)", "cap": "总市值(亿)", "price": "最新价", "pe": "市盈率ttm", "pb": "市净率"}
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class Response:
+    """一个预先序列化好的响应：原始字节、gzip字节（较大时）、ETag"""
+    __slots__ = ("body", "gzipped", "etag")
+
+    def __init__(self, body, version_tag):
+        self.body = body
+        self.gzipped = gzip.compress(body, compresslevel=6) if len(body) >= GZIP_MIN_BYTES else None
+        self.etag = f'"{version_tag}-{zlib.crc32(body):08x}"'
+
+class Snapshot:
+    """
+    一个数据集某个版本的快照：选股引擎 + 每行的JSON字节 + 代码 -> 行号 + 响应LRU
+    加载完成后只读，多个请求线程共享；LRU 的读写用锁保护
+    """
+
+    def __init__(self, dataset, version):
+        self.dataset = dataset
+        self.version = version
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        self.tag = f"{zlib.crc32(repr(version).encode()):08x}"
+        compact = load_snapshot(dataset)
+        self.screener = Screener(compact)
+        display = to_display(compact.reset_index(drop=True))
+        # 与 Screener 内部行号一致：同样从 reset_index 后的紧凑表还原
+        lines = display.to_json(orient="records", lines=True, force_ascii=False).splitlines()
+        self.rows = [line.encode("utf-8") for line in lines]
+        codes = display["代码"].to_numpy()
+        # 同一代码出现多次时保留第一行（快照已按股息率降序，第一行即最新的有效行）
+        self.row_of = {code: i for i, code in reversed(list(enumerate(codes)))}
+        self.header = json.dumps({"dataset": dataset, "loaded_at": self.loaded_at}, ensure_ascii=False,
+                                 separators=(",", ":"))[:-1].encode("utf-8")
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def render(self, rows):
+        """行号 -> {"dataset", "loaded_at", "count", "items": [...]} 的字节，items 直接拼接预序列化的行"""
+        items = b",".join(self.rows[i] for i in rows)
+        return self.header + b',"count":%d,"items":[' % len(rows) + items + b"]}"
+
+    def cached(self, key, build):
+        """按规范化的查询参数缓存完整响应"""
+        with self._lock:
+            response = self._cache.get(key)
+            if response is not None:
+                self._cache.move_to_end(key)
+                return response
+        response = Response(build(), self.tag)
+        with self._lock:
+            self._cache[key] = response
+            if len(self._cache) > CACHE_ENTRIES:
+                self._cache.popitem(last=False)
+        return response
+
+    def stats(self):
+        return {"version": {"source": self.version[0], "mtime_ns": self.version[1], "size": self.version[2]},
+                "rows": len(self), "loaded_at": self.loaded_at, "cached_responses": len(self._cache)}
+
+# ====================== 查询参数 ======================
+def _one(query, name, cast=str, default=None):
+    values = query.get(name)
+    if not values or values[-1] == "":
+        return default
+    try:
+        return cast(values[-1])
+    except ValueError:
+        raise ApiError(400, f"参数 {name} 无法解析：{values[-1]}")
+
+def _k(query):
+    return min(max(_one(query, "k", int, DEFAULT_K), 1), MAX_K)
+
+def _sort(query):
+    sort = _one(query, "sort", default="yield")
+    column = SORT_ALIASES.get(sort, sort)
+    if column not in NUMERIC_COLUMNS:
+        raise ApiError(400, f"不支持的排序列：{sort}（可选 {', '.join(SORT_ALIASES)}）")
+    return column
+
+def _list(query, name):
+    """逗号分隔或重复出现的参数"""
+    return [item for value in query.get(name, []) for item in value.split(",") if item]
+
+def screen_params(query):
+    """选股参数 -> (规范化的缓存键, Screener.query 的关键字参数)"""
+    level = _one(query, "level", int, 3)
+    if level not in INDUSTRY_LEVELS:
+        raise ApiError(400, f"行业层级只能是 {list(INDUSTRY_LEVELS)}")
+    pe_max, pb_max = _one(query, "pe_max", float), _one(query, "pb_max", float)
+    ranges = {
+        "股息率(%)": (_one(query, "yield_min", float), _one(query, "yield_max", float)),
+        # 估值上限自动排除负值（亏损股）
+        "市盈率ttm": (0 if pe_max is not None else None, pe_max),
+        "市净率": (0 if pb_max is not None else None, pb_max),
+    }
+    params = {
+        "ranges": ranges,
+        "industries": sorted(_list(query, "industry")) or None,
+        "level": level,
+        "min_cap": _one(query, "min_cap", float),
+        "max_cap": _one(query, "max_cap", float),
+        "sort_by": _sort(query),
+        "ascending": _one(query, "asc", str, "0") in ("1", "true"),
+        "k": _k(query),
+    }
+    key = ("screen", tuple(ranges.items()), tuple(params["industries"] or ()), level, params["min_cap"],
+           params["max_cap"], params["sort_by"], params["ascending"], params["k"])
+    return key, params
+
+# ====================== 路由 ======================
+def _screen(snapshot, query):
+    key, params = screen_params(query)
+    if params["industries"] and params["level"] not in snapshot.screener.industry_index:
+        raise ApiError(400, f"数据集 {snapshot.dataset} 没有申万{params['level']}级行业列，不支持 industry 参数")
+    return snapshot.cached(key, lambda: snapshot.render(snapshot.screener.query(**params)))
+
+def _top(snapshot, query):
+    k, min_cap = _k(query), _one(query, "min_cap", float)
+    return snapshot.cached(("top", k, min_cap),
+                           lambda: snapshot.render(snapshot.screener.query(min_cap=min_cap, k=k)))
+
+def _stocks(snapshot, codes):
+    codes = tuple(dict.fromkeys(normalize_code(code) for code in codes if normalize_code(code)))
+    if not codes:
+        raise ApiError(400, "缺少股票代码")
+    rows = [snapshot.row_of[code] for code in codes if code in snapshot.row_of]
+    if len(codes) == 1 and not rows:
+        raise ApiError(404, f"快照中没有 {codes[0]}")
+    return snapshot.cached(("stocks", codes), lambda: snapshot.render(rows))
+
+def route(store, path, query):
+    """路径 -> Response；参数错误、找不到数据集/代码时抛出 ApiError"""
+    parts = [part for part in path.split("/") if part]
+    if parts == ["v1", "health"]:
+        body = json.dumps({name: snapshot.stats() for name, snapshot in store.snapshots.items()}, ensure_ascii=False)
+        return Response(body.encode("utf-8"), "health")
+    if len(parts) < 3 or parts[0] != "v1":
+        raise ApiError(404, "未知路径")
+    snapshot = store.snapshots.get(parts[1])
+    if snapshot is None:
+        raise ApiError(404 if parts[1] not in DATASETS else 503, f"数据集 {parts[1]} 不存在或尚未加载")
+    if parts[2:] == ["top"]:
+        return _top(snapshot, query)
+    if parts[2:] == ["screen"]:
+        return _screen(snapshot, query)
+    if parts[2] == "stocks" and len(parts) <= 4:
+        return _stocks(snapshot, parts[3:] or _list(query, "codes"))
+    raise ApiError(404, "未知路径")
+
+# ====================== 快照加载与后台刷新 ======================
+def _file_version(dataset):
+    """与看板相同的版本定义：(数据源路径, 修改时间, 大小)"""
+    source = resolve_source(dataset)
+    try:
+        stat = os.stat(source)
+        return (source, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+
+class SnapshotStore:
+    """各数据集的当前快照；reload 只在文件版本变化时重新加载，构建完成后整体替换字典里的引用"""
+
+    def __init__(self, datasets=tuple(DATASETS)):
+        self.datasets = list(datasets)
+        self.snapshots = {}
+
+    def reload(self):
+        changed = []
+        for dataset in self.datasets:
+            version = _file_version(dataset)
+            current = self.snapshots.get(dataset)
+            if version is None or (current is not None and current.version == version):
+                continue
+            try:
+                start = time.perf_counter()
+                snapshot = Snapshot(dataset, version)
+                # 预热默认查询，新快照替换后第一批请求直接命中缓存
+                _top(snapshot, {})
+                self.snapshots = {**self.snapshots, dataset: snapshot}
+                changed.append(dataset)
+                print(f"📦 已加载 {dataset} 快照 {version[0]}：{len(snapshot)} 行（{(time.perf_counter() - start) * 1000:.0f}ms）")
+            except Exception as e:
+                print(f"⚠️ 加载 {dataset} 快照失败，继续使用旧版本：{e}")
+        return changed
+
+    def watch(self, interval=RELOAD_INTERVAL, stop=None):
+        """后台线程：定期检查快照文件版本"""
+        stop = stop or threading.Event()
+
+        def loop():
+            while not stop.wait(interval):
+                self.reload()
+
+        thread = threading.Thread(target=loop, name="snapshot-reload", daemon=True)
+        thread.start()
+        return stop
+
+# ====================== HTTP 服务 ======================
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive，客户端复用连接
+    # 响应头和响应体分两次写出，开启 TCP_NODELAY，避免 keep-alive 连接上每个请求被 Nagle + 延迟确认拖慢约40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        body = json.dumps({"error": message}, ensure_ascii=False).encode("utf-8")
+        self._send(status, body, {"Content-Type": "application/json; charset=utf-8"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        try:
+            response = route(self.server.store, url.path, parse_qs(url.query))
+        except ApiError as e:
+            return self._send_error(e.status, str(e))
+        except Exception as e:
+            # 其他异常也要回一个响应，否则 keep-alive 连接被直接断开，客户端只看到连接错误
+            print(f"⚠️ 处理请求 {self.path} 失败：{e!r}")
+            return self._send_error(500, "服务端内部错误")
+        headers = {"ETag": response.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if response.etag in self.headers.get("If-None-Match", ""):
+            return self._send(304, headers=headers)
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        if response.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            headers["Content-Encoding"] = "gzip"
+            return self._send(200, response.gzipped, headers)
+        return self._send(200, response.body, headers)
+
+    do_HEAD = do_GET
+
+def make_server(host=API_HOST, port=API_PORT, datasets=tuple(DATASETS)):
+    store = SnapshotStore(datasets)
+    store.reload()
+    server = ThreadingHTTPServer((host, port), ApiHandler)
+    server.daemon_threads = True
+    server.store = store
+    return server
+
+def serve(host=API_HOST, port=API_PORT, datasets=tuple(DATASETS), reload_interval=RELOAD_INTERVAL, ready=None):
+    """启动服务并在后台监视快照文件；ready 为 multiprocessing 队列时回传实际端口（供压测脚本使用）"""
+    server = make_server(host, port, datasets)
+    stop = server.store.watch(reload_interval)
+    if ready is not None:
+        ready.put(server.server_port)
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="股息率快照只读HTTP接口")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--dataset", choices=list(DATASETS), nargs="*", default=list(DATASETS))
+    parser.add_argument("--reload-interval", type=float, default=RELOAD_INTERVAL, help="检查快照文件变化的间隔（秒）")
+    args = parser.parse_args()
+    print(f"🌐 数据接口：http://{args.host}:{args.port}/v1/health")
+    try:
+        serve(args.host, args.port, args.dataset, args.reload_interval)
+    except KeyboardInterrupt:
+        pass
@@ -1,52 +1,58 @@
 import streamlit as st
 import pandas as pd
-import json
+import numpy as np
 import os
+import json
 from datetime import datetime
+from symbol_master import get_symbol_master, normalize_code
+from watchlist_store import DEFAULT_LIST, DEFAULT_OWNER, get_store
+from history_store import read_partition
+from data_loader import (compact_frame, decode_codes, drop_unknown_codes, encode_codes, read_source, resolve_source,
+                         to_display)
+from stability import METRIC_COLUMNS as STABILITY_COLUMNS, state_file as stability_state_file
+from screener import INDUSTRY_LEVELS, NUMERIC_COLUMNS as SCREEN_COLUMNS, Screener
+from portfolio import Portfolio, load_holdings, monte_carlo, percentiles, project, save_holdings
+from change_feed import feed_file as change_feed_file
+from industry_rollup import PERCENTILE_COLUMNS, members_file as industry_members_file, rollup_file as industry_rollup_file
 
 # ====================== 自选股持久化核心函数 ======================
-SELF_SELECTED_FILE = "self_selected_stocks.json"
 DEFAULT_WATCHLIST = ["600036", "601398", "000001", "601939"]
 
-def load_watchlist_from_file():
-    """从本地文件加载自选股列表"""
+def current_owner():
+    """当前用户：URL 参数 ?user=xxx，不带参数时为默认用户；不同用户的清单互不影响"""
+    return st.query_params.get("user", DEFAULT_OWNER)
+
+def load_watchlist(list_name=DEFAULT_LIST):
+    """
+    从自选股库把指定清单载入会话：watchlist 为显示的列表（清单为空时使用默认列表），
+    watchlist_base 为载入时库中的实际内容，保存时据此计算本会话的增删
+    """
+    owner = current_owner()
     try:
-        if os.path.exists(SELF_SELECTED_FILE):
-            with open(SELF_SELECTED_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            # 提取代码列表 + 补全6位 + 去重
-            watchlist = [item["code"].zfill(6) for item in data if "code" in item]
-            watchlist = list(dict.fromkeys(watchlist))  # 保持顺序去重
-            return watchlist if watchlist else DEFAULT_WATCHLIST
-        else:
-            return DEFAULT_WATCHLIST
+        stored = get_store().codes(list_name, owner)
     except Exception as e:
         st.warning(f"加载自选股失败，使用默认列表：{e}")
-        return DEFAULT_WATCHLIST
+        stored = []
+    st.session_state["watchlist_base"] = stored
+    st.session_state["watchlist"] = stored or DEFAULT_WATCHLIST
+    st.session_state["watchlist_loaded"] = (owner, list_name)
 
-def save_watchlist_to_file(watchlist):
-    """将自选股列表保存到本地文件"""
+def save_watchlist(watchlist, list_name=DEFAULT_LIST):
+    """
+    保存清单：只提交本会话相对载入时的增删（一个事务），其他会话同时加入/移除的股票不会被覆盖
+    返回保存后库中的清单（含其他会话的修改），失败时返回 None
+    """
+    base = st.session_state.get("watchlist_base", [])
+    added = [code for code in watchlist if code not in base]
+    removed = [code for code in base if code not in watchlist]
     try:
-        # 补全6位代码 + 匹配名称
-        df = pd.read_csv("data/dividend_data.csv", dtype={'代码': str}) if os.path.exists("data/dividend_data.csv") else pd.DataFrame()
-        watchlist_data = []
-        for code in watchlist:
-            code = code.strip().zfill(6)
-            # 匹配名称，无则显示"未知名称"
-            name = df[df['代码'] == code]['名称'].values[0] if not df.empty and code in df['代码'].values else "未知名称"
-            name = name.replace(' ', '')
-            watchlist_data.append({"code": code, "name": name})
-        # 去重后保存
-        df_temp = pd.DataFrame(watchlist_data)
-        df_temp = df_temp.drop_duplicates(subset=['code'], keep='first')
-        watchlist_data = df_temp.to_dict('records')
-        
-        with open(SELF_SELECTED_FILE, "w", encoding="utf-8") as f:
-            json.dump(watchlist_data, f, ensure_ascii=False, indent=2)
-        return True
+        # 从代码主表匹配名称（O(1)查询，无需读取快照文件），无则显示"未知名称"
+        master = get_symbol_master()
+        return get_store().apply_changes([(code, master.name(code)) for code in added], removed,
+                                         list_name, current_owner())
     except Exception as e:
         st.error(f"保存自选股失败：{e}")
-        return False
+        return None
 
 # ====================== 页面配置与样式 ======================
 st.set_page_config(
@@ -76,26 +82,260 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # ====================== 数据加载函数 ======================
-@st.cache_data
-def load_data():
+DATA_FILE = "data/dividend_data.csv"
+TOP_K = 20
+CAP_BUCKET_STEP = 100  # 与市值滑块的取值范围(0-5000亿)对应的分桶步长
+
+def get_file_version(path):
+    """文件版本（路径+修改时间+大小），文件被原子替换后版本随之变化"""
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+
+def get_data_version(path=DATA_FILE, dataset="xueqiu"):
+    """快照版本：更新脚本写入新快照后版本随之变化"""
+    return get_file_version(resolve_source(dataset, path))
+
+def read_snapshot(version):
+    """按版本读取快照并转换为紧凑类型（代码为uint32、名称/行业为Arrow字符串、数值为float32）"""
+    if version is None:
+        raise FileNotFoundError("快照文件不存在")
+    return compact_frame(read_source(version[0]))
+
+def get_data_date(version):
+    """快照日期：历史库分区取分区日期，CSV取文件修改日期"""
+    source, mtime_ns, _ = version
+    if source.endswith(".parquet"):
+        return os.path.basename(os.path.dirname(source))[len("date="):]
+    return datetime.fromtimestamp(mtime_ns / 1e9).strftime("%Y-%m-%d")
+
+@st.cache_data(max_entries=2)
+def load_data(version):
+    """按快照版本缓存：version 变化时下一次交互自动读取新数据，无需重启"""
     try:
-        # 确保代码列被读取为字符串，防止丢失开头的0
-        df = pd.read_csv("data/dividend_data.csv", dtype={'代码': str})
-        # 简单清洗数据，确保股息率是数字
-        df['股息率(%)'] = pd.to_numeric(df['股息率(%)'], errors='coerce')
-        # 补全6位代码 + 清洗名称空格 + 去重
-        df['代码'] = df['代码'].str.zfill(6)
-        df['名称'] = df['名称'].str.replace(' ', '', regex=False)
+        # 紧凑表已完成清洗：股息率为数值、代码统一编码、名称去空格
+        df, dropped = drop_unknown_codes(read_snapshot(version))
+        if dropped:
+            st.warning(f"快照中有 {dropped} 行代码无法识别，已忽略")
         df = df.drop_duplicates(subset=['代码'], keep='first')
         return df
     except FileNotFoundError:
         st.error("未找到数据文件 dividend_data.csv，请先运行数据更新脚本。")
         return pd.DataFrame()
 
+@st.cache_resource(max_entries=2)
+def build_rankings(version):
+    """
+    每个快照版本只排序一次：
+    - by_yield：按股息率降序排好的完整数据
+    - cap_buckets：每个市值分桶下限 -> 市值不低于该下限的前 TOP_K 个行号（按股息率顺序）
+    """
+    df = load_data(version)
+    by_yield = df.sort_values(by='股息率(%)', ascending=False, kind='stable').reset_index(drop=True)
+    caps = by_yield['总市值(亿)'].to_numpy()
+    cap_buckets = {
+        floor: np.flatnonzero(caps >= floor)[:TOP_K]
+        for floor in range(0, 5000 + CAP_BUCKET_STEP, CAP_BUCKET_STEP)
+    }
+    return {
+        "by_yield": by_yield,
+        "caps": caps,
+        "cap_buckets": cap_buckets,
+        "big_cap_count": int((caps >= 1000).sum()),
+        "avg_yield": df['股息率(%)'].mean(),
+        "max_yield": df['股息率(%)'].max(),
+    }
+
+def top_by_yield(rankings, min_market_cap=0, k=TOP_K):
+    """市值不低于 min_market_cap 的股息率前k名：先查分桶，桶内不够时才扫描一次市值数组"""
+    caps = rankings["caps"]
+    floor = min(int(min_market_cap // CAP_BUCKET_STEP) * CAP_BUCKET_STEP, 5000)
+    candidates = rankings["cap_buckets"].get(floor)
+    if candidates is not None and k <= TOP_K:
+        rows = candidates[caps[candidates] >= min_market_cap][:k]
+        # 分桶已覆盖该下限的全部标的，或过滤后仍有k个，结果即为精确的前k名
+        if len(rows) == k or len(candidates) < TOP_K:
+            return rankings["by_yield"].iloc[rows]
+    rows = np.flatnonzero(caps >= min_market_cap)[:k]
+    return rankings["by_yield"].iloc[rows]
+
+def gradient_css(values, cmap='YlGn'):
+    """与 Styler.background_gradient 相同的配色（按列内最小/最大值归一化，深色背景配浅色文字），只计算一次"""
+    from matplotlib import colormaps, colors as mcolors
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0 or np.isnan(values).all():
+        return [''] * len(values)
+    norm = mcolors.Normalize(np.nanmin(values), np.nanmax(values))
+    css = []
+    for rgba in colormaps[cmap](norm(values)):
+        r, g, b = (x / 12.92 if x <= 0.04045 else ((x + 0.055) / 1.055) ** 2.4 for x in rgba[:3])
+        text = '#f1f1f1' if 0.2126 * r + 0.7152 * g + 0.0722 * b < 0.408 else '#000000'
+        css.append(f"background-color: {mcolors.rgb2hex(rgba)};color: {text};")
+    return css
+
+@st.cache_data(max_entries=64)
+def top_table(version, min_market_cap=0):
+    """Top-20 表格按 (快照版本, 市值下限) 缓存：序号列和股息率配色只算一次，重跑时只剩渲染"""
+    table = add_serial_number(top_by_yield(build_rankings(version), min_market_cap))
+    return table, gradient_css(table['股息率(%)'])
+
+def render_table(table, colors, **kwargs):
+    styler = table.style.format({
+        '最新价': '{:.2f}',
+        '总市值(亿)': '{:,.0f}',
+        '股息率(%)': '{:.2f}%'
+    }).apply(lambda _: colors, subset=['股息率(%)'])
+    st.dataframe(styler, use_container_width=True, **kwargs)
+
+# ====================== 全市场浏览（服务端分页） ======================
+SW_DATA_FILE = "data/dividend_data_shenwan.csv"
+BROWSE_SORT_COLUMNS = ['股息率(%)', '总市值(亿)', '最新价', '市盈率ttm', '市净率']
+# YlGn 色阶（浅 -> 深），按股息率分位数分桶后直接取色，不再逐格计算渐变
+YIELD_COLORS = ['#ffffe5', '#f7fcb9', '#d9f0a3', '#addd8e', '#78c679',
+                '#41ab5d', '#238443', '#006837', '#004529']
+
+@st.cache_data(max_entries=2)
+def load_market_data(version):
+    """读取申万全市场快照（按版本缓存）"""
+    try:
+        return read_snapshot(version)
+    except FileNotFoundError:
+        return pd.DataFrame()
+
+@st.cache_resource(max_entries=2)
+def build_market_index(version):
+    """
+    每个版本只计算一次：
+    - orders：各排序列的降序行号（NaN排在最后）
+    - yield_edges：股息率分位数分桶边界，用于给当前页着色
+    - search_text：代码+名称的检索文本
+    """
+    df = load_market_data(version)
+    orders = {}
+    for col in BROWSE_SORT_COLUMNS:
+        values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=float)
+        orders[col] = np.argsort(np.where(np.isnan(values), -np.inf, -values), kind='stable')
+    yields = pd.to_numeric(df['股息率(%)'], errors='coerce').dropna().to_numpy()
+    quantiles = np.linspace(0, 1, len(YIELD_COLORS) + 1)[1:-1]
+    yield_edges = np.quantile(yields, quantiles) if len(yields) else np.array([])
+    search_text = (decode_codes(df['代码']) + ' ' + df['名称'].astype(str)).str.upper()
+    industries = sorted(df['申万3级'].dropna().astype(str).unique()) if '申万3级' in df else []
+    return {"orders": orders, "yield_edges": yield_edges, "search_text": search_text, "industries": industries}
+
+def browse_rows(df, index, keyword, industries, sort_col, ascending):
+    """只在行号数组上完成过滤+排序（复用预先排好的行号），返回命中的行号"""
+    mask = np.ones(len(df), dtype=bool)
+    if keyword:
+        mask &= index["search_text"].str.contains(keyword.upper(), regex=False).to_numpy()
+    if industries:
+        mask &= df['申万3级'].isin(industries).to_numpy()
+    order = index["orders"][sort_col]
+    if ascending:
+        order = order[::-1]
+    return order[mask[order]]
+
+def style_page(page_df, yield_edges, start_serial):
+    """只格式化当前页：按预先计算的分桶给股息率列着色"""
+    page_df = to_display(page_df)
+    page_df.insert(0, '序号', range(start_serial, start_serial + len(page_df)))
+    bins = np.searchsorted(yield_edges, page_df['股息率(%)'].to_numpy(dtype=float), side='right')
+    colors = [f"background-color: {YIELD_COLORS[b]}; color: {'#fff' if b >= 5 else '#000'}" for b in bins]
+    return page_df.style.format({
+        '最新价': '{:.2f}',
+        '总市值(亿)': '{:,.0f}',
+        '股息率(%)': '{:.2f}%',
+        '市盈率ttm': '{:.2f}',
+        '市净率': '{:.2f}',
+    }, na_rep='-').apply(lambda _: colors, subset=['股息率(%)'])
+
+# ====================== 多条件选股 ======================
+@st.cache_resource(max_entries=2)
+def build_screener(version):
+    """每个申万快照版本只建一次列数组和行业/市值索引，之后每次交互只做查询"""
+    return Screener(load_market_data(version))
+
+# ====================== 行业对比 ======================
+INDUSTRY_ROLLUP_FILE = industry_rollup_file()
+INDUSTRY_MEMBERS_FILE = industry_members_file()
+INDUSTRY_SORTS = ['股息率中位数', '市值加权股息率', '股息率前10%分位', '股息率均值', '分红股数', '总市值(亿)']
+INDUSTRY_MEMBER_COLUMNS = ['代码', '名称', '最新价', '总市值(亿)', '股息率(%)', '申万3级']
+
+@st.cache_data(max_entries=2)
+def load_industry_rollup(version):
+    """行业汇总表由申万抓取脚本在入库时物化，看板按文件版本直接读取，不做 groupby"""
+    return read_partition(version[0])
+
+@st.cache_data(max_entries=2)
+def load_industry_members(version, level):
+    """成份股只投影展示列和对应层级的行业内百分位"""
+    columns = list(dict.fromkeys(INDUSTRY_MEMBER_COLUMNS + [INDUSTRY_LEVELS[level], PERCENTILE_COLUMNS[level]]))
+    return read_partition(version[0], columns)
+
+# ====================== 分红稳定性筛选 ======================
+STABILITY_FILE = stability_state_file("xueqiu")
+STABILITY_SORTS = {  # 排序列 -> 是否升序
+    '股息率均值': False,
+    '连续分红期数': False,
+    '波动系数': True,
+    '最大回撤(%)': True,
+}
+STABILITY_LIMIT = 100
+
+@st.cache_data(max_entries=2)
+def build_stability_view(data_version, stability_version):
+    """稳定性状态表（只投影派生指标列）与当前快照按代码合并，两个版本任一变化才重新计算"""
+    if stability_version is None:
+        return pd.DataFrame()
+    metrics = read_partition(stability_version[0], STABILITY_COLUMNS)
+    metrics['代码'] = encode_codes(metrics['代码'])
+    snapshot = load_data(data_version)
+    if snapshot.empty:
+        return pd.DataFrame()
+    return snapshot[['代码', '名称', '最新价', '总市值(亿)', '股息率(%)']].merge(metrics, on='代码', how='inner')
+
+def screen_stability(view, min_streak, max_cv, max_drawdown, sort_col):
+    """按连续分红期数、波动系数、最大回撤筛选（指标缺失视为不满足波动条件、满足回撤条件）"""
+    mask = view['连续分红期数'].to_numpy() >= min_streak
+    mask &= view['波动系数'].fillna(np.inf).to_numpy() <= max_cv
+    mask &= view['最大回撤(%)'].fillna(0).to_numpy() <= max_drawdown
+    return view[mask].sort_values(sort_col, ascending=STABILITY_SORTS[sort_col], kind='stable').head(STABILITY_LIMIT)
+
+# ====================== 快照变化流 ======================
+CHANGE_FEED_FILES = {"雪球": change_feed_file("xueqiu"), "申万": change_feed_file("shenwan")}
+CHANGE_FEED_SECTIONS = [("yield_moves", "股息率变动"), ("new_payers", "新增分红"), ("removed_payers", "停止分红"),
+                        ("price_gaps", "价格跳变")]
+
+@st.cache_data(max_entries=4)
+def load_change_feed(version):
+    """变化流由更新脚本在写入快照时生成（几KB的JSON），看板只读取，不再自行对比两份完整快照"""
+    with open(version[0], "r", encoding="utf-8") as f:
+        return json.load(f)
+
+@st.fragment
+def change_feed_panel(versions):
+    """与前一个日期的快照相比的变化；切换数据源只重跑本片段"""
+    source = st.radio("数据源", list(versions), horizontal=True, key="change_feed_source", label_visibility="collapsed")
+    feed = load_change_feed(versions[source])
+    if not feed.get("previous_at"):
+        st.caption("还没有前一个日期的快照，下一个交易日更新后显示与今天相比的变化。")
+        return
+    st.caption(f"{feed['previous_at']} → {feed['generated_at']}，股息率变动阈值 {feed['thresholds']['yield_move']} 个百分点，"
+               f"价格跳变阈值 {feed['thresholds']['price_gap']}%")
+    summary = {k: v for k, v in feed["summary"].items() if k != "股票数"}
+    for col, (label, value) in zip(st.columns(len(summary)), summary.items()):
+        col.metric(label, value)
+    sections = [(label, feed.get(key)) for key, label in CHANGE_FEED_SECTIONS]
+    sections += [("Top20名次变化", feed["rank_changes"]["top"]), ("蓝筹榜名次变化", feed["rank_changes"]["big_cap"])]
+    sections = [(label, events) for label, events in sections if events]
+    for tab, (label, events) in zip(st.tabs([label for label, _ in sections]) if sections else [], sections):
+        tab.dataframe(pd.DataFrame(events), use_container_width=True, hide_index=True)
+
 # ====================== 新增：添加序号列的函数 ======================
 def add_serial_number(df):
-    """给DataFrame添加序号列（从1开始），放在第一列"""
-    df_with_serial = df.copy()
+    """给DataFrame添加序号列（从1开始），放在第一列；紧凑表同时还原为展示类型"""
+    df_with_serial = to_display(df)
     df_with_serial.insert(0, '序号', range(1, len(df_with_serial) + 1))
     return df_with_serial
 
@@ -110,17 +350,28 @@ def format_dataframe(data):
         '股息率(%)': '{:.2f}%'
     }).background_gradient(subset=['股息率(%)'], cmap='YlGn')
 
-# ====================== 主页面内容 ======================
-# 侧边栏
-with st.sidebar:
-    st.image("https://www.freeiconspng.com/uploads/stock-exchange-icon-png-11.png", width=80)
-    st.title("红利策略配置")
-    st.info("本看板每日收盘后更新，基于静态股息率筛选。")
-    
+# ====================== 页面片段（fragment） ======================
+# 每个片段内的控件只重跑该片段本身，不会牵动整页（指标卡、其他标签页的表格）重新渲染
+@st.fragment
+def watchlist_editor():
+    """侧边栏自选股编辑：输入时只重跑本片段，保存后才整页重跑以刷新「自选股动态」"""
     st.subheader("⭐ 自选股监控")
-    # 初始化session_state
-    if "watchlist" not in st.session_state:
-        st.session_state["watchlist"] = load_watchlist_from_file()
+    owner = current_owner()
+    # 切换/新建清单：载入该清单并整页重跑（「自选股动态」页随之刷新）
+    if "watchlist_name_pending" in st.session_state:
+        st.session_state["watchlist_name"] = st.session_state.pop("watchlist_name_pending")
+    names = get_store().list_watchlists(owner) or [DEFAULT_LIST]
+    list_name = st.selectbox("自选股清单", names, key="watchlist_name")
+    if st.session_state.get("watchlist_loaded") != (owner, list_name):
+        load_watchlist(list_name)
+        st.session_state.pop("watchlist_input", None)
+        st.rerun(scope="app")
+    with st.popover("➕ 新建清单"):
+        new_name = st.text_input("清单名称", key="watchlist_new_name").strip()
+        if st.button("创建", disabled=not new_name):
+            get_store().create_watchlist(new_name, owner)
+            st.session_state["watchlist_name_pending"] = new_name
+            st.rerun(scope="app")
     # 将列表转为字符串，方便显示在文本框中
     watchlist_default = ", ".join(st.session_state["watchlist"])
     # 文本框输入
@@ -130,23 +381,195 @@ with st.sidebar:
         key="watchlist_input"
     ).upper()
     # 解析输入的自选股列表 + 补全6位 + 去重
-    watchlist = [x.strip().zfill(6) for x in watchlist_input.replace('\n', ',').split(',') if x.strip()]
+    # 没有数字的输入（如 "ABC"）标准化后为空字符串，直接丢弃
+    watchlist = [code for code in (normalize_code(x) for x in watchlist_input.replace('\n', ',').split(',')) if code]
     watchlist = list(dict.fromkeys(watchlist))  # 保持顺序去重
     # 保存按钮
     if st.button("💾 保存自选股"):
-        st.session_state["watchlist"] = watchlist
-        save_status = save_watchlist_to_file(watchlist)
-        if save_status:
-            st.success("自选股已保存！刷新页面不会丢失")
+        saved = save_watchlist(watchlist, list_name)
+        if saved is not None:
+            # 保存后以库中的清单为准（可能包含其他会话同时加入的股票），文本框随之刷新
+            st.session_state["watchlist"] = saved
+            st.session_state["watchlist_base"] = saved
+            st.session_state["watchlist_saved"] = "merged" if saved != watchlist else "saved"
+            st.session_state.pop("watchlist_input", None)
+            st.rerun(scope="app")
         else:
             st.error("自选股保存失败，请检查日志！")
+    saved_status = st.session_state.pop("watchlist_saved", None)
+    if saved_status:
+        st.success(f"自选股已保存到清单「{list_name}」！刷新页面不会丢失")
+        if saved_status == "merged":
+            st.info("其他会话同时修改了该清单，已合并双方的增删")
+
+@st.fragment
+def portfolio_section(version, watchlist, scenario):
+    """持仓编辑只重跑本片段；侧边栏情景参数变化时随整页重跑（测算本身是毫秒级的数组运算）"""
+    st.write("#### 💰 组合分红现金流")
+    saved = load_holdings()
+    holdings = saved.set_index('代码').reindex(list(watchlist)).rename_axis('代码').reset_index()
+    edited = st.data_editor(
+        holdings, key="holdings_editor", hide_index=True, disabled=['代码'], use_container_width=True,
+        column_config={
+            '持股数': st.column_config.NumberColumn(min_value=0, step=100),
+            '投入金额': st.column_config.NumberColumn("投入金额（元，未填持股数时按现价折算）", min_value=0),
+            '成本价': st.column_config.NumberColumn("成本价（元/股，可选）", min_value=0, format="%.3f"),
+        },
+    )
+    if st.button("💾 保存持仓"):
+        # 不在当前自选股中的代码保留原持仓
+        n_saved = save_holdings(pd.concat([saved[~saved['代码'].isin(watchlist)], edited], ignore_index=True))
+        st.success(f"已保存 {n_saved} 条持仓")
+    portfolio = Portfolio.from_frames(edited, load_data(version))
+    if not len(portfolio):
+        st.info("在上表填写持股数或投入金额，即可测算年度/月度分红收入和各种情景。")
+        return
+
+    totals = portfolio.totals()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("预计年分红", f"{totals['年分红']:,.0f} 元")
+    m2.metric("月均分红", f"{totals['月均分红']:,.0f} 元")
+    m3.metric("组合股息率", f"{totals['组合股息率(%)']:.2f}%")
+    m4.metric("成本股息率", f"{totals['成本股息率(%)']:.2f}%")
+    st.dataframe(portfolio.summary(), use_container_width=True, hide_index=True)
+
+    years = scenario["years"]
+    result = project(portfolio, scenario["yield_cut"], scenario["price_move"], scenario["reinvest"], years)
+    st.write(f"##### 情景测算（分红下调 {scenario['yield_cut']:.0%}、股价变动 {scenario['price_move']:+.0%}、"
+             f"再投入 {scenario['reinvest']:.0%}、{years} 年）")
+    s1, s2, s3, s4 = st.columns(4)
+    s1.metric("首年分红", f"{result['首年分红'][0]:,.0f} 元", delta=f"{result['首年分红'][0] - totals['年分红']:,.0f}")
+    s2.metric(f"第{years}年分红", f"{result['末年分红'][0]:,.0f} 元")
+    s3.metric(f"{years}年累计分红", f"{result['累计分红'][0]:,.0f} 元")
+    s4.metric("期末市值", f"{result['期末市值'][0]:,.0f} 元")
+    simulated = monte_carlo(portfolio, scenario["n_scenarios"], scenario["cut_prob"], scenario["cut_depth"],
+                            scenario["price_vol"], scenario["reinvest"], years)
+    st.caption(f"{scenario['n_scenarios']:,} 个随机情景：每只持仓以 {scenario['cut_prob']:.0%} 的概率被下调分红"
+               f"（幅度 0~{scenario['cut_depth']:.0%}），股价波动率 {scenario['price_vol']:.0%}；各结果的分位数如下")
+    st.dataframe(percentiles(simulated).round(2), use_container_width=True)
+
+@st.fragment
+def overview_metrics(version, total):
+    rankings = build_rankings(version)
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("A股红利标的池总数", total, delta="实时同步")
+    m2.metric("千亿市值数量", rankings["big_cap_count"])
+    m3.metric("市场平均股息率", f"{rankings['avg_yield']:.2f}%")
+    m4.metric("最高股息率", f"{rankings['max_yield']:.2f}%")
+
+@st.fragment
+def market_cap_tab(version):
+    """市值滑块只重跑本标签页；表格按 (版本, 市值下限) 缓存"""
+    min_market_cap = st.slider("最低市值 (亿元)", 0, 5000, 1000, key="min_market_cap")
+    render_table(*top_table(version, min_market_cap), height=750)
+
+@st.fragment
+def browse_tab(market_version):
+    market_df = load_market_data(market_version)
+    market_index = build_market_index(market_version)
+    c1, c2, c3, c4 = st.columns([2, 2, 1, 1])
+    keyword = c1.text_input("搜索代码/名称", key="browse_keyword").strip()
+    industries = c2.multiselect("申万三级行业", market_index["industries"], key="browse_industries")
+    sort_col = c3.selectbox("排序列", BROWSE_SORT_COLUMNS, key="browse_sort")
+    ascending = c4.toggle("升序", key="browse_ascending")
+    page_size = c4.selectbox("每页行数", [50, 100, 200], key="browse_page_size")
+    rows = browse_rows(market_df, market_index, keyword, industries, sort_col, ascending)
+    total = len(rows)
+    page_count = max((total + page_size - 1) // page_size, 1)
+    page = c3.number_input(f"页码（共 {page_count} 页）", 1, page_count, 1, key="browse_page")
+    page = min(int(page), page_count)  # 筛选条件变化后命中数减少，页码随之收敛
+    start = (page - 1) * page_size
+    page_df = market_df.iloc[rows[start:start + page_size]]
+    st.caption(f"共 {total} 支标的，当前第 {page}/{page_count} 页")
+    st.dataframe(style_page(page_df, market_index["yield_edges"], start + 1),
+                 use_container_width=True, hide_index=True)
+
+@st.fragment
+def stability_tab(stability_view):
+    c1, c2, c3, c4 = st.columns(4)
+    max_periods = int(stability_view['观测期数'].max())
+    min_streak = c1.number_input(f"最少连续分红期数（已观测 {max_periods} 期）", 0, max(max_periods, 1), 0,
+                                 key="stability_min_streak")
+    max_cv = c2.slider("最大波动系数（标准差/均值）", 0.0, 2.0, 2.0, 0.05, key="stability_max_cv")
+    max_drawdown = c3.slider("最大回撤上限(%)", 0, 100, 100, key="stability_max_drawdown")
+    sort_col = c4.selectbox("排序列", list(STABILITY_SORTS), key="stability_sort")
+    screened = screen_stability(stability_view, min_streak, max_cv, max_drawdown, sort_col)
+    st.caption(f"按股息率历史快照增量计算，显示前 {STABILITY_LIMIT} 支（共 {len(stability_view)} 支有指标）")
+    st.dataframe(add_serial_number(screened), use_container_width=True, hide_index=True)
+
+@st.fragment
+def industry_tab(rollup_version, members_version):
+    rollup = load_industry_rollup(rollup_version)
+    levels = sorted(rollup['层级'].unique(), reverse=True)
+    c1, c2, c3 = st.columns([1, 2, 3])
+    level = c1.selectbox("行业层级", levels, format_func=lambda x: f"申万{x}级", key="industry_level")
+    sort_col = c2.selectbox("排序列", INDUSTRY_SORTS, key="industry_sort")
+    view = rollup[rollup['层级'] == level].drop(columns=['层级'])
+    view = view.sort_values(sort_col, ascending=False, kind='stable').dropna(axis=1, how='all')
+    st.dataframe(add_serial_number(view), use_container_width=True, hide_index=True, height=420)
+    industry = c3.selectbox("查看行业成份股", view['行业'].tolist(), key=f"industry_pick_{level}")
+    if industry and members_version is not None:
+        members = load_industry_members(members_version, level)
+        col = INDUSTRY_LEVELS[level]
+        members = members[members[col] == industry].drop_duplicates(subset=['代码'])
+        members = members.sort_values('股息率(%)', ascending=False, kind='stable')
+        st.caption(f"{industry}：{len(members)} 支分红股，行业内百分位越高股息率越高")
+        st.dataframe(add_serial_number(members), use_container_width=True, hide_index=True)
+
+@st.fragment
+def screener_tab(market_version):
+    screener = build_screener(market_version)
+    c1, c2, c3, c4 = st.columns(4)
+    yield_range = c1.slider("股息率区间(%)", 0.0, 20.0, (3.0, 20.0), 0.5, key="screen_yield")
+    pe_max = c2.number_input("市盈率ttm上限（0为不限）", 0.0, 1000.0, 20.0, key="screen_pe_max")
+    pb_max = c3.number_input("市净率上限（0为不限）", 0.0, 100.0, 0.0, key="screen_pb_max")
+    min_cap = c4.number_input("最低市值(亿)", 0.0, 50000.0, 100.0, step=50.0, key="screen_min_cap")
+    c5, c6, c7, c8 = st.columns([1, 3, 2, 1])
+    level = c5.selectbox("行业层级", list(INDUSTRY_LEVELS), index=2, format_func=lambda x: f"申万{x}级",
+                         key="screen_level")
+    industries = c6.multiselect("行业", screener.industries(level), key=f"screen_industries_{level}")
+    sort_col = c7.selectbox("排序列", SCREEN_COLUMNS, index=SCREEN_COLUMNS.index('股息率(%)'), key="screen_sort")
+    top_k = c8.selectbox("前N支", [20, 50, 100, 200], key="screen_top")
+    ranges = {
+        '股息率(%)': yield_range,
+        # 设置上限时同时排除亏损（负值）
+        '市盈率ttm': (0, pe_max) if pe_max > 0 else (None, None),
+        '市净率': (0, pb_max) if pb_max > 0 else (None, None),
+    }
+    rows = screener.query(ranges, industries, level, min_cap or None, None,
+                          sort_col, sort_col in ('市盈率ttm', '市净率'), top_k)
+    st.caption(f"命中前 {len(rows)} 支（{'升序' if sort_col in ('市盈率ttm', '市净率') else '降序'}排列）")
+    st.dataframe(add_serial_number(screener.to_frame(rows)), use_container_width=True, hide_index=True)
 
+# ====================== 主页面内容 ======================
+# 侧边栏
+with st.sidebar:
+    st.image("https://www.freeiconspng.com/uploads/stock-exchange-icon-png-11.png", width=80)
+    st.title("红利策略配置")
+    st.info("本看板每日收盘后更新，基于静态股息率筛选。")
+    
+    # 初始化session_state
+    if "watchlist" not in st.session_state:
+        load_watchlist(st.session_state.get("watchlist_name", DEFAULT_LIST))
+    watchlist_editor()
+
+    # 分红现金流情景参数（自选股动态页的组合测算使用）
     st.divider()
-    st.markdown("### 筛选参数")
-    min_market_cap = st.slider("最低市值 (亿元)", 0, 5000, 1000)
+    st.subheader("💰 现金流情景")
+    scenario = {
+        "yield_cut": st.slider("分红下调 (%)", 0, 100, 0, 5, key="scenario_cut") / 100,
+        "price_move": st.slider("股价变动 (%)", -50, 50, 0, 5, key="scenario_move") / 100,
+        "reinvest": st.slider("分红再投入比例 (%)", 0, 100, 100, 10, key="scenario_reinvest") / 100,
+        "years": st.slider("测算年数", 1, 30, 10, key="scenario_years"),
+        "n_scenarios": st.select_slider("随机情景数", [1000, 5000, 10000, 20000], 10000, key="scenario_n"),
+        "cut_prob": st.slider("单只持仓被下调分红的概率 (%)", 0, 100, 20, 5, key="scenario_cut_prob") / 100,
+        "cut_depth": st.slider("随机下调幅度上限 (%)", 0, 100, 50, 5, key="scenario_cut_depth") / 100,
+        "price_vol": st.slider("股价波动率 (%)", 0, 60, 25, 5, key="scenario_vol") / 100,
+    }
 
-# 获取数据
-df = load_data()
+# 获取数据（按快照版本缓存，更新脚本写入新快照后下一次交互即生效）
+data_version = get_data_version()
+df = load_data(data_version)
 
 if not df.empty:
     # 头部标题区
@@ -156,44 +579,72 @@ if not df.empty:
         st.caption("汇聚 A 股核心资产，聚焦高股息现金牛")
     with col_time:
         st.write("")
-        st.metric(label="数据日期", value=datetime.now().strftime("%Y-%m-%d"))
+        st.metric(label="数据日期", value=get_data_date(data_version))
 
     # 顶部概览指标卡
     st.write("---")
-    m1, m2, m3, m4 = st.columns(4)
-    m1.metric("A股红利标的池总数", len(df), delta="实时同步")
-    m2.metric("千亿市值数量", len(df[df['总市值(亿)'] >= 1000]))
-    avg_yield = df['股息率(%)'].mean()
-    m3.metric("市场平均股息率", f"{avg_yield:.2f}%")
-    m4.metric("最高股息率", f"{df['股息率(%)'].max():.2f}%")
+    overview_metrics(data_version, len(df))
+
+    # 与前一个日期相比的变化（更新脚本生成变化流后才显示）
+    feed_versions = {name: get_file_version(path) for name, path in CHANGE_FEED_FILES.items()}
+    feed_versions = {name: version for name, version in feed_versions.items() if version is not None}
+    if feed_versions:
+        with st.expander("🔔 与前一日相比", expanded=False):
+            change_feed_panel(feed_versions)
 
     # 主展示区
     st.write("### 📊 核心策略清单")
-    tab1, tab2, tab3 = st.tabs(["🔥 全市场高股息 Top 20", "💎 蓝筹高股息 (千亿市值)", "📋 自选股动态"])
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(["🔥 全市场高股息 Top 20", "💎 蓝筹高股息 (千亿市值)", "📋 自选股动态",
+                                                        "🗂️ 全市场浏览", "🛡️ 分红稳定性", "🔎 多条件选股", "🏭 行业对比"])
 
     with tab1:
-        top_20_all = df.sort_values(by='股息率(%)', ascending=False).head(20)
-        st.dataframe(format_dataframe(top_20_all), use_container_width=True, height=750)
+        render_table(*top_table(data_version), height=750)
 
     with tab2:
-        big_caps = df[df['总市值(亿)'] >= min_market_cap]
-        top_20_big = big_caps.sort_values(by='股息率(%)', ascending=False).head(20)
-        st.dataframe(format_dataframe(top_20_big), use_container_width=True, height=750)
+        market_cap_tab(data_version)
 
     with tab3:
         current_watchlist = st.session_state.get("watchlist", [])
         if current_watchlist:
-            # 确保代码是6位字符串，匹配数据中的格式
-            my_stocks = df[df['代码'].isin(current_watchlist)]
+            # 自选股代码按相同规则编码为整数，匹配紧凑表中的代码列
+            my_stocks = df[df['代码'].isin(encode_codes(current_watchlist))]
             # 二次兜底去重
             my_stocks = my_stocks.drop_duplicates(subset=['代码'], keep='first')
             if not my_stocks.empty:
                 st.dataframe(format_dataframe(my_stocks), use_container_width=True)
             else:
                 st.warning("自选股列表中暂无匹配的股息率数据，请检查代码是否正确。")
+            portfolio_section(data_version, tuple(current_watchlist), scenario)
         else:
             st.info("在左侧输入股票代码并点击「保存自选股」即可开启监控。")
 
+    market_version = get_data_version(SW_DATA_FILE, "shenwan")
+    with tab4:
+        if market_version is None:
+            st.info("未找到申万全市场数据，请先运行 update_data_sw.py 生成 dividend_data_shenwan.csv。")
+        else:
+            browse_tab(market_version)
+
+    with tab5:
+        stability_view = build_stability_view(data_version, get_file_version(STABILITY_FILE))
+        if stability_view.empty:
+            st.info("暂无稳定性指标：每次运行更新脚本都会增量累积；已有历史库时可运行 python stability.py --rebuild 重建。")
+        else:
+            stability_tab(stability_view)
+
+    with tab6:
+        if market_version is None:
+            st.info("未找到申万全市场数据，请先运行 update_data_sw.py 生成 dividend_data_shenwan.csv。")
+        else:
+            screener_tab(market_version)
+
+    with tab7:
+        rollup_version = get_file_version(INDUSTRY_ROLLUP_FILE)
+        if rollup_version is None:
+            st.info("暂无行业汇总：运行 update_data_sw.py 时自动生成，也可运行 python industry_rollup.py --from-snapshot 从现有快照生成。")
+        else:
+            industry_tab(rollup_version, get_file_version(INDUSTRY_MEMBERS_FILE))
+
     # 页脚
     st.divider()
     st.markdown("""
@@ -204,4 +655,4 @@ if not df.empty:
     """, unsafe_allow_html=True)
 
 else:
-    st.warning("等待初始化数据中...请先运行数据抓取脚本生成 dividend_data.csv 文件")
\ No newline at end of file
+    st.warning("等待初始化数据中...请先运行数据抓取脚本生成 dividend_data.csv 文件")
@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import http.client
+import multiprocessing
+from urllib.parse import quote
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+# ====================== 数据接口压测 ======================
+# 在子进程中启动 api_server（绑定到一个CPU核），多个客户端进程各用一条 keep-alive 连接持续请求，
+# 请求混合：前k名、按代码查询、选股、带 If-None-Match 的条件请求，一半客户端接受gzip
+# 输出持续的每秒请求数、延迟分位数和各状态码数量
+
+def run_server(port_queue, cpu, datasets):
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, {cpu})
+    os.chdir(ROOT_DIR)
+    from api_server import serve
+    serve(port=0, datasets=datasets, ready=port_queue)
+
+def make_requests(codes, industries, rng):
+    """压测请求池（固定数量的不同查询，缓存命中率与真实的内部工具调用相近）"""
+    requests = []
+    for k in (10, 20, 50, 100):
+        for min_cap in (0, 100, 500, 1000):
+            requests.append(f"/v1/xueqiu/top?k={k}&min_cap={min_cap}")
+    for _ in range(200):
+        requests.append(f"/v1/xueqiu/stocks/{rng.choice(codes)}")
+    for _ in range(50):
+        requests.append("/v1/xueqiu/stocks?codes=" + ",".join(rng.sample(codes, 5)))
+    for _ in range(100):
+        query = f"yield_min={rng.choice([2, 3, 4, 5])}&pe_max={rng.choice([10, 15, 20, 30])}&min_cap={rng.choice([0, 100, 500])}"
+        if industries and rng.random() < 0.5:
+            query += f"&industry={quote(rng.choice(industries))}&level=3"
+        requests.append(f"/v1/shenwan/screen?{query}&sort={rng.choice(['yield', 'cap', 'pe'])}&k=50")
+    return requests
+
+def run_client(port, requests, duration, gzip_ok, seed, result_queue):
+    """一条 keep-alive 连接：随机取请求；同一路径第二次起有一半带上次的 ETag"""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    etags = {}
+    latencies, statuses, received = [], {}, 0
+    deadline = time.perf_counter() + duration
+    while True:
+        start = time.perf_counter()
+        if start >= deadline:
+            break
+        path = rng.choice(requests)
+        headers = {"Accept-Encoding": "gzip"} if gzip_ok else {}
+        if path in etags and rng.random() < 0.5:
+            headers["If-None-Match"] = etags[path]
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        received += len(body)
+        if response.getheader("ETag"):
+            etags[path] = response.getheader("ETag")
+    conn.close()
+    result_queue.put((latencies, statuses, received))
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q / 100), len(values) - 1)] if values else float("nan")
+
+def main():
+    parser = argparse.ArgumentParser(description="数据接口压测：单核服务端的持续吞吐")
+    parser.add_argument("--clients", type=int, default=8, help="并发客户端进程数（每个一条keep-alive连接）")
+    parser.add_argument("--duration", type=float, default=10, help="压测时长（秒）")
+    parser.add_argument("--cpu", type=int, default=0, help="服务端绑定的CPU核，-1为不绑定")
+    parser.add_argument("--json", default=None, help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    import pandas as pd
+    os.chdir(ROOT_DIR)
+    codes = pd.read_csv("data/dividend_data.csv", dtype={"代码": str})["代码"].str.zfill(6).tolist()
+    shenwan = pd.read_csv("data/dividend_data_shenwan.csv", dtype={"代码": str})
+    industries = sorted(set(shenwan["申万3级"].dropna()) - {"—"})
+    requests = make_requests(codes, industries, random.Random(0))
+
+    ctx = multiprocessing.get_context("spawn")
+    port_queue, result_queue = ctx.Queue(), ctx.Queue()
+    server = ctx.Process(target=run_server, args=(port_queue, None if args.cpu < 0 else args.cpu, ["xueqiu", "shenwan"]),
+                         daemon=True)
+    server.start()
+    port = port_queue.get(timeout=60)
+    clients = [ctx.Process(target=run_client, args=(port, requests, args.duration, i % 2 == 0, i, result_queue))
+               for i in range(args.clients)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    results = [result_queue.get(timeout=args.duration + 60) for _ in clients]
+    elapsed = time.perf_counter() - start
+    for client in clients:
+        client.join()
+    server.terminate()
+
+    latencies = [value for result in results for value in result[0]]
+    statuses = {}
+    for _, counts, _ in results:
+        for status, n in counts.items():
+            statuses[status] = statuses.get(status, 0) + n
+    summary = {
+        "clients": args.clients,
+        "duration_s": round(elapsed, 2),
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "received_mb": round(sum(result[2] for result in results) / 1e6, 2),
+        "server_cpu": None if args.cpu < 0 else args.cpu,
+        "cpu_count": os.cpu_count(),
+    }
+    print(f"🌐 {summary['clients']} 个客户端 x {summary['duration_s']}s：{summary['requests']} 次请求，"
+          f"{summary['rps']:,.0f} 次/秒，p50 {summary['p50_ms']}ms / p95 {summary['p95_ms']}ms / p99 {summary['p99_ms']}ms")
+    print(f"   状态码 {summary['statuses']}，共接收 {summary['received_mb']}MB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
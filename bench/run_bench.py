@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import resource
+import subprocess
+import threading
+import multiprocessing
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from standin_server import make_universe, serve
+
+SCENARIOS = ["xueqiu", "shenwan", "app"]
+
+# ====================== 工具函数 ======================
+def peak_rss_mb():
+    """当前进程的峰值常驻内存（Linux下 ru_maxrss 单位为KB，macOS为字节）"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class StageTimer:
+    """包装模块函数，累计其耗时（线程安全），用于统计解析/写入时间"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def wrap(self, module, name):
+        func = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds += time.perf_counter() - start
+        setattr(module, name, timed)
+
+def prepare_workdir(scale):
+    """在临时目录中准备 data/ 与自选股文件，基准运行不会改动仓库里的真实数据"""
+    workdir = tempfile.mkdtemp(prefix="dividend_bench_")
+    os.makedirs(os.path.join(workdir, "data"))
+    shutil.copy(os.path.join(ROOT_DIR, "data", "a_stock_codes.csv"), os.path.join(workdir, "data"))
+    universe = make_universe(scale)
+    with open(os.path.join(workdir, "self_selected_stocks.json"), "w", encoding="utf-8") as f:
+        json.dump([{"code": s["code"], "name": s["name"]} for s in universe], f, ensure_ascii=False)
+    return workdir, universe
+
+# ====================== 子进程：单个场景 ======================
+def run_xueqiu(scale, args):
+    import update_data
+    from snapshot_writer import SnapshotWriter
+    write_timer = StageTimer()
+    write_timer.wrap(SnapshotWriter, "finalize")
+    start = time.perf_counter()
+    update_data.fetch_and_save_data(concurrency=args.concurrency, rate_limit=args.rps, batch_size=args.batch_size)
+    wall = time.perf_counter() - start
+    import pandas as pd
+    rows = len(pd.read_csv(update_data.CSV_FILE)) if os.path.exists(update_data.CSV_FILE) else 0
+    return {"wall_s": wall, "items": scale, "rows": rows, "parse_s": None, "write_s": write_timer.seconds}
+
+def run_shenwan(scale, args):
+    import update_data_sw
+    from snapshot_writer import SnapshotWriter
+    parse_timer, write_timer = StageTimer(), StageTimer()
+    parse_timer.wrap(update_data_sw, "parse_industry_rows")
+    parse_timer.wrap(update_data_sw, "parse_industry_overview")
+    write_timer.wrap(SnapshotWriter, "finalize")
+    start = time.perf_counter()
+    # 解析放在本进程内执行，才能统计解析耗时
+    update_data_sw.fetch_and_save_dividend_data(resume=False, download_workers=args.concurrency,
+                                                parse_workers=0, rate_limit=args.rps)
+    wall = time.perf_counter() - start
+    import pandas as pd
+    csv_file = "data/dividend_data_shenwan.csv"
+    rows = len(pd.read_csv(csv_file)) if os.path.exists(csv_file) else 0
+    return {"wall_s": wall, "items": scale, "rows": rows, "parse_s": parse_timer.seconds, "write_s": write_timer.seconds}
+
+def run_app(scale, args, universe):
+    """看板数据加载路径：生成 scale 行的快照后，冷启动运行一次 app.py，再测一次热重跑"""
+    import pandas as pd
+    from snapshot_writer import atomic_write_csv
+    from streamlit.testing.v1 import AppTest
+    snapshot = pd.DataFrame({
+        "代码": [s["code"] for s in universe],
+        "名称": [s["name"] for s in universe],
+        "最新价": [s["price"] for s in universe],
+        "总市值(亿)": [s["cap"] for s in universe],
+        "股息率(%)": [s["yield"] for s in universe],
+    })
+    start = time.perf_counter()
+    atomic_write_csv(snapshot, "data/dividend_data.csv")
+    shenwan = snapshot.assign(**{
+        "申万1级": "—", "申万2级": "—", "申万3级": [s["industry"] for s in universe],
+        "市盈率ttm": [s["pe"] for s in universe], "市净率": [s["pb"] for s in universe],
+    })
+    atomic_write_csv(shenwan, "data/dividend_data_shenwan.csv")
+    write_s = time.perf_counter() - start
+
+    at = AppTest.from_file(os.path.join(ROOT_DIR, "app.py"), default_timeout=300)
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    at.run()
+    warm = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return {"wall_s": cold, "warm_rerun_s": warm, "items": scale, "rows": len(snapshot), "parse_s": None, "write_s": write_s}
+
+def run_child(args):
+    os.environ["XQ_HOME_URL"] = f"http://127.0.0.1:{args.port}/"
+    os.environ["XQ_API_BASE"] = f"http://127.0.0.1:{args.port}"
+    os.environ["LEGULEGU_BASE"] = f"http://127.0.0.1:{args.port}"
+    os.environ["DIVIDEND_HTTP_OFFLINE"] = "0"
+    workdir, universe = prepare_workdir(args.scale)
+    os.chdir(workdir)
+    # 场景自身的进度输出重定向到stderr，stdout只保留最终的JSON结果
+    stdout, sys.stdout = sys.stdout, sys.stderr
+    try:
+        if args.child == "xueqiu":
+            result = run_xueqiu(args.scale, args)
+        elif args.child == "shenwan":
+            result = run_shenwan(args.scale, args)
+        else:
+            result = run_app(args.scale, args, universe)
+    finally:
+        sys.stdout = stdout
+        shutil.rmtree(workdir, ignore_errors=True)
+    result.update({
+        "scenario": args.child,
+        "scale": args.scale,
+        "throughput": result["items"] / result["wall_s"] if result["wall_s"] else None,
+        "peak_rss_mb": peak_rss_mb(),
+    })
+    print(json.dumps(result, ensure_ascii=False))
+
+# ====================== 主进程：启动替身服务并逐个运行场景 ======================
+def run_suite(args):
+    results = []
+    for scale in args.scales:
+        ready = multiprocessing.Queue()
+        server = multiprocessing.Process(
+            target=serve, args=(scale, 0, ready, args.fixtures),
+            kwargs={"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                    "error_rate": args.error_rate, "max_rps": args.max_rps},
+            daemon=True,
+        )
+        server.start()
+        port = ready.get(timeout=120)
+        try:
+            for scenario in args.scenarios:
+                cmd = [sys.executable, os.path.abspath(__file__), "--child", scenario, "--scale", str(scale),
+                       "--port", str(port), "--concurrency", str(args.concurrency), "--rps", str(args.rps),
+                       "--batch-size", str(args.batch_size)]
+                proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=None if args.verbose else subprocess.DEVNULL, text=True)
+                if proc.returncode != 0:
+                    print(f"❌ 场景 {scenario}@{scale} 运行失败（退出码 {proc.returncode}）")
+                    continue
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(result)
+                print_result(result)
+        finally:
+            server.terminate()
+            server.join()
+    return results
+
+def _fmt(value, pattern):
+    return pattern.format(value) if value is not None else "-"
+
+def print_result(r):
+    extra = f"  热重跑 {r['warm_rerun_s']:.2f}s" if "warm_rerun_s" in r else ""
+    print(f"{r['scenario']:<8} {r['scale']:>6} 支 | 耗时 {r['wall_s']:7.2f}s | 吞吐 {_fmt(r['throughput'], '{:8.1f}')}/s | "
+          f"峰值内存 {r['peak_rss_mb']:7.1f}MB | 解析(各线程累计) {_fmt(r['parse_s'], '{:.2f}s')} | 写入 {_fmt(r['write_s'], '{:.2f}s')} | "
+          f"输出 {r['rows']} 行{extra}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线基准：本地替身服务 + 更新脚本/看板加载耗时")
+    parser.add_argument("--scales", type=lambda s: [int(x) for x in s.split(",")], default=[10, 1000, 5000],
+                        help="股票数量，逗号分隔")
+    parser.add_argument("--scenarios", type=lambda s: s.split(","), default=SCENARIOS, help="xueqiu,shenwan,app")
+    parser.add_argument("--latency-ms", type=float, default=20, help="替身服务的平均响应延迟")
+    parser.add_argument("--jitter-ms", type=float, default=5, help="延迟抖动")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="随机返回500的比例")
+    parser.add_argument("--max-rps", type=int, default=0, help="替身服务限流阈值，超出返回429，0为不限流")
+    parser.add_argument("--fixtures", default=None, help="录制响应目录（见 standin_server.load_fixtures）")
+    parser.add_argument("--concurrency", type=int, default=8, help="更新脚本的并发数")
+    parser.add_argument("--rps", type=float, default=0, help="更新脚本的初始请求速率，0为不限速")
+    parser.add_argument("--batch-size", type=int, default=50, help="雪球批量请求大小")
+    parser.add_argument("--json", default=None, help="把结果写入JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="显示场景自身的输出")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+    else:
+        results = run_suite(args)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, indent=2)
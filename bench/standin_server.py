@@ -0,0 +1,268 @@
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+from html import escape
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+
+# ====================== 模拟数据集 ======================
+def make_universe(n_stocks, seed=7):
+    """
+    生成 n_stocks 支股票的模拟行情：优先使用 data/ 中真实的代码、名称、价格、股息率和申万行业，
+    数量不够时补充合成代码。同一 n_stocks 和 seed 得到的结果完全一致
+    """
+    rng = random.Random(seed)
+    codes = pd.read_csv(os.path.join(DATA_DIR, "a_stock_codes.csv"), dtype={"code": str})
+    shenwan = pd.read_csv(os.path.join(DATA_DIR, "dividend_data_shenwan.csv"), dtype={"代码": str})
+    shenwan["code"] = shenwan["代码"].str.extract(r"(\d+)", expand=False).str.zfill(6)
+    shenwan = shenwan.drop_duplicates(subset=["code"]).set_index("code")
+    industries = sorted(shenwan["申万3级"].dropna().unique())
+
+    rows = []
+    known = set(codes["code"])
+    for code, name in zip(codes["code"], codes["name"]):
+        if len(rows) >= n_stocks:
+            break
+        rows.append((code, str(name).replace(" ", "")))
+    serial = 0
+    while len(rows) < n_stocks:
+        code = f"6{serial:05d}"
+        serial += 1
+        if code not in known:
+            rows.append((code, f"模拟{code}"))
+
+    universe = []
+    for code, name in rows:
+        if code in shenwan.index:
+            ref = shenwan.loc[code]
+            price, cap, dividend_yield = float(ref["最新价"]), float(ref["总市值(亿)"]), float(ref["股息率(%)"])
+            industry, pe, pb = ref["申万3级"], ref["市盈率ttm"], ref["市净率"]
+        else:
+            price = round(rng.uniform(2, 200), 2)
+            cap = round(rng.lognormvariate(5, 1.2), 2)
+            dividend_yield = round(rng.choice([0, 0, rng.uniform(0.1, 8)]), 3)
+            industry, pe, pb = rng.choice(industries), round(rng.uniform(5, 80), 2), round(rng.uniform(0.5, 8), 2)
+        if code.startswith(("60", "68")):
+            symbol, suffix = f"SH{code}", "SH"
+        elif code.startswith("8"):
+            symbol, suffix = f"BJ{code}", "BJ"
+        else:
+            symbol, suffix = f"SZ{code}", "SZ"
+        universe.append({
+            "code": code, "symbol": symbol, "ts_code": f"{code}.{suffix}", "name": name,
+            "price": price, "cap": cap, "yield": dividend_yield,
+            "industry": industry, "pe": pe, "pb": pb,
+        })
+    return universe
+
+def build_responses(universe):
+    """把模拟数据集预先渲染成各接口的响应体"""
+    quotes = {}
+    by_industry = {}
+    for item in universe:
+        quotes[item["symbol"]] = {
+            "symbol": item["symbol"], "code": item["code"], "name": item["name"],
+            "current": item["price"], "market_capital": item["cap"] * 1e8,
+            "dividend_yield": item["yield"],
+        }
+        by_industry.setdefault(item["industry"], []).append(item)
+
+    industry_codes = {}
+    overview_items = []
+    for i, (industry, members) in enumerate(sorted(by_industry.items())):
+        industry_code = f"85{i:04d}.SI"
+        industry_codes[industry_code] = members
+        overview_items.append(
+            '<div class="lg-industries-item">'
+            f'<div class="lg-industries-item-chinese-title">{industry_code}</div>'
+            f'<div class="lg-industries-item-number">{escape(industry)}({len(members)})<span>[模拟二级行业]</span></div>'
+            '<div class="lg-sw-industries-item-value">'
+            '<span class="value">15.2</span><span class="value">14.8</span>'
+            '<span class="value">1.6</span><span class="value">2.4</span></div></div>'
+        )
+    overview = f'<html><body><div id="level3Items">{"".join(overview_items)}</div></body></html>'
+
+    compositions = {}
+    header = "<tr>" + "".join(f"<th>col{i}</th>" for i in range(17)) + "</tr>"
+    for industry_code, members in industry_codes.items():
+        body = []
+        for j, item in enumerate(members):
+            cells = [j + 1, item["ts_code"], escape(item["name"]), "2021-12-13", "—", "—", escape(item["industry"]),
+                     item["price"], item["pe"], item["pe"], item["pb"], f'{item["yield"]}%', item["cap"],
+                     "12.5%", "-3.1%", "8.0%", "6.2%"]
+            body.append("<tr>" + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+        compositions[industry_code] = (
+            f'<html><body><table class="table"><thead>{header}</thead>'
+            f'<tbody>{"".join(body)}</tbody></table></body></html>'
+        )
+    return quotes, overview, compositions
+
+def load_fixtures(fixtures_dir, quotes, compositions):
+    """
+    用录制好的真实响应覆盖模拟响应：
+    fixtures_dir/quote/<SYMBOL>.json、sw-industry-overview.html、index-composition/<行业代码>.html
+    """
+    overview = None
+    quote_dir = os.path.join(fixtures_dir, "quote")
+    if os.path.isdir(quote_dir):
+        for name in os.listdir(quote_dir):
+            with open(os.path.join(quote_dir, name), "r", encoding="utf-8") as f:
+                quotes[name[:-len(".json")]] = json.load(f)["data"]["quote"]
+    overview_file = os.path.join(fixtures_dir, "sw-industry-overview.html")
+    if os.path.exists(overview_file):
+        with open(overview_file, "r", encoding="utf-8") as f:
+            overview = f.read()
+    composition_dir = os.path.join(fixtures_dir, "index-composition")
+    if os.path.isdir(composition_dir):
+        for name in os.listdir(composition_dir):
+            with open(os.path.join(composition_dir, name), "r", encoding="utf-8") as f:
+                compositions[name[:-len(".html")]] = f.read()
+    return overview
+
+def dump_fixtures(fixtures_dir, quotes, overview, compositions):
+    """按 load_fixtures 的目录结构写出响应，可直接用于 legulegu_parser.py 的一致性校验和微基准"""
+    os.makedirs(os.path.join(fixtures_dir, "quote"), exist_ok=True)
+    os.makedirs(os.path.join(fixtures_dir, "index-composition"), exist_ok=True)
+    for symbol, quote in quotes.items():
+        with open(os.path.join(fixtures_dir, "quote", f"{symbol}.json"), "w", encoding="utf-8") as f:
+            json.dump({"data": {"quote": quote}}, f, ensure_ascii=False)
+    with open(os.path.join(fixtures_dir, "sw-industry-overview.html"), "w", encoding="utf-8") as f:
+        f.write(overview)
+    for industry_code, page in compositions.items():
+        with open(os.path.join(fixtures_dir, "index-composition", f"{industry_code}.html"), "w", encoding="utf-8") as f:
+            f.write(page)
+
+# ====================== 替身服务 ======================
+class StandinState:
+    """服务端配置与统计：延迟、错误率、全局限流（超出返回429）"""
+
+    def __init__(self, quotes, overview, compositions, latency_ms=0, jitter_ms=0, error_rate=0.0, max_rps=0):
+        self.quotes = quotes
+        self.overview = overview.encode("utf-8")
+        self.compositions = {k: v.encode("utf-8") for k, v in compositions.items()}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0}
+
+    def admit(self):
+        """按1秒窗口计数限流，返回是否放行"""
+        with self.lock:
+            self.stats["requests"] += 1
+            if not self.max_rps:
+                return True
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.window_count = now, 0
+            self.window_count += 1
+            if self.window_count > self.max_rps:
+                self.stats["throttled"] += 1
+                return False
+            return True
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # 支持keep-alive，与真实站点一致
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="application/json", extra_headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.server.state
+        delay = state.latency_ms + random.uniform(-state.jitter_ms, state.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+        if not state.admit():
+            return self._send(429, b'{"error":"rate limited"}', extra_headers={"Retry-After": "1"})
+        if state.error_rate and random.random() < state.error_rate:
+            with state.lock:
+                state.stats["errors"] += 1
+            return self._send(500, b'{"error":"injected"}')
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path in ("/", ""):
+            return self._send(200, b"<html></html>", "text/html", {"Set-Cookie": "xq_a_token=standin-token; Path=/"})
+        if url.path == "/v5/stock/quote.json":
+            quote = state.quotes.get(query.get("symbol", [""])[0])
+            if quote is None:
+                return self._send(200, b'{"data":{},"error_code":0}')
+            return self._send(200, json.dumps({"data": {"quote": quote}}, ensure_ascii=False).encode("utf-8"))
+        if url.path == "/v5/stock/batch/quote.json":
+            symbols = query.get("symbol", [""])[0].split(",")
+            items = [{"quote": state.quotes[s]} for s in symbols if s in state.quotes]
+            return self._send(200, json.dumps({"data": {"items": items}}, ensure_ascii=False).encode("utf-8"))
+        if url.path == "/stockdata/sw-industry-overview":
+            return self._send(200, state.overview, "text/html; charset=utf-8")
+        if url.path == "/stockdata/index-composition":
+            page = state.compositions.get(query.get("industryCode", [""])[0])
+            if page is None:
+                return self._send(404, b"not found", "text/plain")
+            # 支持 ETag 条件请求（验证缓存的重新验证路径），页面没变时返回304
+            etag = f'"{zlib.crc32(page):08x}"'
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, b"", "text/html; charset=utf-8", {"ETag": etag})
+            return self._send(200, page, "text/html; charset=utf-8", {"ETag": etag})
+        return self._send(404, b"not found", "text/plain")
+
+def make_server(n_stocks=1000, port=0, fixtures_dir=None, **behaviour):
+    quotes, overview, compositions = build_responses(make_universe(n_stocks))
+    if fixtures_dir:
+        overview = load_fixtures(fixtures_dir, quotes, compositions) or overview
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.daemon_threads = True
+    server.state = StandinState(quotes, overview, compositions, **behaviour)
+    return server
+
+def serve(n_stocks, port, ready=None, fixtures_dir=None, **behaviour):
+    """在当前进程中运行服务（供基准脚本以子进程方式启动）；ready 为 multiprocessing 队列，用于回传端口"""
+    server = make_server(n_stocks, port, fixtures_dir, **behaviour)
+    if ready is not None:
+        ready.put(server.server_port)
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="雪球/乐咕乐股本地替身服务")
+    parser.add_argument("--stocks", type=int, default=1000, help="模拟的股票数量")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--fixtures", default=None, help="录制响应目录，覆盖对应的模拟响应")
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=int, default=0, help="服务端限流阈值（次/秒），超出返回429，0为不限流")
+    parser.add_argument("--dump", default=None, help="只把模拟响应写入该目录（fixtures结构）后退出")
+    args = parser.parse_args()
+    if args.dump:
+        dump_fixtures(args.dump, *build_responses(make_universe(args.stocks)))
+        print(f"📁 模拟响应已写入 {args.dump}")
+        sys.exit(0)
+    server = make_server(args.stocks, args.port, args.fixtures, latency_ms=args.latency_ms,
+                         jitter_ms=args.jitter_ms, error_rate=args.error_rate, max_rps=args.max_rps)
+    print(f"🧪 替身服务已启动：http://127.0.0.1:{server.server_port}（{args.stocks} 支股票）")
+    print(f"   XQ_HOME_URL=http://127.0.0.1:{server.server_port}/ XQ_API_BASE=http://127.0.0.1:{server.server_port} "
+          f"LEGULEGU_BASE=http://127.0.0.1:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,256 @@
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from datetime import date, datetime
+from data_loader import decode_codes, encode_codes, read_source
+from history_store import DATASETS, PAYER_ONLY_DATASETS, list_dates, partition_file, read_partition
+from snapshot_writer import replace_file
+from trading_calendar import MARKET_TZ, now_market
+
+# ====================== 快照变化流（与前一个日期的快照对比） ======================
+# 每个数据集三个文件：
+# - data/change_feed/<数据集>.json：本次快照与基准相比的变化（几KB），看板和提醒脚本直接读取
+# - data/change_feed/<数据集>_baseline.parquet：基准，前一个日期最后一次快照的对比列（代码/名称/价格/市值/股息率）
+# - data/change_feed/<数据集>_latest.parquet：当天最后一次快照的对比列，日期变化后的第一次更新把它变为新的基准
+# 同一天多次更新都与同一个基准对比，变化流始终是日度变化
+# 对比为按 uint32 代码的一次外连接，全部变化类型都在连接后的数组上向量化判断，不逐行比较
+FEED_DIR = "data/change_feed"
+BASELINE_COLUMNS = ["代码", "名称", "最新价", "总市值(亿)", "股息率(%)"]
+YIELD_MOVE_THRESHOLD = 0.5   # 股息率变动阈值（百分点）
+PRICE_GAP_THRESHOLD = 5.0    # 价格跳变阈值（%）
+TOP_K = 20
+BIG_CAP = 1000               # 蓝筹榜的市值下限（亿），与看板「蓝筹高股息」一致
+MAX_EVENTS = 50              # 每类变化最多记录的条数（按变化幅度），计数不受限制
+DATE_COLUMN = "日期"          # 基准/当天快照文件中记录快照日期的列
+
+def feed_file(dataset, feed_dir=FEED_DIR):
+    return os.path.join(feed_dir, f"{dataset}.json")
+
+def baseline_file(dataset, feed_dir=FEED_DIR):
+    return os.path.join(feed_dir, f"{dataset}_baseline.parquet")
+
+def latest_file(dataset, feed_dir=FEED_DIR):
+    return os.path.join(feed_dir, f"{dataset}_latest.parquet")
+
+def _baseline_frame(snapshot):
+    """快照 -> 对比列（代码统一编码为 uint32，同一代码只保留第一行）"""
+    df = pd.DataFrame({
+        "代码": encode_codes(snapshot["代码"]),
+        "名称": snapshot["名称"].astype(str).str.replace(" ", "", regex=False).to_numpy(),
+        **{col: pd.to_numeric(snapshot[col], errors="coerce").to_numpy(dtype=np.float64)
+           for col in BASELINE_COLUMNS[2:]},
+    })
+    return df[df["代码"] > 0].drop_duplicates(subset=["代码"]).reset_index(drop=True)
+
+def _ranks(keys, yields, caps, min_cap=0):
+    """市值不低于 min_cap 的股息率前 TOP_K 名：{代码: 名次}"""
+    rows = np.flatnonzero((caps >= min_cap) & ~np.isnan(yields))
+    top = rows[np.argsort(-yields[rows], kind="stable")[:TOP_K]]
+    return dict(zip(keys[top].tolist(), range(1, len(top) + 1)))
+
+def _events(frame, mask, magnitude, columns):
+    """满足条件的行按变化幅度降序取前 MAX_EVENTS 条，代码还原为6位字符串"""
+    rows = np.flatnonzero(mask)
+    rows = rows[np.argsort(-np.abs(magnitude[rows]), kind="stable")[:MAX_EVENTS]]
+    events = frame.iloc[rows][columns].copy()
+    events["代码"] = decode_codes(events["代码"]).to_numpy()
+    return json.loads(events.round(3).to_json(orient="records", force_ascii=False))
+
+def _rank_changes(merged, prev_rank, cur_rank):
+    """进出榜单或名次变化的股票，按现名次排序（出榜的排在最后）"""
+    names = dict(zip(merged["代码"].tolist(), merged["名称"].tolist()))
+    changes = [
+        {"代码": f"{code:06d}", "名称": names.get(code, ""), "前名次": prev_rank.get(code), "现名次": cur_rank.get(code)}
+        for code in set(prev_rank) | set(cur_rank) if prev_rank.get(code) != cur_rank.get(code)
+    ]
+    return sorted(changes, key=lambda e: (e["现名次"] is None, e["现名次"] or 0, e["前名次"] or 0))
+
+def diff_snapshots(previous, current, yield_threshold=YIELD_MOVE_THRESHOLD, price_threshold=PRICE_GAP_THRESHOLD,
+                   payers_only=False):
+    """
+    previous / current：两份快照（原始、紧凑或基准表均可）
+    payers_only：快照只含分红股票（如申万），新进快照即新增分红、移出快照即停止分红
+    返回变化流：股息率变动、新增/停止分红、Top20与蓝筹榜名次变化、价格跳变、进出快照的代码数
+    """
+    prev, cur = _baseline_frame(previous), _baseline_frame(current)
+    merged = prev.merge(cur, on="代码", how="outer", suffixes=("_前", ""), indicator=True)
+    merged["名称"] = merged["名称"].fillna(merged["名称_前"])
+    both = (merged["_merge"] == "both").to_numpy()
+    left_only, right_only = (merged["_merge"] == "left_only").to_numpy(), (merged["_merge"] == "right_only").to_numpy()
+    y0, y1 = merged["股息率(%)_前"].to_numpy(), merged["股息率(%)"].to_numpy()
+    p0, p1 = merged["最新价_前"].to_numpy(), merged["最新价"].to_numpy()
+    paid0, paid1 = np.nan_to_num(y0) > 0, np.nan_to_num(y1) > 0
+
+    if payers_only:
+        # 不在快照里的一侧按股息率0计算变动，名次仍只看快照里的股票
+        merged["股息率变动"] = np.where(left_only, 0.0, y1) - np.where(right_only, 0.0, y0)
+    else:
+        merged["股息率变动"] = y1 - y0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        merged["涨跌幅(%)"] = np.where(p0 > 0, (p1 / p0 - 1) * 100, np.nan)
+    yield_move = both & (np.abs(np.nan_to_num(merged["股息率变动"].to_numpy())) >= yield_threshold)
+    new_payer = both & paid1 & ~paid0
+    removed_payer = both & paid0 & ~paid1
+    if payers_only:
+        new_payer |= right_only
+        removed_payer |= left_only
+    price_gap = both & (np.abs(np.nan_to_num(merged["涨跌幅(%)"].to_numpy())) >= price_threshold)
+
+    keys = merged["代码"].to_numpy()
+    caps0, caps1 = merged["总市值(亿)_前"].to_numpy(), merged["总市值(亿)"].to_numpy()
+    rank_changes = {
+        "top": _rank_changes(merged, _ranks(keys, y0, caps0), _ranks(keys, y1, caps1)),
+        "big_cap": _rank_changes(merged, _ranks(keys, y0, caps0, BIG_CAP), _ranks(keys, y1, caps1, BIG_CAP)),
+    }
+    yield_columns = ["代码", "名称", "股息率(%)_前", "股息率(%)", "股息率变动", "最新价"]
+    return {
+        "summary": {
+            "股票数": int(len(cur)),
+            "新进快照": int(right_only.sum()),
+            "移出快照": int(left_only.sum()),
+            "股息率变动": int(yield_move.sum()),
+            "新增分红": int(new_payer.sum()),
+            "停止分红": int(removed_payer.sum()),
+            "Top20名次变化": len(rank_changes["top"]),
+            "蓝筹榜名次变化": len(rank_changes["big_cap"]),
+            "价格跳变": int(price_gap.sum()),
+        },
+        "thresholds": {"yield_move": yield_threshold, "price_gap": price_threshold, "top_k": TOP_K, "big_cap": BIG_CAP},
+        "yield_moves": _events(merged, yield_move, merged["股息率变动"].to_numpy(), yield_columns),
+        "new_payers": _events(merged, new_payer, np.nan_to_num(y1), yield_columns),
+        "removed_payers": _events(merged, removed_payer, np.nan_to_num(y0), yield_columns),
+        "rank_changes": rank_changes,
+        "price_gaps": _events(merged, price_gap, merged["涨跌幅(%)"].to_numpy(),
+                              ["代码", "名称", "最新价_前", "最新价", "涨跌幅(%)", "股息率(%)"]),
+    }
+
+def _atomic_write(path, write):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    os.close(fd)
+    try:
+        write(tmp_path)
+        replace_file(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _write_json(data, path):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+    _atomic_write(path, write)
+
+def load_feed(dataset="xueqiu", feed_dir=FEED_DIR):
+    """读取变化流；还没有生成过时返回 None"""
+    try:
+        with open(feed_file(dataset, feed_dir), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def _read_dated(path):
+    """读取基准/当天快照文件，返回 (对比列, 快照日期)；文件不存在时返回 (None, None)"""
+    if not os.path.exists(path):
+        return None, None
+    df = read_partition(path)
+    if DATE_COLUMN in df and len(df):
+        day = date.fromisoformat(str(df[DATE_COLUMN].iloc[0]))
+    else:
+        # 旧版基准文件没有日期列，按写入时间
+        day = datetime.fromtimestamp(os.stat(path).st_mtime, MARKET_TZ).date()
+    return df.drop(columns=[DATE_COLUMN], errors="ignore"), day
+
+def _write_dated(frame, day, path):
+    frame = frame.assign(**{DATE_COLUMN: day.isoformat()})
+    _atomic_write(path, lambda tmp_path: frame.to_parquet(tmp_path, index=False, compression="zstd"))
+
+def update_feed(snapshot, dataset, feed_dir=FEED_DIR, day=None, previous=None, previous_day=None):
+    """
+    与基准（前一个日期最后一次快照）对比写出变化流，再把本次快照记为 day 这一天的最新快照；返回变化流
+    day 默认为北京时间的今天；day 晚于当天快照文件的日期时，先把该文件变为新的基准
+    previous / previous_day：直接指定基准及其日期（从历史库重建时使用），同时写为基准文件
+    还没有基准时变化流为空
+    """
+    now = datetime.now().isoformat(timespec="seconds")
+    day = day or now_market().date()
+    baseline_path, latest_path = baseline_file(dataset, feed_dir), latest_file(dataset, feed_dir)
+    if previous is None:
+        latest, latest_day = _read_dated(latest_path)
+        if latest is not None and latest_day < day:
+            os.replace(latest_path, baseline_path)
+        previous, previous_day = _read_dated(baseline_path)
+    else:
+        previous = _baseline_frame(previous)
+        _write_dated(previous, previous_day, baseline_path)
+    current = _baseline_frame(snapshot)
+    feed = {"dataset": dataset, "generated_at": now,
+            "previous_at": previous_day.isoformat() if previous is not None else None}
+    if previous is not None:
+        feed.update(diff_snapshots(previous, current, payers_only=dataset in PAYER_ONLY_DATASETS))
+    else:
+        feed["summary"] = {"股票数": int(len(current))}
+    _write_json(feed, feed_file(dataset, feed_dir))
+    _write_dated(current, day, latest_path)
+    return feed
+
+def update_change_feed(snapshot, dataset):
+    """更新脚本调用的入口：写出变化流，失败只提示，不影响快照"""
+    try:
+        feed = update_feed(snapshot, dataset)
+        changes = {k: v for k, v in feed["summary"].items() if k != "股票数" and v}
+        print(f"🔔 变化流已更新：{changes if changes else '与前一日相比没有显著变化'}")
+        return feed
+    except Exception as e:
+        print(f"⚠️ 更新变化流失败：{e}")
+        return None
+
+def rebuild_from_history(dataset):
+    """用历史库最近两个日期分区重新生成变化流（首次启用时没有基准）"""
+    dates = list_dates(dataset)
+    if len(dates) < 2:
+        return None
+    previous = read_partition(partition_file(dataset, dates[-2]))
+    current = read_partition(partition_file(dataset, dates[-1]))
+    return update_feed(current, dataset, day=dates[-1], previous=previous, previous_day=dates[-2])
+
+def _print_feed(feed):
+    print(f"🔔 {feed['dataset']}：{feed.get('previous_at')} -> {feed['generated_at']}")
+    print(feed["summary"])
+    sections = [("yield_moves", "股息率变动"), ("new_payers", "新增分红"), ("removed_payers", "停止分红"),
+                ("price_gaps", "价格跳变")]
+    for key, label in sections:
+        if feed.get(key):
+            print(f"\n{label}：")
+            print(pd.DataFrame(feed[key]).to_string(index=False))
+    for key, label in (("top", f"Top{TOP_K}"), ("big_cap", "蓝筹榜")):
+        if feed.get("rank_changes", {}).get(key):
+            print(f"\n{label}名次变化：")
+            print(pd.DataFrame(feed["rank_changes"][key]).to_string(index=False))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="快照变化流：与前一个日期的快照对比")
+    parser.add_argument("--dataset", choices=list(DATASETS), default="xueqiu")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), default=None,
+                        help="直接对比两个快照文件（CSV或Parquet），只打印不写文件")
+    parser.add_argument("--from-history", action="store_true", help="用历史库最近两个分区重新生成变化流")
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (read_source(path) for path in args.compare)
+        feed = {"dataset": args.dataset, "generated_at": args.compare[1], "previous_at": args.compare[0],
+                **diff_snapshots(old, new, payers_only=args.dataset in PAYER_ONLY_DATASETS)}
+    elif args.from_history:
+        feed = rebuild_from_history(args.dataset)
+        if feed is None:
+            print(f"⚠️ {args.dataset} 历史库不足两个日期分区")
+    else:
+        feed = load_feed(args.dataset)
+        if feed is None:
+            print(f"⚠️ 还没有 {args.dataset} 的变化流，运行一次更新脚本后生成")
+    if feed is not None:
+        _print_feed(feed)
@@ -0,0 +1,155 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+from history_store import DATASETS, latest_partition, load_history, read_partition
+from symbol_master import EXCHANGE_PREFIXES, exchanges_of, normalize_codes
+
+# ====================== 紧凑类型的快照加载 ======================
+# 看板、选股、历史分析共用的读取入口，统一转换为紧凑类型：
+# - 代码：6位数字直接存为 uint32（000937 -> 937），另加一列「交易所」分类（SH/SZ/BJ）
+# - 名称、申万1/2/3级：Arrow 字符串（连续内存，不再是一个个Python对象）；重复值多的列（行业、多日历史中的名称）
+#   再转为 category，只存一份类别；单日快照的名称几乎不重复，category 的类别哈希表反而更大
+# - 价格、市值、股息率、估值：float32
+# 展示前用 to_display 还原为6位代码字符串和 float64
+CODE_COLUMN = "代码"
+EXCHANGE_COLUMN = "交易所"
+EXCHANGES = [exchange for exchange, _ in EXCHANGE_PREFIXES]
+TEXT_COLUMNS = ["名称", "申万1级", "申万2级", "申万3级"]
+FLOAT_COLUMNS = ["最新价", "总市值(亿)", "股息率(%)", "市盈率ttm", "市净率"]
+# 不同取值数 / 行数 不超过该比例时使用 category
+CATEGORY_MAX_RATIO = 0.5
+
+def encode_codes(codes):
+    """任意写法的代码（937 / 000937.SZ / SZ000937）-> uint32 数组，无法识别的记为0"""
+    digits = normalize_codes(codes)
+    return pd.to_numeric(digits.where(digits != "", "0")).to_numpy(dtype=np.uint32)
+
+def decode_codes(codes):
+    """uint32 代码 -> 6位字符串Series（保留原索引）"""
+    codes = pd.Series(codes)
+    return codes.astype(np.int64).astype(str).str.zfill(6)
+
+def _strings(series):
+    """文本列：Arrow 字符串，重复值多时转为类别为 Arrow 字符串的 category"""
+    values = series.astype("string[pyarrow]")
+    if values.nunique() > CATEGORY_MAX_RATIO * max(len(values), 1):
+        return values
+    categories = pd.Index(values.dropna().unique(), dtype="string[pyarrow]").sort_values()
+    return pd.Series(pd.Categorical(values, categories=categories), index=series.index)
+
+def compact_frame(df):
+    """把一份快照（或多日历史）转换为紧凑类型，返回新表；不认识的列原样保留"""
+    df = df.reset_index(drop=True)
+    out = {}
+    for col in df.columns:
+        if col == CODE_COLUMN:
+            digits = normalize_codes(df[col])
+            out[col] = pd.to_numeric(digits.where(digits != "", "0")).astype(np.uint32)
+            out[EXCHANGE_COLUMN] = pd.Categorical(exchanges_of(digits), categories=EXCHANGES)
+        elif col == "名称":
+            out[col] = _strings(df[col].astype(str).str.replace(" ", "", regex=False).where(df[col].notna()))
+        elif col in TEXT_COLUMNS:
+            out[col] = _strings(df[col])
+        elif col in FLOAT_COLUMNS:
+            out[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float32)
+        else:
+            out[col] = df[col]
+    return pd.DataFrame(out)
+
+def drop_unknown_codes(df):
+    """
+    剔除紧凑表中代码无法识别（编码为0）的行，返回 (剩余行, 剔除行数)
+    按代码去重之前必须先剔除，否则这些互不相关的行会被合并成一行
+    """
+    known = df[CODE_COLUMN].to_numpy() > 0
+    return df[known], int((~known).sum())
+
+def restore_floats(values):
+    """float32 数组 -> float64：经最短十进制表示转换（2255.19 而不是 2255.18994140625），消除单精度的尾数误差"""
+    return np.asarray(values, dtype=np.float32).astype(str).astype(np.float64)
+
+def to_display(df):
+    """紧凑表 -> 展示用：代码还原为6位字符串、去掉交易所列、float32 还原为 float64（只对要展示的几十行调用）"""
+    df = df.copy()
+    if CODE_COLUMN in df and pd.api.types.is_integer_dtype(df[CODE_COLUMN]):
+        df[CODE_COLUMN] = decode_codes(df[CODE_COLUMN])
+    df = df.drop(columns=[EXCHANGE_COLUMN], errors="ignore")
+    for col in df.columns:
+        if df[col].dtype == np.float32:
+            df[col] = restore_floats(df[col])
+    return df
+
+def resolve_source(dataset, csv_file=None):
+    """数据源：历史库最新分区不旧于CSV时读取Parquet分区（内存映射，毫秒级），否则回退到CSV"""
+    csv_file = csv_file or DATASETS[dataset]
+    _, partition = latest_partition(dataset)
+    if partition is None:
+        return csv_file
+    try:
+        if os.stat(partition).st_mtime_ns < os.stat(csv_file).st_mtime_ns:
+            return csv_file
+    except FileNotFoundError:
+        pass
+    return partition
+
+def read_source(source):
+    """读取单个快照文件（Parquet分区或CSV），代码列按字符串读取，防止丢失开头的0"""
+    if source.endswith(".parquet"):
+        return read_partition(source)
+    return pd.read_csv(source, dtype={CODE_COLUMN: str})
+
+def load_snapshot(dataset, csv_file=None, compact=True):
+    """读取数据集当前快照（历史库最新分区或CSV），默认转换为紧凑类型并剔除代码无法识别的行"""
+    df = read_source(resolve_source(dataset, csv_file))
+    if not compact:
+        return df
+    df, dropped = drop_unknown_codes(compact_frame(df))
+    if dropped:
+        print(f"⚠️ {dataset} 快照中有 {dropped} 行代码无法识别，已忽略")
+    return df
+
+def load_history_frame(dataset, columns=None, start=None, end=None, codes=None, industries=None):
+    """读取多日历史并转换为紧凑类型（参数同 history_store.load_history）"""
+    return compact_frame(load_history(dataset, columns, start, end, codes, industries))
+
+def memory_report(df):
+    """各列内存占用（字节，含字符串/类别本身）"""
+    usage = df.memory_usage(deep=True)
+    return {"rows": len(df), "bytes": int(usage.sum()), "columns": {col: int(v) for col, v in usage.items()}}
+
+def compare_memory(raw, compact=None):
+    """原始表与紧凑表的内存对比，返回 (原始报告, 紧凑报告, 倍数)"""
+    compact = compact_frame(raw) if compact is None else compact
+    before, after = memory_report(raw), memory_report(compact)
+    return before, after, before["bytes"] / max(after["bytes"], 1)
+
+def _print_comparison(label, before, after, ratio):
+    print(f"📦 {label}：{before['rows']} 行，{before['bytes'] / 1024:,.1f} KB -> {after['bytes'] / 1024:,.1f} KB（{ratio:.1f}x）")
+    for col, size in after["columns"].items():
+        print(f"   {col:<12} {before['columns'].get(col, 0):>12,} -> {size:>10,}")
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="紧凑类型快照加载：对比原始读取与紧凑表的内存占用")
+    parser.add_argument("--dataset", choices=list(DATASETS), nargs="*", default=list(DATASETS))
+    parser.add_argument("--history", action="store_true", help="同时对比历史库全部分区")
+    parser.add_argument("--min-ratio", type=float, default=0, help="任一对比的内存缩减倍数低于该值时以非0状态退出")
+    args = parser.parse_args()
+
+    ratios = []
+    for dataset in args.dataset:
+        csv_file = DATASETS[dataset]
+        if os.path.exists(csv_file):
+            before, after, ratio = compare_memory(pd.read_csv(csv_file, dtype={CODE_COLUMN: str}))
+            _print_comparison(csv_file, before, after, ratio)
+            ratios.append(ratio)
+        if args.history:
+            raw = load_history(dataset)
+            if len(raw):
+                before, after, ratio = compare_memory(raw)
+                _print_comparison(f"{dataset} 历史库", before, after, ratio)
+                ratios.append(ratio)
+    if args.min_ratio and any(ratio < args.min_ratio for ratio in ratios):
+        print(f"❌ 内存缩减倍数低于 {args.min_ratio}x")
+        sys.exit(1)
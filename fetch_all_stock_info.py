@@ -38,5 +38,5 @@ if __name__ == "__main__":
         print(f"股票代码列表示例：{code_list[:5]}")
         
         # 可选：将数据保存为CSV文件，方便后续使用
-        a_stock_codes.to_csv("a_stock_codes.csv", index=False, encoding="utf-8")
-        print("\n数据已保存为 a_stock_codes.csv 文件")
\ No newline at end of file
+        a_stock_codes.to_csv("data/a_stock_codes.csv", index=False, encoding="utf-8")
+        print("\n数据已保存为 data/a_stock_codes.csv 文件（代码主表 symbol_master 从此文件加载）")
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import re
+import tempfile
+from datetime import date, datetime
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+from snapshot_writer import replace_file
+from symbol_master import normalize_codes
+from trading_calendar import now_market
+
+# ====================== 快照历史库（按日期分区的Parquet） ======================
+# 目录结构：data/history/<数据集>/date=YYYY-MM-DD/snapshot.parquet
+# 每个日期一个分区，同一天多次运行覆盖当天分区（保留当天最新快照），不同日期只追加不改写
+HISTORY_DIR = "data/history"
+DATASETS = {
+    "xueqiu": "data/dividend_data.csv",
+    "xueqiu_all": "data/dividend_data_all.csv",   # 雪球全市场（update_data.py --universe all），与自选股快照分开
+    "shenwan": "data/dividend_data_shenwan.csv",
+}
+# 只保存分红股（股息率>0）的数据集：某只股票不在快照中即表示本期没有分红
+PAYER_ONLY_DATASETS = {"shenwan"}
+PARTITION_FILE = "snapshot.parquet"
+_PARTITION_RE = re.compile(r"^date=(\d{4}-\d{2}-\d{2})$")
+# 行业筛选使用的列（只有申万数据集有）
+INDUSTRY_COLUMN = "申万3级"
+
+def dataset_dir(dataset, history_dir=HISTORY_DIR):
+    return os.path.join(history_dir, dataset)
+
+def partition_file(dataset, day, history_dir=HISTORY_DIR):
+    return os.path.join(dataset_dir(dataset, history_dir), f"date={day.isoformat()}", PARTITION_FILE)
+
+def _to_table(df):
+    """统一列类型（代码为6位字符串、数值列一律float64、其余为字符串），保证不同日期分区的schema一致"""
+    df = df.reset_index(drop=True).copy()
+    if "代码" in df.columns:
+        df["代码"] = normalize_codes(df["代码"])
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) and col != "代码":
+            df[col] = df[col].astype("float64")
+        else:
+            # 普通object字符串：读回时不必转换为pandas的string扩展类型，读取更快
+            df[col] = df[col].astype(str).where(df[col].notna(), None)
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def append_snapshot(df, dataset, day=None, history_dir=HISTORY_DIR):
+    """
+    把一份完整快照写入当天的分区（先写临时文件再原子替换），返回分区文件路径
+    day 默认为北京时间的今天；同一天重复写入时覆盖当天分区
+    """
+    day = day or now_market().date()
+    path = partition_file(dataset, day, history_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_", suffix=".parquet")
+    os.close(fd)
+    try:
+        pq.write_table(_to_table(df), tmp_path, compression="zstd")
+        replace_file(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def save_history(df, dataset, day=None):
+    """更新脚本调用的入口：写入失败只提示，不影响CSV快照"""
+    try:
+        path = append_snapshot(df, dataset, day)
+        print(f"🗄️ 快照已归档到历史库 {path}")
+        return path
+    except Exception as e:
+        print(f"⚠️ 写入历史库失败：{e}")
+        return None
+
+def list_dates(dataset, history_dir=HISTORY_DIR):
+    """已有分区的日期（升序）"""
+    root = dataset_dir(dataset, history_dir)
+    if not os.path.isdir(root):
+        return []
+    dates = []
+    for name in os.listdir(root):
+        match = _PARTITION_RE.match(name)
+        if match and os.path.exists(os.path.join(root, name, PARTITION_FILE)):
+            dates.append(date.fromisoformat(match.group(1)))
+    return sorted(dates)
+
+def latest_partition(dataset, history_dir=HISTORY_DIR):
+    """最新日期分区的 (日期, 文件路径)，没有历史时返回 (None, None)"""
+    dates = list_dates(dataset, history_dir)
+    if not dates:
+        return None, None
+    return dates[-1], partition_file(dataset, dates[-1], history_dir)
+
+def read_partition(path, columns=None):
+    """内存映射读取单个分区（列投影只解码需要的列）"""
+    return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+
+def load_latest(dataset, columns=None, history_dir=HISTORY_DIR):
+    _, path = latest_partition(dataset, history_dir)
+    if path is None:
+        return pd.DataFrame(columns=columns)
+    return read_partition(path, columns)
+
+def open_dataset(dataset, history_dir=HISTORY_DIR):
+    """按 hive 风格 date=YYYY-MM-DD 目录识别分区的 pyarrow Dataset（内存映射读取）"""
+    return ds.dataset(
+        dataset_dir(dataset, history_dir),
+        format="parquet",
+        partitioning=ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive"),
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+        exclude_invalid_files=True,
+    )
+
+def _as_date_str(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+def build_filter(start=None, end=None, codes=None, industries=None):
+    """日期/代码/行业的谓词：日期条件只作用于分区目录，不会打开范围外的文件"""
+    conditions = []
+    if start is not None:
+        conditions.append(ds.field("date") >= _as_date_str(start))
+    if end is not None:
+        conditions.append(ds.field("date") <= _as_date_str(end))
+    if codes is not None:
+        conditions.append(ds.field("代码").isin([str(c) for c in codes]))
+    if industries is not None:
+        conditions.append(ds.field(INDUSTRY_COLUMN).isin(list(industries)))
+    result = None
+    for condition in conditions:
+        result = condition if result is None else result & condition
+    return result
+
+def load_history(dataset, columns=None, start=None, end=None, codes=None, industries=None,
+                 history_dir=HISTORY_DIR):
+    """
+    读取多个日期分区：columns 为列投影（自动带上 date 列），start/end/codes/industries 为谓词下推条件
+    返回的 date 列为 datetime64，按日期、代码排序
+    """
+    if not list_dates(dataset, history_dir):
+        return pd.DataFrame(columns=(list(columns) if columns else []) + ["date"])
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ["date"]))
+    table = open_dataset(dataset, history_dir).to_table(
+        columns=columns, filter=build_filter(start, end, codes, industries)
+    )
+    df = table.to_pandas()
+    df["date"] = pd.to_datetime(df["date"])
+    sort_by = ["date", "代码"] if "代码" in df.columns else ["date"]
+    return df.sort_values(sort_by, kind="stable").reset_index(drop=True)
+
+def yield_series(codes, dataset="xueqiu", start=None, end=None, history_dir=HISTORY_DIR):
+    """若干股票的股息率时间序列（行为日期、列为代码）"""
+    df = load_history(dataset, columns=["代码", "股息率(%)"], start=start, end=end, codes=codes,
+                      history_dir=history_dir)
+    return df.pivot_table(index="date", columns="代码", values="股息率(%)")
+
+def import_csv(dataset, day=None, history_dir=HISTORY_DIR):
+    """把当前的CSV快照导入历史库（首次启用历史库时补一份当天的分区）"""
+    df = pd.read_csv(DATASETS[dataset], dtype={"代码": str})
+    return append_snapshot(df, dataset, day, history_dir)
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    parser = argparse.ArgumentParser(description="快照历史库（按日期分区的Parquet）")
+    parser.add_argument("--import-csv", choices=list(DATASETS), help="把当前CSV快照导入为今天的分区")
+    parser.add_argument("--dataset", choices=list(DATASETS), default="xueqiu")
+    parser.add_argument("--series", nargs="*", help="打印指定代码的股息率时间序列")
+    args = parser.parse_args()
+    if args.import_csv:
+        print(f"🗄️ 已导入 {import_csv(args.import_csv)}")
+    dates = list_dates(args.dataset)
+    print(f"📅 {args.dataset}：{len(dates)} 个日期分区" + (f"（{dates[0]} ~ {dates[-1]}）" if dates else ""))
+    if dates:
+        start = time.perf_counter()
+        latest = load_latest(args.dataset)
+        print(f"⏱️ 读取最新分区 {len(latest)} 行耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    if args.series:
+        print(yield_series(args.series, args.dataset))
@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+import requests
+from urllib.parse import urlparse
+from http_client import get_with_retry
+from run_metrics import current_metrics
+
+# ====================== 磁盘HTTP缓存配置 ======================
+CACHE_DIR = "data/http_cache"
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# 按URL匹配的缓存有效期（秒），未匹配的URL不缓存；0 表示每次都带 ETag/Last-Modified 条件请求重新验证，
+# 内容没变时服务端只回304，省下的是下载和解析，而不会返回过时的数据
+ENDPOINT_TTLS = [
+    (re.compile(r"^https?://xueqiu\.com/?$"), 6 * 3600),                          # 首页，仅用于获取token cookie
+    (re.compile(r"legulegu\.com/stockdata/sw-industry-overview"), 12 * 3600),     # 申万行业列表
+    (re.compile(r"legulegu\.com/stockdata/index-composition"), 0),                # 行业成份股（含价格和股息率）
+    (re.compile(r"stock\.xueqiu\.com/v5/stock/"), 60),                            # 实时行情，仅防止短时间内重复请求
+]
+OFFLINE_ENV = "DIVIDEND_HTTP_OFFLINE"
+
+class CacheMissError(requests.ConnectionError):
+    """离线模式下缓存未命中"""
+
+class CachedResponse:
+    """与 requests.Response 用法一致的最小实现（text/content/json/cookies/status_code/raise_for_status）"""
+
+    def __init__(self, url, status_code, content, headers, cookies, from_cache):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.cookies = cookies
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+class HttpCache:
+    """
+    按URL缓存响应到磁盘：过期后带 ETag/Last-Modified 条件请求重新验证，总大小超限时按最近使用时间淘汰
+    offline=True 时只读缓存（忽略有效期），未命中抛出 CacheMissError
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, ttls=None, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.cache_dir = cache_dir
+        self.ttls = ENDPOINT_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def ttl_for(self, url):
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return None
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.body"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load(self, url):
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+        return meta, body
+
+    def _store(self, url, meta, body):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        body_path, meta_path = self._paths(url)
+        with self._lock:
+            old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+            # 先写正文再写元数据，元数据存在即代表条目完整
+            for path, data, mode in ((body_path, body, "wb"), (meta_path, json.dumps(meta, ensure_ascii=False), "w")):
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, mode, **({} if mode == "wb" else {"encoding": "utf-8"})) as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            self._total_bytes = self._current_total() + len(body) - old_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _touch(self, url):
+        # 用正文文件的mtime记录最近使用时间，供LRU淘汰
+        body_path, _ = self._paths(url)
+        try:
+            os.utime(body_path, None)
+        except OSError:
+            pass
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".body"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _current_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        return self._total_bytes
+
+    def _evict(self):
+        """按最近使用时间从旧到新删除，直到总大小降到上限的90%"""
+        target = self.max_bytes * 0.9
+        total = sum(size for _, size, _ in self._entries())
+        for _, size, path in sorted(self._entries()):
+            if total <= target:
+                break
+            for p in (path, path[:-len(".body")] + ".json"):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+        self._total_bytes = total
+
+    def _response(self, url, meta, body, from_cache):
+        return CachedResponse(url, meta["status_code"], body, meta.get("headers", {}),
+                              meta.get("cookies", {}), from_cache)
+
+    def get(self, url, session=None, ttl=None, limiter=None, use_cache=True, **kwargs):
+        """
+        带缓存的GET：ttl 为空时按 ENDPOINT_TTLS 匹配，未匹配的URL直接请求不缓存
+        limiter：只在真正发起网络请求前限速，命中缓存不占用请求额度
+        use_cache=False：直接请求，不读也不写缓存（常驻刷新的行情每次都要最新的，落盘只会挤掉其他缓存条目）
+        网络请求失败（429/5xx/超时）时按指数退避+抖动重试
+        """
+        ttl = (self.ttl_for(url) if ttl is None else ttl) if use_cache else None
+        session_get = session.get if session is not None else requests.get
+
+        def getter(request_url, **kw):
+            return get_with_retry(session_get, request_url, limiter=limiter, **kw)
+
+        if ttl is None:
+            if self.offline:
+                raise CacheMissError(f"离线模式下不缓存的URL：{url}")
+            return getter(url, **kwargs)
+
+        host = urlparse(url).netloc or "default"
+        meta, body = self._load(url)
+        if meta is not None and (self.offline or time.time() - meta["fetched_at"] < ttl):
+            self._touch(url)
+            current_metrics().incr("cache", host=host, result="hit")
+            return self._response(url, meta, body, from_cache=True)
+        if self.offline:
+            current_metrics().incr("errors", host=host, type="offline_miss")
+            raise CacheMissError(f"离线模式下缓存未命中：{url}")
+
+        # 过期条目带条件请求头重新验证
+        headers = dict(kwargs.pop("headers", None) or {})
+        if meta is not None:
+            if meta["headers"].get("ETag"):
+                headers["If-None-Match"] = meta["headers"]["ETag"]
+            if meta["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = meta["headers"]["Last-Modified"]
+        r = getter(url, headers=headers, **kwargs)
+        if r.status_code == 304 and meta is not None:
+            meta["fetched_at"] = time.time()
+            self._store(url, meta, body)
+            current_metrics().incr("cache", host=host, result="revalidated")
+            return self._response(url, meta, body, from_cache=True)
+        current_metrics().incr("cache", host=host, result="miss")
+        if r.status_code == 200:
+            meta = {
+                "url": url,
+                "status_code": r.status_code,
+                "fetched_at": time.time(),
+                "headers": {k: r.headers[k] for k in ("ETag", "Last-Modified", "Content-Type") if k in r.headers},
+                "cookies": r.cookies.get_dict(),
+            }
+            self._store(url, meta, r.content)
+        return r
+
+_default_cache = None
+
+def get_cache():
+    """进程内共享的默认缓存实例（环境变量 DIVIDEND_HTTP_OFFLINE=1 时为离线模式）"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = HttpCache(offline=os.environ.get(OFFLINE_ENV) == "1")
+    return _default_cache
+
+def set_offline(offline=True):
+    """切换默认缓存的离线模式，同时写入环境变量让子进程保持一致"""
+    os.environ[OFFLINE_ENV] = "1" if offline else "0"
+    get_cache().offline = offline
+
+def cached_get(url, session=None, ttl=None, limiter=None, use_cache=True, **kwargs):
+    return get_cache().get(url, session=session, ttl=ttl, limiter=limiter, use_cache=use_cache, **kwargs)
@@ -0,0 +1,157 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from run_metrics import current_metrics
+
+# ====================== 公共HTTP配置 ======================
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+def make_session(pool_size=10, headers=None):
+    """创建共享Session：复用keep-alive连接，连接池大小与并发数保持一致"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": DEFAULT_USER_AGENT})
+    if headers:
+        session.headers.update(headers)
+    return session
+
+# 需要退避重试的状态码：限流和服务端错误
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(requests.ConnectionError):
+    """某个host连续失败过多，熔断期内直接拒绝请求"""
+
+class _HostState:
+    __slots__ = ("rate", "tokens", "updated", "failures", "open_until")
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.failures = 0
+        self.open_until = 0.0
+
+class RateLimiter:
+    """
+    按host区分的自适应令牌桶（线程安全）：
+    - 初始速率 rate 次/秒（<=0 表示不限速，只保留熔断），桶容量 burst
+    - 请求成功时速率线性回升（最多到 max_rate），429/5xx/超时时速率减半（不低于 min_rate）
+    - 连续失败 failure_threshold 次后熔断 cooldown 秒，期间 wait 直接抛出 CircuitOpenError
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.2, max_rate=None,
+                 failure_threshold=5, cooldown=60.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else (rate * 2 if rate and rate > 0 else None)
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.rate, self.burst)
+        return state
+
+    def current_rate(self, host="default"):
+        with self._lock:
+            return self._state(host).rate
+
+    def wait(self, host="default"):
+        while True:
+            with self._lock:
+                state = self._state(host)
+                now = time.monotonic()
+                if state.open_until > now:
+                    raise CircuitOpenError(f"{host} 连续失败 {state.failures} 次，熔断中（剩余 {state.open_until - now:.0f} 秒）")
+                if not self.rate or self.rate <= 0:
+                    return
+                state.tokens = min(self.burst, state.tokens + (now - state.updated) * state.rate)
+                state.updated = now
+                if state.tokens >= 1:
+                    state.tokens -= 1
+                    return
+                delay = (1 - state.tokens) / state.rate
+            time.sleep(delay)
+
+    def record_success(self, host="default"):
+        with self._lock:
+            state = self._state(host)
+            state.failures = 0
+            if self.rate and self.rate > 0:
+                # 加性增：每次成功提升初始速率的5%
+                state.rate = min(self.max_rate, state.rate + self.rate * 0.05)
+
+    def record_failure(self, host="default"):
+        with self._lock:
+            state = self._state(host)
+            state.failures += 1
+            if self.rate and self.rate > 0:
+                # 乘性减：速率减半
+                state.rate = max(self.min_rate, state.rate * 0.5)
+            if state.failures >= self.failure_threshold:
+                state.open_until = time.monotonic() + self.cooldown
+                print(f"🚫 {host} 连续失败 {state.failures} 次，熔断 {self.cooldown:.0f} 秒")
+
+def _retry_delay(attempt, backoff, response=None):
+    """指数退避+随机抖动；服务端给出 Retry-After 时以其为准"""
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+def get_with_retry(get, url, limiter=None, retries=3, backoff=0.5, **kwargs):
+    """
+    通过 get(url, **kwargs) 发请求：429/5xx/超时/连接错误时退避重试，并把结果反馈给限速器
+    熔断中的host直接抛出 CircuitOpenError，不再浪费重试
+    每次尝试的耗时、状态码、下载字节数、重试和错误类型都记入当前任务的运行指标
+    """
+    host = urlparse(url).netloc or "default"
+    metrics = current_metrics()
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            try:
+                limiter.wait(host)
+            except CircuitOpenError:
+                metrics.incr("errors", host=host, type="circuit_open")
+                raise
+        start = time.perf_counter()
+        try:
+            r = get(url, **kwargs)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            metrics.observe_latency(host, time.perf_counter() - start)
+            error_type = "timeout" if isinstance(e, requests.Timeout) else "connection"
+            metrics.incr("errors", host=host, type=error_type)
+            if limiter is not None:
+                limiter.record_failure(host)
+            if attempt == retries:
+                raise
+            metrics.incr("retries", host=host, reason=error_type)
+            time.sleep(_retry_delay(attempt, backoff))
+            continue
+        metrics.observe_latency(host, time.perf_counter() - start)
+        metrics.incr("requests", host=host, status=str(r.status_code))
+        metrics.incr("bytes_downloaded", len(r.content or b""), host=host)
+        if r.status_code in RETRY_STATUS:
+            metrics.incr("errors", host=host, type=f"http_{r.status_code}")
+            if limiter is not None:
+                limiter.record_failure(host)
+            if attempt == retries:
+                return r
+            metrics.incr("retries", host=host, reason=f"http_{r.status_code}")
+            time.sleep(_retry_delay(attempt, backoff, r))
+            continue
+        if limiter is not None:
+            limiter.record_success(host)
+        return r
@@ -0,0 +1,198 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from history_store import read_partition
+from snapshot_writer import replace_file
+from symbol_master import normalize_codes
+
+# ====================== 申万行业汇总（抓取时物化） ======================
+# 申万抓取脚本每次运行后增量更新两张表，看板直接读取，不在每次重跑时 groupby：
+# - data/industry/members.parquet：三级行业 -> 有股息的成份股，含各层级行业内的股息率百分位
+# - data/industry/rollup.parquet：每个申万1/2/3级行业一行：分红股数、股息率中位数/均值/前10%分位、市值加权股息率，
+#   三级行业另附行业概览页的成份个数、静态股息率、市盈率、市净率
+# 每个三级行业记录其数据版本（checkpoint完成时间），只有版本变化（重新抓取）的行业及其上级行业才重新计算
+ROLLUP_DIR = "data/industry"
+LEVEL_COLUMNS = {1: "申万1级", 2: "申万2级", 3: "申万3级"}
+PERCENTILE_COLUMNS = {level: f"行业内百分位({level}级)" for level in LEVEL_COLUMNS}
+PLACEHOLDER = "—"  # 成份股页面缺失的行业名称
+MEMBER_COLUMNS = ["行业代码", "数据版本", "代码", "名称", "最新价", "总市值(亿)", "股息率(%)",
+                  "申万1级", "申万2级", "申万3级"] + list(PERCENTILE_COLUMNS.values())
+STAT_COLUMNS = ["分红股数", "股息率中位数", "股息率均值", "股息率前10%分位", "市值加权股息率", "总市值(亿)"]
+# 行业概览页的指标（只有三级行业有）
+OVERVIEW_COLUMNS = {
+    "成份个数": "成份个数",
+    "静态股息率": "行业静态股息率",
+    "静态市盈率": "行业静态市盈率",
+    "TTM(滚动)市盈率": "行业TTM市盈率",
+    "市净率": "行业市净率",
+}
+ROLLUP_COLUMNS = ["层级", "行业", "行业代码", "上级行业"] + STAT_COLUMNS + list(OVERVIEW_COLUMNS.values())
+
+def members_file(rollup_dir=ROLLUP_DIR):
+    return os.path.join(rollup_dir, "members.parquet")
+
+def rollup_file(rollup_dir=ROLLUP_DIR):
+    return os.path.join(rollup_dir, "rollup.parquet")
+
+def _read(path, columns):
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=columns)
+    return read_partition(path)
+
+def load_members(rollup_dir=ROLLUP_DIR):
+    return _read(members_file(rollup_dir), MEMBER_COLUMNS)
+
+def load_rollup(rollup_dir=ROLLUP_DIR):
+    return _read(rollup_file(rollup_dir), ROLLUP_COLUMNS)
+
+def _write(df, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_", suffix=".parquet")
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False, compression="zstd")
+        replace_file(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _concat(frames, columns):
+    frames = [frame for frame in frames if len(frame)]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+def _members_frame(rows_by_industry, versions, overview):
+    """各行业的快照行拼成成份股表；页面缺失的二级/三级行业名称用行业概览页补齐"""
+    frames = [rows.assign(行业代码=code, 数据版本=versions.get(code, "")) for code, rows in rows_by_industry.items() if len(rows)]
+    if not frames:
+        return pd.DataFrame(columns=MEMBER_COLUMNS)
+    members = pd.concat(frames, ignore_index=True)
+    members["代码"] = normalize_codes(members["代码"])
+    if overview is not None and len(overview):
+        info = overview.set_index("行业代码")
+        for col, source in (("申万2级", "上级行业"), ("申万3级", "行业名称")):
+            missing = members[col].isna() | (members[col] == PLACEHOLDER)
+            members.loc[missing, col] = members.loc[missing, "行业代码"].map(info[source])
+    for col in PERCENTILE_COLUMNS.values():
+        members[col] = np.nan
+    return members.reindex(columns=MEMBER_COLUMNS)
+
+def _level_members(members, col, names):
+    """某层级指定行业的成份股（同一股票在同一行业下只算一次）"""
+    rows = members[members[col].isin(names)]
+    return rows.drop_duplicates(subset=[col, "代码"])
+
+def _group_stats(rows, col):
+    """按行业一次 groupby 算出全部汇总列"""
+    yields = pd.to_numeric(rows["股息率(%)"], errors="coerce")
+    caps = pd.to_numeric(rows["总市值(亿)"], errors="coerce").clip(lower=0)
+    weighted = pd.DataFrame({col: rows[col].to_numpy(), "y": yields.to_numpy(), "cap": caps.to_numpy(),
+                             "w": (yields * caps).to_numpy()})
+    groups = weighted.groupby(col, sort=False)
+    stats = pd.DataFrame({
+        "分红股数": groups["y"].count(),
+        "股息率中位数": groups["y"].median(),
+        "股息率均值": groups["y"].mean(),
+        "股息率前10%分位": groups["y"].quantile(0.9),
+        "总市值(亿)": groups["cap"].sum(),
+    })
+    stats["市值加权股息率"] = groups["w"].sum() / stats["总市值(亿)"].replace(0, np.nan)
+    return stats.round(3).rename_axis("行业").reset_index()
+
+def _parent_names(members, col):
+    """三级行业 -> 上级（二级）行业名称"""
+    if col != "申万3级":
+        return {}
+    pairs = members[[col, "申万2级"]].dropna()
+    pairs = pairs[pairs["申万2级"] != PLACEHOLDER].drop_duplicates(subset=[col])
+    return dict(zip(pairs[col], pairs["申万2级"]))
+
+def update_rollups(rows_by_industry, versions, overview=None, rollup_dir=ROLLUP_DIR, failed=()):
+    """
+    rows_by_industry：{三级行业代码: 该行业的快照行}，本次运行的全部行业（含复用checkpoint的）
+    versions：{三级行业代码: 数据版本}，与上次汇总时记录的版本不同的行业视为有变化
+    overview：行业概览页（行业代码/行业名称/上级行业/成份个数/估值指标），每次运行都会刷新
+    failed：本次抓取失败的三级行业代码，保留上次记录的成份股和版本（只有行业列表里已不存在的行业才会删除）
+    返回 (成份股表, 汇总表, 本次重算的三级行业数)
+    """
+    versions = {code: str(version) for code, version in versions.items()}
+    old_members = load_members(rollup_dir)
+    old_rollup = load_rollup(rollup_dir)
+    stored = dict(zip(old_members["行业代码"], old_members["数据版本"]))
+    # 没有分红股、上次也没有记录的行业不需要计算
+    changed = {code for code in rows_by_industry
+               if stored.get(code) != versions.get(code, "") and (len(rows_by_industry[code]) or code in stored)}
+    removed = set(stored) - set(rows_by_industry) - set(failed)
+    dirty = changed | removed
+
+    fresh = _members_frame({code: rows_by_industry[code] for code in changed}, versions, overview)
+    kept = old_members[~old_members["行业代码"].isin(dirty)]
+    members = _concat([kept, fresh], MEMBER_COLUMNS)
+    # 受影响的行业：变化前后成份股中出现过的各层级行业名称
+    touched = _concat([old_members[old_members["行业代码"].isin(dirty)], fresh], MEMBER_COLUMNS)
+
+    levels = []
+    for level, col in LEVEL_COLUMNS.items():
+        names = set(touched[col].dropna()) - {PLACEHOLDER}
+        previous = old_rollup[(old_rollup["层级"] == level) & ~old_rollup["行业"].isin(names)] \
+            if len(old_rollup) else old_rollup
+        previous = previous[previous["行业"].isin(members[col])] if len(previous) else previous
+        if names:
+            rows = _level_members(members, col, names)
+            percentile = rows.groupby(col)["股息率(%)"].rank(pct=True) * 100
+            in_names = members[col].isin(names)
+            members.loc[in_names, PERCENTILE_COLUMNS[level]] = (
+                members.loc[in_names, [col, "代码"]].merge(
+                    rows[[col, "代码"]].assign(p=percentile.round(1).to_numpy()), on=[col, "代码"], how="left"
+                )["p"].to_numpy()
+            )
+            stats = _group_stats(rows, col).assign(层级=level)
+            stats["上级行业"] = stats["行业"].map(_parent_names(members, col))
+            levels += [previous, stats]
+        else:
+            levels.append(previous)
+    rollup = _concat(levels, ROLLUP_COLUMNS)
+
+    # 行业概览指标每次都按最新概览页覆盖（只是一次按名称的映射，不需要重算）
+    if overview is not None and len(overview):
+        info = overview.drop_duplicates(subset=["行业名称"]).set_index("行业名称")
+        level3 = rollup["层级"] == 3
+        rollup.loc[level3, "行业代码"] = rollup.loc[level3, "行业"].map(info["行业代码"])
+        for source, col in OVERVIEW_COLUMNS.items():
+            rollup.loc[level3, col] = rollup.loc[level3, "行业"].map(info[source])
+    rollup = rollup.reindex(columns=ROLLUP_COLUMNS).astype({"层级": int})
+    rollup = rollup.sort_values(["层级", "股息率中位数"], ascending=[True, False], kind="stable")
+
+    _write(members.reset_index(drop=True), members_file(rollup_dir))
+    _write(rollup.reset_index(drop=True), rollup_file(rollup_dir))
+    return members, rollup, len(changed)
+
+def save_rollups(rows_by_industry, versions, overview=None, failed=()):
+    """抓取脚本调用的入口：更新失败只提示，不影响CSV快照"""
+    try:
+        _, rollup, n_changed = update_rollups(rows_by_industry, versions, overview, failed=failed)
+        print(f"🏭 行业汇总已更新：重算 {n_changed}/{len(rows_by_industry)} 个三级行业，共 {len(rollup)} 个行业")
+        return rollup
+    except Exception as e:
+        print(f"⚠️ 更新行业汇总失败：{e}")
+        return None
+
+def rebuild_from_snapshot(csv_file="data/dividend_data_shenwan.csv", rollup_dir=ROLLUP_DIR):
+    """没有抓取记录时，按快照中的申万3级名称分组一次性生成汇总（行业代码暂用行业名称代替）"""
+    df = pd.read_csv(csv_file, dtype={"代码": str})
+    rows_by_industry = {name: rows for name, rows in df.groupby("申万3级", sort=False)}
+    return update_rollups(rows_by_industry, {name: "snapshot" for name in rows_by_industry}, None, rollup_dir)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="申万行业汇总（股息率中位数/均值/前10%分位/市值加权）")
+    parser.add_argument("--from-snapshot", action="store_true", help="用当前申万快照CSV一次性生成汇总")
+    parser.add_argument("--level", type=int, choices=[1, 2, 3], default=3)
+    parser.add_argument("--top", type=int, default=20, help="打印股息率中位数最高的前N个行业")
+    args = parser.parse_args()
+    if args.from_snapshot:
+        _, rollup, n_changed = rebuild_from_snapshot()
+        print(f"🏭 已从快照生成 {n_changed} 个三级行业的汇总")
+    rollup = load_rollup()
+    print(rollup[rollup["层级"] == args.level].head(args.top).to_string(index=False))
@@ -0,0 +1,212 @@
+import sys
+import time
+import argparse
+from io import StringIO
+import numpy as np
+import pandas as pd
+from lxml import etree
+
+# ====================== 乐咕乐股页面专用解析器 ======================
+INDEX_COMPOSITION_COLUMNS = [
+    "序号",
+    "股票代码",
+    "股票简称",
+    "纳入时间",
+    "申万1级",
+    "申万2级",
+    "申万3级",
+    "价格",
+    "市盈率",
+    "市盈率ttm",
+    "市净率",
+    "股息率",
+    "市值",
+    "归母净利润同比增长(09-30)",
+    "归母净利润同比增长(06-30)",
+    "营业收入同比增长(09-30)",
+    "营业收入同比增长(06-30)",
+]
+NUMERIC_COLUMNS = ["序号", "价格", "市盈率", "市盈率ttm", "市净率", "市值"]
+PERCENT_COLUMNS = ["股息率", "归母净利润同比增长(09-30)", "归母净利润同比增长(06-30)",
+                   "营业收入同比增长(09-30)", "营业收入同比增长(06-30)"]
+
+NAN = float("nan")
+# 普通etree解析器：不挂载lxml.html的元素类，遍历和取文本都更快
+_HTML_PARSER = etree.HTMLParser()
+
+INDUSTRY_OVERVIEW_COLUMNS = [
+    "行业代码",
+    "行业名称",
+    "上级行业",
+    "成份个数",
+    "静态市盈率",
+    "TTM(滚动)市盈率",
+    "市净率",
+    "静态股息率",
+]
+
+def _parse_html(html):
+    return etree.fromstring(html, _HTML_PARSER)
+
+def _text(element):
+    # 绝大多数单元格没有子节点，直接取 .text 可省去 itertext 的开销
+    if len(element) == 0:
+        return element.text or ""
+    return "".join(element.itertext())
+
+def _has_class(element, class_name):
+    return class_name in (element.get("class") or "").split()
+
+def _to_float(text, percent=False):
+    """单元格文本转浮点数：去掉千分位逗号（及百分号），无法解析的记为NaN"""
+    if percent:
+        text = text.rstrip("%")
+    try:
+        return float(text.replace(",", ""))
+    except ValueError:
+        return NAN
+
+def parse_index_composition(html: str) -> pd.DataFrame:
+    """
+    单次lxml遍历解析行业成份股表（页面第一个table），直接输出清洗好的数值列
+    与 pd.read_html + 逐列 to_numeric 的结果一致，但不做通用的表格类型推断
+    """
+    root = _parse_html(html)
+    table = next(root.iter("table"), None)
+    if table is None:
+        raise ValueError("No tables found")
+    n_cols = len(INDEX_COMPOSITION_COLUMNS)
+    records = []
+    for tr in table.iter("tr"):
+        cells = [_text(td).strip() for td in tr if td.tag == "td"]
+        if not cells:
+            continue  # 表头行（只有th）
+        if len(cells) < n_cols:
+            cells.extend([""] * (n_cols - len(cells)))
+        records.append(cells[:n_cols])
+    columns = list(zip(*records)) if records else [()] * n_cols
+
+    # 逐列直接生成numpy数组，避免通用的逐列字符串处理和类型推断
+    data = {}
+    for name, values in zip(INDEX_COMPOSITION_COLUMNS, columns):
+        if name in PERCENT_COLUMNS:
+            data[name] = np.array([_to_float(v, percent=True) for v in values], dtype=np.float64)
+        elif name in NUMERIC_COLUMNS:
+            data[name] = np.array([_to_float(v) for v in values], dtype=np.float64)
+        else:
+            data[name] = np.array([v if v else NAN for v in values], dtype=object)
+    # 序号全为整数时保持int类型，与 read_html 的结果一致
+    serial = data["序号"]
+    if len(serial) and not np.isnan(serial).any() and (serial == np.floor(serial)).all():
+        data["序号"] = serial.astype(np.int64)
+    return pd.DataFrame(data, columns=INDEX_COMPOSITION_COLUMNS)
+
+def parse_industry_overview(html: str) -> pd.DataFrame:
+    """单次遍历 level3Items 区块，同时收集行业代码、名称/成份个数和四项估值指标"""
+    root = _parse_html(html)
+    container = next(root.iterfind(".//div[@id='level3Items']"), None)
+    if container is None:
+        raise ValueError("No level3Items found")
+    code, name, parent_name, num = [], [], [], []
+    values = [[], [], [], []]
+    for div in container.iter("div"):
+        if _has_class(div, "lg-industries-item-chinese-title"):
+            code.append(_text(div))
+        elif _has_class(div, "lg-industries-item-number"):
+            text = _text(div)
+            name.append(text.split("(")[0])
+            span = next(div.iter("span"), None)
+            parent_name.append(_text(span).split("(")[0][1:-1])
+            num.append(text.split("(")[1].split(")")[0])
+        elif _has_class(div, "lg-sw-industries-item-value"):
+            spans = [span for span in div.iter("span") if _has_class(span, "value")]
+            for i in range(4):
+                values[i].append(_text(spans[i]).strip())
+    temp_df = pd.DataFrame({
+        "行业代码": code,
+        "行业名称": name,
+        "上级行业": parent_name,
+        "成份个数": pd.to_numeric(pd.Series(num, dtype=object), errors="coerce"),
+        "静态市盈率": pd.to_numeric(pd.Series(values[0], dtype=object), errors="coerce"),
+        "TTM(滚动)市盈率": pd.to_numeric(pd.Series(values[1], dtype=object), errors="coerce"),
+        "市净率": pd.to_numeric(pd.Series(values[2], dtype=object), errors="coerce"),
+        "静态股息率": pd.to_numeric(pd.Series(values[3], dtype=object), errors="coerce"),
+    }, columns=INDUSTRY_OVERVIEW_COLUMNS)
+    return temp_df
+
+# ====================== 旧版解析（仅用于一致性校验和基准对比）======================
+def parse_index_composition_read_html(html: str) -> pd.DataFrame:
+    """旧版实现：pd.read_html 取第一个表，再逐列去掉%并 to_numeric"""
+    temp_df = pd.read_html(StringIO(html))[0]
+    temp_df.columns = INDEX_COMPOSITION_COLUMNS
+    for col in NUMERIC_COLUMNS:
+        temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
+    for col in PERCENT_COLUMNS:
+        temp_df[col] = temp_df[col].astype(str).str.strip("%")
+        temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
+    return temp_df
+
+def parse_industry_overview_bs4(html: str) -> pd.DataFrame:
+    """旧版实现：BeautifulSoup 对同一区块做多次 find_all"""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, features="lxml")
+    container = soup.find(name="div", attrs={"id": "level3Items"})
+    code_raw = container.find_all(name="div", attrs={"class": "lg-industries-item-chinese-title"})
+    name_raw = container.find_all(name="div", attrs={"class": "lg-industries-item-number"})
+    value_raw = container.find_all(name="div", attrs={"class": "lg-sw-industries-item-value"})
+    code = [item.get_text() for item in code_raw]
+    name = [item.get_text().split("(")[0] for item in name_raw]
+    parent_name = [item.find("span").get_text().split("(")[0][1:-1] for item in name_raw]
+    num = [item.get_text().split("(")[1].split(")")[0] for item in name_raw]
+    nums = [
+        [item.find_all("span", attrs={"class": "value"})[i].get_text().strip() for item in value_raw]
+        for i in range(4)
+    ]
+    temp_df = pd.DataFrame([code, name, parent_name, num] + nums).T
+    temp_df.columns = INDUSTRY_OVERVIEW_COLUMNS
+    for col in INDUSTRY_OVERVIEW_COLUMNS[3:]:
+        temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
+    return temp_df
+
+def check_parity(fast_df, legacy_df):
+    """比较新旧解析结果（按列比较数值，字符串统一转为str比较），返回不一致的列名列表"""
+    mismatched = []
+    if len(fast_df) != len(legacy_df):
+        return list(fast_df.columns)
+    for col in fast_df.columns:
+        a, b = fast_df[col].reset_index(drop=True), legacy_df[col].reset_index(drop=True)
+        if pd.api.types.is_numeric_dtype(a) and pd.api.types.is_numeric_dtype(b):
+            same = ((a - b).abs() < 1e-9) | (a.isna() & b.isna())
+        else:
+            same = (a.astype(str) == b.astype(str)) | (a.isna() & b.isna())
+        if not same.all():
+            mismatched.append(col)
+    return mismatched
+
+def _time_it(func, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="乐咕乐股页面解析：新旧实现一致性校验 + 微基准")
+    parser.add_argument("files", nargs="+", help="保存的HTML页面（行业概览页或成份股页）")
+    parser.add_argument("--repeat", type=int, default=20, help="每个页面重复解析次数")
+    args = parser.parse_args()
+
+    failed = False
+    for path in args.files:
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        if 'id="level3Items"' in html:
+            fast, legacy = parse_industry_overview, parse_industry_overview_bs4
+        else:
+            fast, legacy = parse_index_composition, parse_index_composition_read_html
+        mismatched = check_parity(fast(html), legacy(html))
+        fast_ms = _time_it(fast, html, args.repeat)
+        legacy_ms = _time_it(legacy, html, args.repeat)
+        status = "✅ 一致" if not mismatched else f"❌ 不一致列：{mismatched}"
+        print(f"{path}: {status} | 新 {fast_ms:.2f}ms / 旧 {legacy_ms:.2f}ms（{legacy_ms / fast_ms:.1f}x）")
+        failed = failed or bool(mismatched)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,199 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from data_loader import decode_codes, encode_codes, restore_floats
+
+# ====================== 自选股组合的分红现金流测算 ======================
+# 持仓（持股数或投入金额、成本价）按代码保存在本地文件，与自选股列表分开
+# 所有测算都是 NumPy 数组运算：情景参数为 (情景数,) 或 (情景数, 持仓数) 的数组，
+# 一次广播算完全部情景 x 全部持仓，不逐行、不逐情景循环
+HOLDINGS_FILE = "portfolio_holdings.json"
+HOLDING_COLUMNS = ["代码", "持股数", "投入金额", "成本价"]
+
+def load_holdings(path=HOLDINGS_FILE):
+    """持仓表（代码为6位字符串，未填写的数值为NaN）"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        df = pd.DataFrame(data, columns=HOLDING_COLUMNS)
+    except (FileNotFoundError, ValueError):
+        df = pd.DataFrame(columns=HOLDING_COLUMNS)
+    df["代码"] = decode_codes(encode_codes(df["代码"]))
+    return df.astype({col: float for col in HOLDING_COLUMNS[1:]})
+
+def save_holdings(holdings, path=HOLDINGS_FILE):
+    """只保存填写了持股数或投入金额的代码，先写临时文件再原子替换"""
+    df = holdings.reindex(columns=HOLDING_COLUMNS).copy()
+    df["代码"] = decode_codes(encode_codes(df["代码"]))
+    df = df[(df["持股数"].fillna(0) > 0) | (df["投入金额"].fillna(0) > 0)].drop_duplicates(subset=["代码"], keep="last")
+    records = [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+               for row in df.to_dict("records")]
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return len(records)
+
+def _float64(values):
+    """快照数值列 -> float64：只有紧凑表的 float32 列才经 restore_floats 还原，原始 float64 数据原样使用，不损失精度"""
+    values = pd.to_numeric(values, errors="coerce")
+    if values.dtype == np.float32:
+        return restore_floats(values)
+    return values.to_numpy(dtype=np.float64)
+
+class Portfolio:
+    """
+    持仓数组（每只股票一个元素）：持股数、现价、股息率、成本价
+    每股分红 = 现价 x 股息率；只填投入金额时按现价折算持股数，未填成本价时按 投入金额/持股数 或现价计
+    """
+
+    def __init__(self, codes, names, shares, price, yield_pct, cost):
+        self.codes = np.asarray(codes)
+        self.names = np.asarray(names, dtype=object)
+        self.shares = np.asarray(shares, dtype=np.float64)
+        self.price = np.asarray(price, dtype=np.float64)
+        self.yield_pct = np.nan_to_num(np.asarray(yield_pct, dtype=np.float64))
+        self.cost = np.asarray(cost, dtype=np.float64)
+        self.dps = self.price * self.yield_pct / 100
+
+    @classmethod
+    def from_frames(cls, holdings, snapshot):
+        """持仓表与快照（原始或紧凑表均可）按代码合并，快照中没有行情的代码跳过"""
+        quotes = pd.DataFrame({
+            "key": encode_codes(snapshot["代码"]),
+            "名称": snapshot["名称"].astype(str).to_numpy(),
+            "现价": _float64(snapshot["最新价"]),
+            "股息率": _float64(snapshot["股息率(%)"]),
+        }).drop_duplicates(subset=["key"])
+        h = holdings.reindex(columns=HOLDING_COLUMNS).assign(key=encode_codes(holdings["代码"]))
+        merged = h.merge(quotes, on="key", how="inner")
+        merged = merged[merged["现价"] > 0]
+        price = merged["现价"].to_numpy()
+        amount = merged["投入金额"].to_numpy(dtype=np.float64)
+        shares = merged["持股数"].to_numpy(dtype=np.float64)
+        shares = np.where(np.nan_to_num(shares) > 0, shares, np.nan_to_num(amount) / price)
+        cost = merged["成本价"].to_numpy(dtype=np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cost = np.where(np.nan_to_num(cost) > 0, cost,
+                            np.where(np.nan_to_num(amount) > 0, amount / shares, price))
+        keep = shares > 0
+        return cls(decode_codes(merged["key"]).to_numpy()[keep], merged["名称"].to_numpy()[keep], shares[keep],
+                   price[keep], merged["股息率"].to_numpy()[keep], cost[keep])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def summary(self):
+        """逐只持仓的分红现金流"""
+        income = self.shares * self.dps
+        total = income.sum()
+        return pd.DataFrame({
+            "代码": self.codes,
+            "名称": self.names,
+            "持股数": self.shares.round(2),
+            "现价": self.price,
+            "市值": (self.shares * self.price).round(2),
+            "股息率(%)": self.yield_pct,
+            "每股分红": self.dps.round(4),
+            "年分红": income.round(2),
+            "月均分红": (income / 12).round(2),
+            "成本价": self.cost.round(3),
+            "成本股息率(%)": (self.dps / self.cost * 100).round(3),
+            "分红占比(%)": (income / total * 100).round(2) if total > 0 else np.zeros(len(self)),
+        })
+
+    def totals(self):
+        market_value = float((self.shares * self.price).sum())
+        cost = float((self.shares * self.cost).sum())
+        income = float((self.shares * self.dps).sum())
+        return {
+            "市值": market_value,
+            "投入成本": cost,
+            "年分红": income,
+            "月均分红": income / 12,
+            "组合股息率(%)": income / market_value * 100 if market_value else 0.0,
+            "成本股息率(%)": income / cost * 100 if cost else 0.0,
+        }
+
+def _as_matrix(values, n_holdings):
+    """情景参数统一为 (情景数, 1) 或 (情景数, 持仓数)，便于与持仓数组广播"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 0:
+        values = values.reshape(1)
+    return values[:, None] if values.ndim == 1 else values.reshape(-1, n_holdings)
+
+def project(portfolio, yield_cut=0.0, price_move=0.0, reinvest=0.0, years=1):
+    """
+    一次计算全部情景：
+    - yield_cut：每股分红下调比例（0.3 表示下调30%）
+    - price_move：股价变动比例（-0.2 表示下跌20%），影响再投入的买入价和期末市值
+    - reinvest：分红再投入比例（0~1），按情景股价买入同一只股票，持股数每年乘以 1 + 再投入比例 x 情景股息率
+    - years：测算年数
+    参数可以是标量、(情景数,) 或 (情景数, 持仓数)；返回 {结果列: (情景数,) 数组}
+    """
+    n = len(portfolio)
+    cut, move, rate = (_as_matrix(v, n) for v in (yield_cut, price_move, reinvest))
+    m = max(cut.shape[0], move.shape[0], rate.shape[0])
+    dps = portfolio.dps * (1 - np.clip(cut, 0, 1))
+    price = portfolio.price * np.maximum(1 + move, 1e-6)
+    growth = 1 + np.clip(rate, 0, 1) * dps / price
+    first = portfolio.shares * dps
+    # 第t年分红 = 首年分红 x growth^(t-1)，累计分红为等比数列求和（growth=1 时为 首年分红 x 年数）
+    with np.errstate(divide="ignore", invalid="ignore"):
+        series_sum = np.where(growth > 1, (growth ** years - 1) / (growth - 1), years)
+    total_cost = float((portfolio.shares * portfolio.cost).sum())
+    first_total = np.broadcast_to(first, (m, n)).sum(axis=1)
+    return {
+        "首年分红": first_total,
+        "末年分红": np.broadcast_to(first * growth ** (years - 1), (m, n)).sum(axis=1),
+        "累计分红": np.broadcast_to(first * series_sum, (m, n)).sum(axis=1),
+        "期末市值": np.broadcast_to(portfolio.shares * growth ** years * price, (m, n)).sum(axis=1),
+        "成本股息率(%)": first_total / total_cost * 100 if total_cost else np.zeros(m),
+    }
+
+def scenario_grid(portfolio, cuts, moves, reinvests, years=10):
+    """确定性情景网格：分红下调 x 股价变动 x 再投入比例 的全部组合"""
+    cut, move, rate = (g.ravel() for g in np.meshgrid(cuts, moves, reinvests, indexing="ij"))
+    result = project(portfolio, cut, move, rate, years)
+    return pd.DataFrame({"分红下调(%)": cut * 100, "股价变动(%)": move * 100, "再投入(%)": rate * 100, **result})
+
+def monte_carlo(portfolio, n_scenarios=10000, cut_prob=0.2, cut_depth=0.5, price_vol=0.25,
+                reinvest=0.0, years=10, seed=0):
+    """
+    随机情景：每只持仓以 cut_prob 的概率被下调分红（下调幅度在 0~cut_depth 间均匀分布），
+    情景股价相对现价按对数正态分布（对数标准差 price_vol，期望不变），返回 {结果列: (情景数,) 数组}
+    """
+    rng = np.random.default_rng(seed)
+    shape = (n_scenarios, len(portfolio))
+    cut = (rng.random(shape) < cut_prob) * rng.uniform(0, cut_depth, shape)
+    move = np.exp(rng.normal(-price_vol ** 2 / 2, price_vol, shape)) - 1
+    return project(portfolio, cut, move, reinvest, years)
+
+def percentiles(result, q=(5, 25, 50, 75, 95)):
+    """情景结果的分位数表（行为结果列，列为分位数）"""
+    return pd.DataFrame({col: np.percentile(values, q) for col, values in result.items()},
+                        index=[f"P{p}" for p in q]).T
+
+if __name__ == "__main__":
+    import argparse
+    from data_loader import load_snapshot
+    parser = argparse.ArgumentParser(description="自选股组合分红现金流测算")
+    parser.add_argument("--holdings", default=HOLDINGS_FILE, help="持仓文件")
+    parser.add_argument("--scenarios", type=int, default=10000, help="随机情景数")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--reinvest", type=float, default=1.0, help="分红再投入比例（0~1）")
+    args = parser.parse_args()
+
+    portfolio = Portfolio.from_frames(load_holdings(args.holdings), load_snapshot("xueqiu"))
+    if not len(portfolio):
+        print(f"⚠️ {args.holdings} 中没有可测算的持仓（需填写持股数或投入金额，且快照中有行情）")
+    else:
+        print(portfolio.summary().to_string(index=False))
+        print({k: round(v, 2) for k, v in portfolio.totals().items()})
+        start = time.perf_counter()
+        result = monte_carlo(portfolio, args.scenarios, reinvest=args.reinvest, years=args.years)
+        elapsed = time.perf_counter() - start
+        print(percentiles(result).round(2).to_string())
+        print(f"⏱️ {args.scenarios} 个情景 x {len(portfolio)} 只持仓耗时 {elapsed * 1000:.1f}ms")
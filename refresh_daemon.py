@@ -0,0 +1,339 @@
+import os
+import json
+import time
+import heapq
+import signal
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from http_client import DEFAULT_USER_AGENT, RateLimiter, make_session
+from run_metrics import current_metrics, instrumented_run
+from snapshot_writer import atomic_write_csv
+from history_store import DATASETS, append_snapshot
+from stability import update_stability
+from symbol_master import get_symbol_master, normalize_codes
+from trading_calendar import is_trading_time, last_close, next_open, now_market
+from watchlist_store import get_store
+from update_data import (CSV_HEADERS, dataset_of, fetch_quote_batch, get_xq_token,
+                         load_self_selected_stocks, normalize_snapshot, quote_to_row, to_xq_symbol, xq_a_token)
+
+# ====================== 常驻刷新配置 ======================
+STATE_FILE = "data/refresh_state.json"   # 全市场数据集为 data/refresh_state_xueqiu_all.json
+# 优先级层级：自选股 > 股息率排名靠前 > 其余长尾
+TIER_WATCHLIST, TIER_TOP_YIELD, TIER_TAIL = 0, 1, 2
+TIER_NAMES = ["watchlist", "top_yield", "tail"]
+# 交易时段内各层级的刷新间隔（秒）；非交易时段每个收盘后只补刷一次
+DEFAULT_INTERVALS = (300, 300, 3600)
+RETRY_DELAY = 60
+TOKEN_TTL = 3600
+FLUSH_INTERVAL = 60
+MAX_IDLE_SLEEP = 30
+
+class RefreshScheduler:
+    """
+    按层级分堆的优先级调度器：每层一个按到期时间排序的小顶堆
+    pop_due 先取高层级中已到期的代码，预算不够时长尾自然让路，高层级永远不会被长尾饿死
+    """
+
+    def __init__(self):
+        self._heaps = [[] for _ in TIER_NAMES]
+        self._tier = {}
+
+    def __len__(self):
+        return len(self._tier)
+
+    def tier_of(self, code):
+        return self._tier.get(code, TIER_TAIL)
+
+    def push(self, code, tier, due):
+        self._tier[code] = tier
+        heapq.heappush(self._heaps[tier], (due, code))
+
+    def rebuild(self, tiers, due_of):
+        """tiers：{代码: 层级}；due_of(代码, 层级) -> 到期时间戳"""
+        self._tier = dict(tiers)
+        self._heaps = [[] for _ in TIER_NAMES]
+        for code, tier in self._tier.items():
+            self._heaps[tier].append((due_of(code, tier), code))
+        for heap in self._heaps:
+            heapq.heapify(heap)
+
+    def pop_due(self, now, limit):
+        due = []
+        for tier, heap in enumerate(self._heaps):
+            while heap and heap[0][0] <= now and len(due) < limit:
+                _, code = heapq.heappop(heap)
+                # 层级变化后旧堆里可能残留过期条目，跳过
+                if self._tier.get(code) == tier:
+                    due.append((code, tier))
+        return due
+
+    def next_due(self):
+        heads = [heap[0][0] for heap in self._heaps if heap]
+        return min(heads) if heads else None
+
+class RefreshDaemon:
+    """
+    常驻刷新：按优先级挑选到期的代码批量请求雪球，原地更新快照中的对应行
+    快照定期（flush_interval）排序后原子写回 CSV，看板读到的始终是完整文件
+    universe="all" 时刷新全市场数据集（xueqiu_all），否则刷新自选股快照（xueqiu）
+    """
+
+    def __init__(self, concurrency=4, rate_limit=2.0, batch_size=50, top_n=100,
+                 intervals=DEFAULT_INTERVALS, flush_interval=FLUSH_INTERVAL,
+                 universe="snapshot", trading_hours_only=True):
+        self.concurrency = max(concurrency, 1)
+        self.batch_size = max(batch_size, 1)
+        self.top_n = top_n
+        self.intervals = intervals
+        self.flush_interval = flush_interval
+        self.universe = universe
+        self.dataset = dataset_of(universe)
+        self.csv_file = DATASETS[self.dataset]
+        self.state_file = STATE_FILE if self.dataset == "xueqiu" else f"data/refresh_state_{self.dataset}.json"
+        self.trading_hours_only = trading_hours_only
+        self.limiter = RateLimiter(rate_limit)
+        self.scheduler = RefreshScheduler()
+        self.metrics = current_metrics()
+        self.stopping = False
+        self.session = None
+        self.token_at = 0.0
+        self.snapshot = None
+        self.snapshot_version = None
+        self.watchlist = {}
+        self.watchlist_revision = None
+        self.last_updated = {}
+        self.retry_at = {}
+        self.pending = {}
+        self.trading = None
+        self.close_ts = 0.0
+        self.open_ts = 0.0
+
+    # ---------- 快照与状态 ----------
+    def _file_version(self):
+        try:
+            stat = os.stat(self.csv_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def load_snapshot(self):
+        """读取磁盘上的快照（可能刚被全量更新脚本替换过），并叠加尚未写盘的行"""
+        version = self._file_version()
+        if version is not None:
+            df = pd.read_csv(self.csv_file, dtype={"代码": str})
+            df["代码"] = normalize_codes(df["代码"])
+            self.snapshot = df.drop_duplicates(subset=["代码"]).set_index("代码")[CSV_HEADERS[1:]]
+        else:
+            self.snapshot = pd.DataFrame(columns=CSV_HEADERS).set_index("代码")
+        self.snapshot_version = version
+        if self.pending:
+            self._apply(list(self.pending.values()))
+
+    def _apply(self, rows):
+        new = pd.DataFrame(rows, columns=CSV_HEADERS).set_index("代码")
+        existing = new.index.isin(self.snapshot.index)
+        self.snapshot.update(new[existing])
+        if not existing.all():
+            self.snapshot = pd.concat([self.snapshot, new[~existing]])
+
+    def load_state(self):
+        if os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                self.last_updated = json.load(f)
+        elif self.snapshot_version is not None:
+            # 没有刷新记录时，以快照文件的写入时间作为所有代码的最后更新时间
+            fallback = self.snapshot_version[0] / 1e9
+            self.last_updated = {code: fallback for code in self.snapshot.index}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_file) or ".", exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.last_updated, f)
+        os.replace(tmp_file, self.state_file)
+
+    def flush(self):
+        """把本轮更新写回快照：磁盘文件被外部替换过则先重新加载，再叠加本轮更新"""
+        if not self.pending:
+            return
+        with self.metrics.stage("write"):
+            if self._file_version() != self.snapshot_version:
+                self.load_snapshot()
+            df = normalize_snapshot(self.snapshot.reset_index()[CSV_HEADERS])
+            df = df.sort_values(by="股息率(%)", ascending=False, kind="stable")
+            atomic_write_csv(df, self.csv_file)
+            self.snapshot_version = self._file_version()
+            self.save_state()
+            # 当天分区随之覆盖，看板读取历史库最新分区也能看到刷新后的数据
+            try:
+                append_snapshot(df, self.dataset)
+            except Exception as e:
+                print(f"⚠️ 写入历史库失败：{e}")
+            # 变化流的基准只随每日全量更新前移，这里不写，免得盘中每轮覆盖基准、日度对比失效
+            update_stability(df, self.dataset)
+        self.metrics.incr("rows_flushed", len(self.pending))
+        print(f"💾 已原地更新 {len(self.pending)} 支股票，快照共 {len(df)} 支")
+        self.pending = {}
+        self.metrics.set("rows_written", len(df))
+
+    # ---------- 优先级 ----------
+    def _load_watchlist(self):
+        # 自选股库的写入计数变化（任一会话增删了自选股）时才重新读取
+        revision = get_store().revision()
+        if revision != self.watchlist_revision or not self.watchlist:
+            self.watchlist = {s["code"]: s.get("name", "") for s in load_self_selected_stocks()}
+            self.watchlist_revision = revision
+
+    def assign_tiers(self):
+        """自选股为最高层；快照中股息率前 top_n 为第二层；其余为长尾"""
+        self._load_watchlist()
+        tiers = {}
+        if self.universe == "all":
+            tiers.update(dict.fromkeys(get_symbol_master().to_frame()["code"], TIER_TAIL))
+        tiers.update(dict.fromkeys(self.snapshot.index, TIER_TAIL))
+        top = self.snapshot["股息率(%)"].astype(float).nlargest(self.top_n).index
+        tiers.update(dict.fromkeys(top, TIER_TOP_YIELD))
+        tiers.update(dict.fromkeys(self.watchlist, TIER_WATCHLIST))
+        return {code: tier for code, tier in tiers.items() if to_xq_symbol(code)}
+
+    def due_time(self, code, tier):
+        """
+        交易时段：上次更新 + 层级间隔
+        非交易时段：上次更新早于最近一次收盘的立即补刷一次（拿到收盘价），其余等到下次开盘
+        刷新失败的代码在重试时间之前不会到期（写盘后重新分层也不会提前）
+        """
+        last = self.last_updated.get(code, 0.0)
+        if self.trading or not self.trading_hours_only:
+            due = last + self.intervals[tier]
+        else:
+            due = time.time() if last < self.close_ts else self.open_ts
+        return max(due, self.retry_at.get(code, 0.0))
+
+    def refresh_market_clock(self):
+        """交易状态变化时重新计算所有代码的到期时间"""
+        if not self.trading_hours_only:
+            if self.trading is None:
+                self.trading = True
+                self.rebuild()
+            return
+        now = now_market()
+        trading = is_trading_time(now)
+        if trading != self.trading:
+            self.trading = trading
+            self.close_ts = last_close(now).timestamp()
+            self.open_ts = next_open(now).timestamp()
+            self.rebuild()
+            print(f"🕘 {'进入交易时段' if trading else '非交易时段'}，{len(self.scheduler)} 支股票重新排期")
+
+    def rebuild(self):
+        tiers = self.assign_tiers()
+        self.scheduler.rebuild(tiers, self.due_time)
+        counts = pd.Series(list(tiers.values())).value_counts()
+        for tier, name in enumerate(TIER_NAMES):
+            self.metrics.set(f"tier_{name}_size", int(counts.get(tier, 0)))
+
+    # ---------- 抓取 ----------
+    def _ensure_session(self):
+        if self.session is not None and time.time() - self.token_at < TOKEN_TTL:
+            return
+        if self.session is not None:
+            self.session.close()
+        with self.metrics.stage("token"):
+            token = get_xq_token() or xq_a_token
+        self.session = make_session(pool_size=self.concurrency, headers={
+            "Cookie": f"xq_a_token={token};",
+            "User-Agent": DEFAULT_USER_AGENT,
+        })
+        self.token_at = time.time()
+
+    def _name(self, code):
+        if code in self.snapshot.index:
+            return self.snapshot.at[code, "名称"]
+        return self.watchlist.get(code) or get_symbol_master().name(code)
+
+    def fetch_batch(self, batch):
+        symbols = {to_xq_symbol(code): (code, tier) for code, tier in batch}
+        try:
+            # 到期才刷新，同一请求不会在缓存有效期内重复，行情不写入磁盘缓存
+            quotes = fetch_quote_batch(self.session, list(symbols), self.limiter, use_cache=False)
+        except Exception as e:
+            self.metrics.incr("item_errors", type="batch_failed")
+            print(f"⚠️ 批量刷新失败（{str(e)[:50]}），{len(batch)} 支 {RETRY_DELAY} 秒后重试")
+            return [(code, tier, None) for code, tier in batch]
+        results = []
+        for symbol, (code, tier) in symbols.items():
+            row = quote_to_row(code, self._name(code), quotes[symbol]) if symbol in quotes else None
+            results.append((code, tier, row))
+        return results
+
+    def tick(self, executor):
+        """取出已到期的代码并发刷新，返回本轮刷新的数量"""
+        now = time.time()
+        due = self.scheduler.pop_due(now, self.batch_size * self.concurrency)
+        if not due:
+            return 0
+        self._ensure_session()
+        batches = [due[i:i + self.batch_size] for i in range(0, len(due), self.batch_size)]
+        with self.metrics.stage("fetch"):
+            results = [r for batch_results in executor.map(self.fetch_batch, batches) for r in batch_results]
+        now = time.time()
+        rows = []
+        for code, tier, row in results:
+            if row is None:
+                self.metrics.incr("item_errors", type="missing_quote")
+                self.retry_at[code] = now + RETRY_DELAY
+                self.scheduler.push(code, tier, self.retry_at[code])
+                continue
+            rows.append(row)
+            self.pending[code] = row
+            self.last_updated[code] = now
+            self.retry_at.pop(code, None)
+            self.metrics.incr("refreshed", tier=TIER_NAMES[tier])
+            self.scheduler.push(code, tier, self.due_time(code, tier))
+        if rows:
+            self._apply(rows)
+        return len(rows)
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self, run_seconds=None):
+        self.load_snapshot()
+        self.load_state()
+        deadline = time.time() + run_seconds if run_seconds else None
+        last_flush = time.time()
+        self.refresh_market_clock()
+        print(f"🚀 常驻刷新已启动：{len(self.scheduler)} 支股票，自选股/前{self.top_n}名间隔 "
+              f"{self.intervals[TIER_WATCHLIST]}/{self.intervals[TIER_TOP_YIELD]} 秒，长尾 {self.intervals[TIER_TAIL]} 秒")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            try:
+                while not self.stopping and (deadline is None or time.time() < deadline):
+                    self.refresh_market_clock()
+                    refreshed = self.tick(executor)
+                    if time.time() - last_flush >= self.flush_interval:
+                        self.flush()
+                        # 股息率排名随刷新变化，写盘后重新分层
+                        self.rebuild()
+                        self.metrics.write_textfile()
+                        last_flush = time.time()
+                    if refreshed:
+                        continue
+                    next_due = self.scheduler.next_due()
+                    sleep = MAX_IDLE_SLEEP if next_due is None else min(max(next_due - time.time(), 0.1), MAX_IDLE_SLEEP)
+                    if deadline is not None:
+                        sleep = min(sleep, max(deadline - time.time(), 0))
+                    time.sleep(sleep)
+            finally:
+                self.flush()
+                if self.session is not None:
+                    self.session.close()
+
+@instrumented_run("xueqiu_daemon")
+def run_daemon(run_seconds=None, **options):
+    """常驻模式入口：SIGTERM/Ctrl+C 时写回未保存的更新后退出"""
+    daemon = RefreshDaemon(**options)
+    signal.signal(signal.SIGTERM, daemon.stop)
+    try:
+        daemon.run(run_seconds)
+    except KeyboardInterrupt:
+        print("👋 收到中断信号，已保存本轮更新")
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# ====================== 运行报告配置 ======================
+REPORT_DIR = "data/run_reports"
+REPORT_DIR_ENV = "DIVIDEND_REPORT_DIR"
+METRIC_PREFIX = "dividend_update"
+# 请求耗时直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # 最后一个桶为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, n in zip(list(LATENCY_BUCKETS) + [float("inf")], self.counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+class RunMetrics:
+    """
+    一次更新任务的运行指标（线程安全）：
+    - 计数器 incr(name, **labels)：请求数、重试、错误、下载字节数、缓存命中等
+    - 按host的请求耗时直方图 observe_latency(host, seconds)
+    - 各阶段耗时 stage(name) / add_stage_time(name, seconds)
+    - 数值 set(name, value)：写入行数、标的数等
+    结束时 write_report 输出JSON报告和Prometheus textfile
+    """
+
+    def __init__(self, job, labels=None):
+        self.job = job
+        self.labels = dict(labels or {})
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self.finished_at = None
+        self.duration = None
+        self.status = "running"
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._latency = {}
+        self._stages = {}
+        self._values = {}
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe_latency(self, host, seconds):
+        with self._lock:
+            hist = self._latency.get(host)
+            if hist is None:
+                hist = self._latency[host] = _Histogram()
+            hist.observe(seconds)
+
+    def add_stage_time(self, name, seconds):
+        with self._lock:
+            self._stages[name] = self._stages.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        """计时一个阶段；同名阶段多次进入时累加（多线程中即为各线程累计耗时）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.perf_counter() - start)
+
+    def set(self, name, value):
+        with self._lock:
+            self._values[name] = value
+
+    def finish(self, status="ok"):
+        self.status = status
+        self.finished_at = datetime.now()
+        self.duration = time.perf_counter() - self._start
+
+    def counter_total(self, name):
+        with self._lock:
+            return sum(v for (n, _), v in self._counters.items() if n == name)
+
+    def to_dict(self):
+        with self._lock:
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                counters.setdefault(name, []).append({**dict(labels), "value": value})
+            latency = {
+                host: {
+                    "count": hist.count,
+                    "sum": round(hist.sum, 6),
+                    "buckets": {("+Inf" if bound == float("inf") else str(bound)): n for bound, n in hist.cumulative()},
+                }
+                for host, hist in sorted(self._latency.items())
+            }
+            return {
+                "job": self.job,
+                "labels": self.labels,
+                "status": self.status,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "finished_at": self.finished_at.isoformat(timespec="seconds") if self.finished_at else None,
+                "duration_s": round(self.duration, 3) if self.duration is not None else None,
+                "stages_s": {name: round(s, 3) for name, s in self._stages.items()},
+                "values": dict(self._values),
+                "counters": counters,
+                "latency_s": latency,
+            }
+
+    def to_prometheus(self):
+        """Prometheus textfile 格式（供 node_exporter textfile collector 采集）"""
+        report = self.to_dict()
+        base = {"job": self.job, **self.labels}
+        lines = []
+
+        def line(name, labels, value):
+            label_str = ",".join(f'{k}="{_escape(v)}"' for k, v in {**base, **labels}.items())
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_str}}} {value}")
+
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge")
+        # 运行中的任务（常驻模式）输出已运行时长
+        line("run_duration_seconds", {}, report["duration_s"] or round(time.perf_counter() - self._start, 3))
+        lines.append(f"# TYPE {METRIC_PREFIX}_run_success gauge")
+        line("run_success", {}, 1 if self.status == "ok" else 0)
+        lines.append(f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge")
+        line("last_run_timestamp_seconds", {}, int((self.finished_at or datetime.now()).timestamp()))
+        lines.append(f"# TYPE {METRIC_PREFIX}_stage_seconds gauge")
+        for name, seconds in report["stages_s"].items():
+            line("stage_seconds", {"stage": name}, seconds)
+        for name, value in report["values"].items():
+            if isinstance(value, (int, float)):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+                line(name, {}, value)
+        for name, series in report["counters"].items():
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name}_total counter")
+            for item in series:
+                labels = {k: v for k, v in item.items() if k != "value"}
+                line(f"{name}_total", labels, item["value"])
+        lines.append(f"# TYPE {METRIC_PREFIX}_http_request_duration_seconds histogram")
+        for host, hist in report["latency_s"].items():
+            for bound, n in hist["buckets"].items():
+                line("http_request_duration_seconds_bucket", {"host": host, "le": bound}, n)
+            line("http_request_duration_seconds_sum", {"host": host}, hist["sum"])
+            line("http_request_duration_seconds_count", {"host": host}, hist["count"])
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, report_dir=None):
+        """
+        写入 <report_dir>/<任务>_<时间>.json（逐次保留，便于跨运行对比）
+        和 <report_dir>/<任务>.prom（每次覆盖，供监控采集），返回JSON路径
+        """
+        report_dir = report_dir or get_report_dir()
+        os.makedirs(report_dir, exist_ok=True)
+        json_file = os.path.join(report_dir, f"{self._file_stem()}_{self.started_at.strftime('%Y%m%d-%H%M%S')}.json")
+        _atomic_write_text(json_file, json.dumps(self.to_dict(), ensure_ascii=False, indent=2))
+        self.write_textfile(report_dir)
+        return json_file
+
+    def write_textfile(self, report_dir=None):
+        """只更新Prometheus textfile（常驻任务运行期间定期调用）"""
+        report_dir = report_dir or get_report_dir()
+        os.makedirs(report_dir, exist_ok=True)
+        _atomic_write_text(os.path.join(report_dir, f"{self._file_stem()}.prom"), self.to_prometheus())
+
+    def _file_stem(self):
+        return "_".join([self.job, *(str(v) for v in self.labels.values())])
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _atomic_write_text(path, text):
+    # textfile collector 可能随时读取，先写临时文件再替换
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+# ====================== 进程内当前任务 ======================
+_current = RunMetrics("idle")
+
+def current_metrics():
+    """当前任务的指标；没有任务在运行时返回一个不会输出的占位实例，调用方无需判空"""
+    return _current
+
+def start_run(job, labels=None):
+    global _current
+    _current = RunMetrics(job, labels)
+    return _current
+
+def get_report_dir():
+    return os.environ.get(REPORT_DIR_ENV) or REPORT_DIR
+
+def set_report_dir(report_dir):
+    """设置报告目录，同时写入环境变量让分片子进程保持一致"""
+    os.environ[REPORT_DIR_ENV] = report_dir
+
+def instrumented_run(job):
+    """
+    装饰更新任务的主函数：开始时创建新的运行指标，结束（包括异常退出）时写入运行报告
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = start_run(job)
+            status = "error"
+            try:
+                result = func(*args, **kwargs)
+                # 任务函数可以把 status 设为 "no_data" 等，未设置即视为成功
+                status = "ok" if metrics.status == "running" else metrics.status
+                return result
+            finally:
+                metrics.finish(status)
+                try:
+                    report_file = metrics.write_report()
+                    print(f"📈 运行报告已写入 {report_file}（耗时 {metrics.duration:.1f} 秒，状态 {status}）")
+                except OSError as e:
+                    print(f"⚠️ 写入运行报告失败：{e}")
+        return wrapper
+    return decorator
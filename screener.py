@@ -0,0 +1,154 @@
+import time
+import numpy as np
+import pandas as pd
+from data_loader import compact_frame, load_snapshot, to_display
+
+# ====================== 多条件选股引擎（申万全市场数据） ======================
+NUMERIC_COLUMNS = ["最新价", "总市值(亿)", "股息率(%)", "市盈率ttm", "市净率"]
+INDUSTRY_LEVELS = {1: "申万1级", 2: "申万2级", 3: "申万3级"}
+TEXT_COLUMNS = ["代码", "名称"] + list(INDUSTRY_LEVELS.values())
+
+class Screener:
+    """
+    加载一次、反复查询：
+    - 数值列转为 float64 的 NumPy 数组（缺失为NaN，任何范围条件都不会命中）
+    - 每个申万层级一个 行业 -> 行号数组 的索引
+    - 按市值升序的行号数组，市值下限/上限用二分查找直接截取
+    查询先用索引缩小候选行，再在候选行上逐个判断区间条件，最后用 argpartition 取前k
+    """
+
+    def __init__(self, df):
+        # df 为 data_loader 的紧凑表：代码还原为6位字符串，float32 还原为 float64 后再建数组
+        df = to_display(df.reset_index(drop=True))
+        self.size = len(df)
+        self.text = {col: df[col].astype(str).to_numpy(dtype=object) for col in TEXT_COLUMNS if col in df}
+        self.columns = {col: pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64)
+                        for col in NUMERIC_COLUMNS if col in df}
+        self.industry_index = {}
+        for level, col in INDUSTRY_LEVELS.items():
+            if col not in df:
+                continue
+            codes, categories = pd.factorize(df[col], sort=True)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(categories) + 1))
+            self.industry_index[level] = {
+                name: order[bounds[i]:bounds[i + 1]] for i, name in enumerate(categories)
+            }
+        caps = self.columns["总市值(亿)"]
+        self.cap_order = np.argsort(np.where(np.isnan(caps), -np.inf, caps), kind="stable")
+        self.sorted_caps = caps[self.cap_order]
+        self._all_rows = np.arange(self.size)
+
+    @classmethod
+    def from_frame(cls, df):
+        """任意来源的原始表（代码写法不统一）"""
+        return cls(compact_frame(df))
+
+    def industries(self, level=3):
+        return list(self.industry_index.get(level, {}))
+
+    def _cap_rows(self, min_cap=None, max_cap=None):
+        # NaN市值按 -inf 排在最前面，没有下限时从第一个非NaN位置开始截取
+        lo = np.searchsorted(self.sorted_caps, min_cap, side="left") if min_cap is not None \
+            else np.searchsorted(self.sorted_caps, -np.inf, side="right")
+        hi = np.searchsorted(self.sorted_caps, max_cap, side="right") if max_cap is not None else self.size
+        return self.cap_order[lo:hi]
+
+    def query(self, ranges=None, industries=None, level=3, min_cap=None, max_cap=None,
+              sort_by="股息率(%)", ascending=False, k=20):
+        """
+        ranges：{列名: (下限, 上限)}，None 表示该侧不限，例如 {"股息率(%)": (4, None), "市盈率ttm": (0, 15)}
+        industries：申万 level 级行业名称列表
+        min_cap / max_cap：总市值(亿)区间
+        返回按 sort_by 排好的前 k 个行号（k 为 None 时返回全部命中行）
+        """
+        candidates = None
+        if industries:
+            index = self.industry_index.get(level, {})
+            parts = [index[name] for name in industries if name in index]
+            candidates = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        if min_cap is not None or max_cap is not None:
+            if candidates is None:
+                candidates = self._cap_rows(min_cap, max_cap)
+            else:
+                # 行业候选通常更少，直接在候选行上判断市值
+                ranges = dict(ranges or {})
+                ranges["总市值(亿)"] = (min_cap, max_cap)
+        if candidates is None:
+            candidates = self._all_rows
+        for col, (low, high) in (ranges or {}).items():
+            if low is None and high is None:
+                continue
+            values = self.columns[col][candidates]
+            mask = ~np.isnan(values)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            candidates = candidates[mask]
+        return self.top_k(candidates, sort_by, ascending, k)
+
+    def top_k(self, rows, sort_by="股息率(%)", ascending=False, k=20):
+        """部分选择：先 argpartition 取出前k个，再只对这k个排序；NaN 永远排在最后"""
+        values = self.columns[sort_by][rows]
+        key = values if ascending else -values
+        key = np.where(np.isnan(key), np.inf, key)
+        if k is not None and k < len(rows):
+            part = np.argpartition(key, k - 1)[:k]
+        else:
+            part = np.arange(len(rows))
+        return rows[part[np.argsort(key[part], kind="stable")]]
+
+    def to_frame(self, rows):
+        data = {col: values[rows] for col, values in self.text.items()}
+        data.update({col: values[rows] for col, values in self.columns.items()})
+        columns = [c for c in ["代码", "名称", "最新价", "总市值(亿)", "股息率(%)", "申万1级", "申万2级", "申万3级",
+                               "市盈率ttm", "市净率"] if c in data]
+        return pd.DataFrame(data, columns=columns)
+
+def load_screener(dataset="shenwan"):
+    """读取历史库最新分区（比CSV旧时读取CSV）"""
+    return Screener(load_snapshot(dataset))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="申万全市场多条件选股")
+    parser.add_argument("--yield-min", type=float, default=None, help="股息率下限(%)")
+    parser.add_argument("--yield-max", type=float, default=None, help="股息率上限(%)")
+    parser.add_argument("--pe-max", type=float, default=None, help="市盈率ttm上限（自动排除负值）")
+    parser.add_argument("--pb-max", type=float, default=None, help="市净率上限（自动排除负值）")
+    parser.add_argument("--min-cap", type=float, default=None, help="总市值下限（亿）")
+    parser.add_argument("--max-cap", type=float, default=None, help="总市值上限（亿）")
+    parser.add_argument("--industry", nargs="*", default=None, help="申万行业名称")
+    parser.add_argument("--level", type=int, choices=[1, 2, 3], default=3, help="行业层级")
+    parser.add_argument("--sort", default="股息率(%)", choices=NUMERIC_COLUMNS, help="排序列")
+    parser.add_argument("--ascending", action="store_true", help="升序")
+    parser.add_argument("--top", type=int, default=20, help="返回前N支")
+    parser.add_argument("--bench", type=int, default=0, help="重复执行N次随机条件的查询，统计每秒查询数")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    screener = load_screener()
+    print(f"📦 已加载 {screener.size} 支股票（{(time.perf_counter() - start) * 1000:.1f}ms）")
+    ranges = {
+        "股息率(%)": (args.yield_min, args.yield_max),
+        "市盈率ttm": (0 if args.pe_max is not None else None, args.pe_max),
+        "市净率": (0 if args.pb_max is not None else None, args.pb_max),
+    }
+    rows = screener.query(ranges, args.industry, args.level, args.min_cap, args.max_cap,
+                          args.sort, args.ascending, args.top)
+    print(screener.to_frame(rows).to_string(index=False))
+
+    if args.bench:
+        rng = np.random.default_rng(0)
+        industries = screener.industries(1)
+        start = time.perf_counter()
+        for _ in range(args.bench):
+            screener.query(
+                {"股息率(%)": (rng.uniform(0, 5), None), "市盈率ttm": (0, rng.uniform(5, 50)), "市净率": (0, rng.uniform(0.5, 5))},
+                industries=[industries[rng.integers(len(industries))]] if industries and rng.random() < 0.5 else None,
+                level=1, min_cap=rng.uniform(0, 1000), sort_by=NUMERIC_COLUMNS[rng.integers(len(NUMERIC_COLUMNS))],
+                k=20,
+            )
+        elapsed = time.perf_counter() - start
+        print(f"⏱️ {args.bench} 次随机查询耗时 {elapsed:.3f}s，约 {args.bench / elapsed:,.0f} 次/秒")
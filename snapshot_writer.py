@@ -0,0 +1,135 @@
+import os
+import stat
+import shutil
+import tempfile
+import pandas as pd
+from run_metrics import current_metrics
+
+# ====================== 快照写入器 ======================
+# 进程的 umask（读取时必须先设置再还原）
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+def replace_file(tmp_path, path):
+    """
+    用临时文件原子替换 path：mkstemp 创建的临时文件权限为 0600，替换前先改成目标文件原来的权限
+    （目标不存在时按 umask，与 open() 新建文件一致），其他用户和服务仍然可以读取
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
+
+def atomic_write_csv(df, csv_file):
+    """先写同目录临时文件，再用 os.replace 原子替换，读取方永远看不到写了一半的CSV"""
+    target_dir = os.path.dirname(os.path.abspath(csv_file))
+    os.makedirs(target_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix=".tmp_", suffix=".csv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8-sig", newline="") as f:
+            df.to_csv(f, index=False)
+        replace_file(tmp_path, csv_file)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class SnapshotWriter:
+    """
+    收集一次抓取的所有行，结束时一次性排序+去重并原子写入CSV
+    chunk_size：内存中最多缓存的行数，超过后落盘为临时分块（None 表示全部放内存）
+    """
+
+    def __init__(self, csv_file, columns, sort_by="股息率(%)", dedupe_on="代码", chunk_size=None):
+        self.csv_file = csv_file
+        self.columns = list(columns)
+        self.sort_by = sort_by
+        self.dedupe_on = dedupe_on
+        self.chunk_size = chunk_size
+        self.row_count = 0
+        self._rows = []
+        self._frames = []
+        self._buffered = 0
+        self._chunk_files = []
+        self._chunk_dir = None
+
+    def __len__(self):
+        return self.row_count
+
+    def add(self, row):
+        """追加一行（dict，键为列名）"""
+        self._rows.append(row)
+        self._buffered += 1
+        self.row_count += 1
+        self._maybe_spill()
+
+    def add_frame(self, df):
+        """追加多行（DataFrame，只保留快照的列）"""
+        if df is None or df.empty:
+            return
+        self._frames.append(df.reindex(columns=self.columns))
+        self._buffered += len(df)
+        self.row_count += len(df)
+        self._maybe_spill()
+
+    def _buffer_frame(self):
+        frames = list(self._frames)
+        if self._rows:
+            frames.append(pd.DataFrame(self._rows, columns=self.columns))
+        if not frames:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat(frames, ignore_index=True)
+
+    def _maybe_spill(self):
+        if not self.chunk_size or self._buffered < self.chunk_size:
+            return
+        if self._chunk_dir is None:
+            self._chunk_dir = tempfile.mkdtemp(
+                dir=os.path.dirname(os.path.abspath(self.csv_file)), prefix=".chunks_"
+            )
+        chunk_file = os.path.join(self._chunk_dir, f"chunk_{len(self._chunk_files)}.pkl")
+        self._buffer_frame().to_pickle(chunk_file)
+        self._chunk_files.append(chunk_file)
+        self._rows, self._frames, self._buffered = [], [], 0
+
+    def _cleanup(self):
+        if self._chunk_dir is not None:
+            shutil.rmtree(self._chunk_dir, ignore_errors=True)
+            self._chunk_dir = None
+        self._chunk_files = []
+
+    def collect(self):
+        """合并内存缓存与磁盘分块，返回完整的DataFrame（未排序）"""
+        frames = [pd.read_pickle(f) for f in self._chunk_files]
+        # 刚好落盘后内存缓存为空，不参与拼接（空表会影响拼接后的列类型推断）
+        if self._buffered or not frames:
+            frames.append(self._buffer_frame())
+        return pd.concat(frames, ignore_index=True)
+
+    def finalize(self, normalize=None):
+        """
+        一次性排序+去重并原子写入目标CSV，返回最终DataFrame
+        normalize：可选的清洗函数 df -> df，在排序去重前执行
+        没有任何数据时不覆盖原文件，返回空DataFrame
+        排序去重和写盘的耗时分别记入当前任务运行指标的 sort / write 阶段
+        """
+        metrics = current_metrics()
+        try:
+            with metrics.stage("sort"):
+                df = self.collect()
+                if df.empty:
+                    return df
+                if normalize is not None:
+                    df = normalize(df)
+                if self.sort_by:
+                    df = df.sort_values(by=self.sort_by, ascending=False, kind="stable")
+                if self.dedupe_on:
+                    df = df.drop_duplicates(subset=[self.dedupe_on], keep="first")
+            with metrics.stage("write"):
+                atomic_write_csv(df, self.csv_file)
+            metrics.set("rows_written", len(df))
+            return df
+        finally:
+            self._cleanup()
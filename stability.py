@@ -0,0 +1,198 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from history_store import DATASETS, PAYER_ONLY_DATASETS, list_dates, partition_file, read_partition
+from snapshot_writer import replace_file
+from symbol_master import normalize_codes
+from trading_calendar import now_market
+
+# ====================== 分红稳定性指标（增量计算） ======================
+# 每个数据集一张按代码的状态表：data/stability/<数据集>.parquet
+# 状态 = 截至上一个日期已提交的累计量 + 最近一个日期的待定观测（同一天再次更新时只替换待定观测）
+# 每来一份新快照只做一次向量化的增量更新，不回看历史，历史增长到几年也不会变慢
+STATE_DIR = "data/stability"
+STATE_COLUMNS = [
+    "代码", "n", "mean", "m2", "streak", "max_streak", "price_peak", "max_drawdown", "yield_peak",
+    "committed_date", "pending_date", "pending_yield", "pending_price",
+]
+# 看板直接排序/筛选的派生列
+METRIC_COLUMNS = [
+    "代码", "观测期数", "股息率均值", "股息率波动", "波动系数", "连续分红期数", "最长连续分红期数",
+    "当前回撤(%)", "最大回撤(%)", "股息率距峰值(%)", "更新日期",
+]
+
+def state_file(dataset):
+    return os.path.join(STATE_DIR, f"{dataset}.parquet")
+
+def empty_state():
+    return pd.DataFrame({col: pd.Series(dtype=object if col in ("代码", "committed_date", "pending_date") else float)
+                         for col in STATE_COLUMNS})
+
+def load_state(dataset, columns=None):
+    path = state_file(dataset)
+    if not os.path.exists(path):
+        state = empty_state()
+        return state if columns is None else state.reindex(columns=columns)
+    return read_partition(path, columns)
+
+def _fold(n, mean, m2, streak, max_streak, price_peak, max_drawdown, yield_peak, y, p):
+    """
+    把一期观测 (股息率 y, 价格 p) 合入累计量（全部为numpy数组，逐元素）：
+    - Welford 在线算法更新股息率均值与平方差和
+    - 股息率>0 记为一期分红，连续期数+1，否则归零
+    - 价格峰值与最大回撤、股息率峰值
+    缺失的观测（NaN）不改变对应的累计量
+    """
+    has_y = ~np.isnan(y)
+    y0 = np.where(has_y, y, 0.0)
+    n1 = n + has_y
+    delta = y0 - mean
+    mean1 = np.where(has_y, mean + delta / np.maximum(n1, 1), mean)
+    m2_1 = np.where(has_y, m2 + delta * (y0 - mean1), m2)
+    streak1 = np.where(has_y, np.where(y0 > 0, streak + 1, 0), streak)
+    max_streak1 = np.maximum(max_streak, streak1)
+    yield_peak1 = np.fmax(yield_peak, y)
+    price_peak1 = np.fmax(price_peak, p)
+    drawdown = np.where(price_peak1 > 0, 1 - p / price_peak1, np.nan)
+    max_drawdown1 = np.fmax(max_drawdown, drawdown)
+    return n1, mean1, m2_1, streak1, max_streak1, price_peak1, max_drawdown1, yield_peak1, drawdown
+
+def _arrays(state):
+    cols = ["n", "mean", "m2", "streak", "max_streak", "price_peak", "max_drawdown", "yield_peak"]
+    return [state[col].to_numpy(dtype=float) for col in cols]
+
+def update_state(state, snapshot, day, payers_only=False):
+    """
+    用 day 这一天的快照增量更新状态表（返回新表）：
+    - day 晚于某代码的待定日期：先把待定观测提交进累计量，再把新观测设为待定
+    - day 等于待定日期（同一天重复更新）：直接替换待定观测
+    - 早于待定日期的快照忽略
+    payers_only：快照只包含分红股（如申万数据集），已跟踪但不在快照中的代码记为股息率0、价格缺失的观测，
+    连续分红期数归零、均值和波动继续更新，而不是停留在最后一次分红时的数值
+    """
+    day = day.isoformat()
+    obs = pd.DataFrame({
+        "代码": normalize_codes(snapshot["代码"]).to_numpy(),
+        "y": pd.to_numeric(snapshot["股息率(%)"], errors="coerce").to_numpy(dtype=float),
+        "p": pd.to_numeric(snapshot["最新价"], errors="coerce").to_numpy(dtype=float),
+    }).drop_duplicates(subset=["代码"]).set_index("代码")
+    if payers_only:
+        stopped = pd.Index(state["代码"]).difference(obs.index)
+        if len(stopped):
+            obs = pd.concat([obs, pd.DataFrame({"y": 0.0, "p": np.nan}, index=stopped)])
+
+    state = state.set_index("代码")
+    new_codes = obs.index.difference(state.index)
+    if len(new_codes):
+        fresh = pd.DataFrame(index=new_codes, columns=state.columns)
+        fresh[["n", "mean", "m2", "streak", "max_streak"]] = 0.0
+        state = pd.concat([state, fresh]) if len(state) else fresh
+    state = state.astype({col: float for col in STATE_COLUMNS[1:] if col not in ("committed_date", "pending_date")})
+
+    idx = state.index.get_indexer(obs.index)
+    pending_date = state["pending_date"].to_numpy(dtype=object)[idx]
+    advance = np.array([d is None or (isinstance(d, float) and np.isnan(d)) or d < day for d in pending_date], dtype=bool)
+    replace = np.array([isinstance(d, str) and d == day for d in pending_date], dtype=bool)
+
+    # 1) 需要前进的代码：先提交旧的待定观测
+    commit_rows = idx[advance]
+    has_pending = state["pending_date"].iloc[commit_rows].notna().to_numpy()
+    commit_rows = commit_rows[has_pending]
+    if len(commit_rows):
+        sub = state.iloc[commit_rows]
+        folded = _fold(*_arrays(sub), sub["pending_yield"].to_numpy(dtype=float), sub["pending_price"].to_numpy(dtype=float))
+        for col, values in zip(["n", "mean", "m2", "streak", "max_streak", "price_peak", "max_drawdown", "yield_peak"], folded):
+            state.iloc[commit_rows, state.columns.get_loc(col)] = values
+        state.iloc[commit_rows, state.columns.get_loc("committed_date")] = sub["pending_date"].to_numpy()
+
+    # 2) 前进或同日替换的代码：写入新的待定观测
+    rows = idx[advance | replace]
+    values = obs.iloc[np.flatnonzero(advance | replace)]
+    state.iloc[rows, state.columns.get_loc("pending_date")] = day
+    state.iloc[rows, state.columns.get_loc("pending_yield")] = values["y"].to_numpy()
+    state.iloc[rows, state.columns.get_loc("pending_price")] = values["p"].to_numpy()
+    return state.reset_index(names="代码")[STATE_COLUMNS]
+
+def metrics_frame(state):
+    """把待定观测临时合入累计量，得到看板使用的派生指标（不修改状态本身）"""
+    if state.empty:
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    has_pending = state["pending_date"].notna().to_numpy()
+    y = np.where(has_pending, state["pending_yield"].to_numpy(dtype=float), np.nan)
+    p = np.where(has_pending, state["pending_price"].to_numpy(dtype=float), np.nan)
+    n, mean, m2, streak, max_streak, _, max_drawdown, yield_peak, drawdown = _fold(*_arrays(state), y, p)
+    std = np.sqrt(np.where(n > 1, m2 / np.maximum(n - 1, 1), np.nan))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = np.where(mean > 0, std / mean, np.nan)
+        from_peak = np.where(yield_peak > 0, (1 - y / yield_peak) * 100, np.nan)
+    return pd.DataFrame({
+        "代码": state["代码"].to_numpy(),
+        "观测期数": n.astype(int),
+        "股息率均值": mean.round(3),
+        "股息率波动": std.round(3),
+        "波动系数": cv.round(3),
+        "连续分红期数": streak.astype(int),
+        "最长连续分红期数": max_streak.astype(int),
+        "当前回撤(%)": (drawdown * 100).round(2),
+        "最大回撤(%)": (max_drawdown * 100).round(2),
+        "股息率距峰值(%)": from_peak.round(2),
+        "更新日期": state["pending_date"].where(state["pending_date"].notna(), state["committed_date"]).to_numpy(),
+    })
+
+def save_state(state, dataset):
+    """状态列与派生指标列写在同一个文件里，看板按列投影只读取派生指标"""
+    path = state_file(dataset)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pd.concat([state.reset_index(drop=True), metrics_frame(state).drop(columns=["代码"]).reset_index(drop=True)], axis=1)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_", suffix=".parquet")
+    os.close(fd)
+    try:
+        table.to_parquet(tmp_path, index=False, compression="zstd")
+        replace_file(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
+
+def update_stability(snapshot, dataset, day=None):
+    """更新脚本调用的入口：新快照到达时增量更新状态表，失败只提示"""
+    try:
+        day = day or now_market().date()
+        state = update_state(load_state(dataset, STATE_COLUMNS), snapshot, day, dataset in PAYER_ONLY_DATASETS)
+        save_state(state, dataset)
+        return state
+    except Exception as e:
+        print(f"⚠️ 更新稳定性指标失败：{e}")
+        return None
+
+def load_metrics(dataset="xueqiu"):
+    """看板读取：只投影派生指标列"""
+    path = state_file(dataset)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=METRIC_COLUMNS)
+    return read_partition(path, METRIC_COLUMNS)
+
+def rebuild(dataset):
+    """从历史库按日期顺序重放全部分区，重建状态表（首次启用或修正数据后使用）"""
+    state = empty_state()
+    dates = list_dates(dataset)
+    for day in dates:
+        state = update_state(state, read_partition(partition_file(dataset, day), ["代码", "股息率(%)", "最新价"]), day,
+                             dataset in PAYER_ONLY_DATASETS)
+    save_state(state, dataset)
+    return state, len(dates)
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="分红稳定性指标（增量状态表）")
+    parser.add_argument("--dataset", choices=list(DATASETS), default="xueqiu")
+    parser.add_argument("--rebuild", action="store_true", help="从历史库重放全部分区重建状态表")
+    parser.add_argument("--top", type=int, default=20, help="打印连续分红期数最长、波动最低的前N支")
+    args = parser.parse_args()
+    if args.rebuild:
+        state, n_dates = rebuild(args.dataset)
+        print(f"🔁 已从 {n_dates} 个日期分区重建 {len(state)} 支股票的稳定性状态")
+    metrics = load_metrics(args.dataset)
+    print(metrics.sort_values(["连续分红期数", "波动系数"], ascending=[False, True]).head(args.top).to_string(index=False))
@@ -0,0 +1,96 @@
+import os
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# ====================== A股代码主表 ======================
+SYMBOL_FILE = "data/a_stock_codes.csv"
+UNKNOWN_NAME = "未知名称"
+# 交易所前缀规则（与雪球代码前缀一致）
+EXCHANGE_PREFIXES = [
+    ("SH", ("60", "68")),
+    ("SZ", ("00", "30")),
+    ("BJ", ("8",)),
+]
+
+# 单个与向量化标准化共用的规则：取第一段连续数字（937.0 -> 937，SZ000937 -> 000937）
+CODE_DIGITS = r"(\d+)"
+_CODE_DIGITS_RE = re.compile(CODE_DIGITS)
+
+def normalize_code(code):
+    """单个代码标准化为6位数字：兼容 937 / 937.0 / 000937.SZ / SZ000937 等写法，无数字时返回空字符串"""
+    match = _CODE_DIGITS_RE.search(str(code))
+    return match.group(1).zfill(6) if match else ""
+
+def normalize_codes(codes):
+    """向量化标准化代码列（任意来源的Series），返回6位字符串Series，规则与 normalize_code 相同"""
+    series = pd.Series(codes)
+    digits = series.astype(str).str.extract(CODE_DIGITS, expand=False)
+    return digits.fillna("").str.zfill(6).where(digits.notna(), "")
+
+def exchange_of(code):
+    """根据代码前缀判断交易所（SH/SZ/BJ），非A股代码返回None"""
+    for exchange, prefixes in EXCHANGE_PREFIXES:
+        if code.startswith(prefixes):
+            return exchange
+    return None
+
+def exchanges_of(codes):
+    """向量化判断交易所，codes 为已标准化的6位代码Series，非A股为None"""
+    codes = pd.Series(codes).astype(str)
+    conditions = [codes.str.startswith(prefixes) for _, prefixes in EXCHANGE_PREFIXES]
+    choices = [exchange for exchange, _ in EXCHANGE_PREFIXES]
+    return pd.Series(np.select(conditions, choices, default=None), index=codes.index)
+
+class SymbolMaster:
+    """代码主表：启动时加载一次，提供 O(1) 的代码->名称/交易所查询"""
+
+    def __init__(self, codes, names):
+        codes = normalize_codes(codes)
+        names = pd.Series(names, index=codes.index).astype(str).str.replace(" ", "", regex=False)
+        self._names = dict(zip(codes, names))
+
+    @classmethod
+    def from_csv(cls, path=SYMBOL_FILE):
+        df = pd.read_csv(path, dtype={"code": str})
+        return cls(df["code"], df["name"])
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, code):
+        return normalize_code(code) in self._names
+
+    def name(self, code, default=UNKNOWN_NAME):
+        return self._names.get(normalize_code(code), default)
+
+    def names(self, codes, default=UNKNOWN_NAME):
+        """向量化查询名称"""
+        return normalize_codes(codes).map(self._names).fillna(default)
+
+    def to_frame(self):
+        """全部代码及名称（code/name 两列），用于全市场遍历"""
+        return pd.DataFrame({"code": list(self._names.keys()), "name": list(self._names.values())})
+
+    def exchange(self, code):
+        return exchange_of(normalize_code(code))
+
+    def xq_symbol(self, code):
+        """雪球代码（如 SH600036），非A股代码返回None"""
+        code = normalize_code(code)
+        exchange = exchange_of(code)
+        return f"{exchange}{code}" if exchange else None
+
+@lru_cache(maxsize=1)
+def get_symbol_master(path=SYMBOL_FILE):
+    """进程内共享的主表；本地文件不存在时调用 fetch_all_stock_info 生成"""
+    if not os.path.exists(path):
+        from fetch_all_stock_info import get_all_a_stock_codes
+        df = get_all_a_stock_codes()
+        if df is None:
+            print("⚠️ 获取A股代码表失败，代码主表为空")
+            return SymbolMaster([], [])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        df.to_csv(path, index=False, encoding="utf-8")
+    return SymbolMaster.from_csv(path)
@@ -0,0 +1,31 @@
+import os
+import sys
+import threading
+import pytest
+
+# 模块都在仓库根目录（没有打包），测试直接从根目录导入
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT_DIR, "tests", "fixtures")
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, "bench"))
+
+# 替身服务模拟的股票数（约50个申万三级行业）
+STANDIN_STOCKS = 60
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """各模块都用相对路径 data/...，在临时目录里运行，不改动仓库里的数据"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def standin():
+    """bench/ 的雪球/乐咕乐股替身服务（后台线程），server.url 为根地址，可直接改 server.state 注入故障"""
+    from standin_server import make_server
+    server = make_server(STANDIN_STOCKS)
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,85 @@
+import gzip
+import json
+import os
+import shutil
+import threading
+import http.client
+import pytest
+import api_server
+from api_server import ApiError, SnapshotStore, make_server, route
+from conftest import FIXTURES_DIR
+from history_store import DATASETS
+
+@pytest.fixture
+def store(workdir):
+    """两份抽样快照作为 xueqiu / shenwan 数据集"""
+    os.makedirs("data")
+    for dataset in ("xueqiu", "shenwan"):
+        shutil.copy(os.path.join(FIXTURES_DIR, "snapshots", f"{dataset}.csv"), DATASETS[dataset])
+    store = SnapshotStore(["xueqiu", "shenwan"])
+    assert store.reload() == ["xueqiu", "shenwan"]
+    return store
+
+def _get(store, path, **query):
+    return json.loads(route(store, path, {k: [str(v)] for k, v in query.items()}).body)
+
+def test_top_is_sorted_by_yield(store):
+    items = _get(store, "/v1/xueqiu/top", k=5, min_cap=100)["items"]
+    assert len(items) == 5
+    yields = [item["股息率(%)"] for item in items]
+    assert yields == sorted(yields, reverse=True)
+    assert all(item["总市值(亿)"] >= 100 for item in items)
+
+def test_screen_by_industry(store):
+    items = _get(store, "/v1/shenwan/screen", industry="化学制剂", yield_min=3, sort="yield", k=50)["items"]
+    assert items and all(item["申万3级"] == "化学制剂" and item["股息率(%)"] >= 3 for item in items)
+
+def test_stocks_by_code(store):
+    assert _get(store, "/v1/xueqiu/stocks/2271")["items"][0]["代码"] == "002271"
+    assert _get(store, "/v1/shenwan/stocks", codes="002818,000915")["count"] == 2
+
+@pytest.mark.parametrize("path, query, status", [
+    ("/v1/xueqiu/screen", {"industry": "银行"}, 400),   # 雪球快照没有申万行业列
+    ("/v1/shenwan/screen", {"level": "4"}, 400),
+    ("/v1/shenwan/top", {"k": "many"}, 400),
+    ("/v1/xueqiu/stocks/999999", {}, 404),
+    ("/v1/unknown/top", {}, 404),
+    ("/v1/xueqiu_all/top", {}, 503),                   # 已知数据集但还没有快照
+])
+def test_bad_requests(store, path, query, status):
+    with pytest.raises(ApiError) as error:
+        route(store, path, {k: [v] for k, v in query.items()})
+    assert error.value.status == status
+
+@pytest.fixture
+def server(store, monkeypatch):
+    monkeypatch.setattr(api_server, "SnapshotStore", lambda datasets: store)
+    server = make_server(port=0, datasets=["xueqiu", "shenwan"])
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_etag_gzip_and_errors_on_one_connection(server, monkeypatch):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_port)
+    conn.request("GET", "/v1/shenwan/top?k=100", headers={"Accept-Encoding": "gzip"})
+    response = conn.getresponse()
+    body = response.read()
+    assert response.status == 200 and response.getheader("Content-Encoding") == "gzip"
+    assert json.loads(gzip.decompress(body))["count"] == 100
+    conn.request("GET", "/v1/shenwan/top?k=100", headers={"If-None-Match": response.getheader("ETag")})
+    response = conn.getresponse()
+    assert (response.status, response.read()) == (304, b"")
+
+    def broken(*args):
+        raise RuntimeError("boom")
+    original = api_server.route
+    monkeypatch.setattr(api_server, "route", broken)
+    conn.request("GET", "/v1/shenwan/top")
+    response = conn.getresponse()
+    assert response.status == 500 and "error" in json.loads(response.read())
+    # 出错后连接仍可复用
+    monkeypatch.setattr(api_server, "route", original)
+    conn.request("GET", "/v1/health")
+    assert conn.getresponse().status == 200
+    conn.close()
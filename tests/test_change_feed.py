@@ -0,0 +1,39 @@
+from datetime import date
+import pandas as pd
+import pytest
+from change_feed import diff_snapshots, update_feed
+
+def _snapshot(rows):
+    return pd.DataFrame(rows, columns=["代码", "名称", "最新价", "总市值(亿)", "股息率(%)"])
+
+# 申万快照只含分红股票：000001 下期不再出现，601088 新出现，600000 两期都在
+PREVIOUS = _snapshot([("600000", "浦发银行", 10.0, 3000.0, 4.0), ("000001", "平安银行", 12.0, 2000.0, 5.0)])
+CURRENT = _snapshot([("600000", "浦发银行", 10.0, 3000.0, 4.1), ("601088", "中国神华", 40.0, 8000.0, 6.0)])
+
+def test_payers_only_counts_snapshot_entries_and_exits():
+    feed = diff_snapshots(PREVIOUS, CURRENT, payers_only=True)
+    assert feed["summary"]["新增分红"] == 1
+    assert feed["summary"]["停止分红"] == 1
+    new, removed = feed["new_payers"][0], feed["removed_payers"][0]
+    assert (new["代码"], new["名称"], new["股息率变动"]) == ("601088", "中国神华", pytest.approx(6.0))
+    assert (removed["代码"], removed["名称"], removed["股息率(%)_前"]) == ("000001", "平安银行", pytest.approx(5.0))
+    assert removed["股息率变动"] == pytest.approx(-5.0)
+
+def test_full_snapshots_do_not_treat_exits_as_removed_payers():
+    feed = diff_snapshots(PREVIOUS, CURRENT)
+    assert feed["summary"]["新增分红"] == 0
+    assert feed["summary"]["停止分红"] == 0
+    assert feed["summary"]["新进快照"] == 1
+    assert feed["summary"]["移出快照"] == 1
+
+def test_reruns_on_the_same_day_keep_the_previous_day_baseline(tmp_path):
+    feed_dir = str(tmp_path)
+    assert update_feed(PREVIOUS, "xueqiu", feed_dir, day=date(2024, 1, 2))["previous_at"] is None
+    first = update_feed(CURRENT, "xueqiu", feed_dir, day=date(2024, 1, 3))
+    # 同一天再次更新（价格未变）仍与 1月2日 对比，而不是与当天上一次更新对比
+    again = update_feed(CURRENT, "xueqiu", feed_dir, day=date(2024, 1, 3))
+    assert first["previous_at"] == again["previous_at"] == "2024-01-02"
+    assert again["summary"] == first["summary"]
+    assert again["summary"]["新进快照"] == 1
+    # 下一天：1月3日最后一次快照成为基准
+    assert update_feed(CURRENT, "xueqiu", feed_dir, day=date(2024, 1, 4))["previous_at"] == "2024-01-03"
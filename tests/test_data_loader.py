@@ -0,0 +1,46 @@
+import os
+import numpy as np
+import pytest
+from conftest import FIXTURES_DIR
+from data_loader import compact_frame, drop_unknown_codes, read_source, to_display
+from symbol_master import normalize_codes
+
+# 从 data/ 中两个快照各抽样500行（保持原始写法：雪球代码丢了开头的0，申万代码带交易所后缀）
+SNAPSHOTS = {
+    "xueqiu": os.path.join(FIXTURES_DIR, "snapshots", "xueqiu.csv"),
+    "shenwan": os.path.join(FIXTURES_DIR, "snapshots", "shenwan.csv"),
+}
+# 紧凑表相对 read_csv 结果的最小内存缩减倍数（memory_usage(deep=True)），当前约为 5x / 7.5x
+MIN_RATIO = 4.0
+
+def _memory(df):
+    return int(df.memory_usage(deep=True).sum())
+
+@pytest.fixture(params=list(SNAPSHOTS))
+def raw(request):
+    return read_source(SNAPSHOTS[request.param])
+
+def test_compact_frame_shrinks_memory(raw):
+    ratio = _memory(raw) / _memory(compact_frame(raw))
+    assert ratio >= MIN_RATIO, f"紧凑表内存只缩减了 {ratio:.2f}x"
+
+def test_no_object_columns_left(raw):
+    # 新增的列如果没有对应的紧凑类型会以 object 原样保留，内存缩减会悄悄变小
+    compact = compact_frame(raw)
+    assert [col for col in compact.columns if compact[col].dtype == object] == []
+
+def test_display_round_trip(raw):
+    display = to_display(compact_frame(raw))
+    assert display["代码"].tolist() == normalize_codes(raw["代码"]).tolist()
+    for col in ["最新价", "总市值(亿)", "股息率(%)"]:
+        assert display[col].dtype == np.float64
+        np.testing.assert_allclose(display[col].to_numpy(), raw[col].to_numpy(dtype=float), rtol=0, atol=1e-9)
+    assert display["名称"].astype(str).tolist() == raw["名称"].astype(str).str.replace(" ", "").tolist()
+
+def test_unknown_codes_dropped_before_dedup():
+    # 无法识别的代码都编码为0，直接按代码去重会把互不相关的行合并成一行
+    raw = read_source(SNAPSHOTS["xueqiu"]).head(5).copy()
+    raw.loc[[1, 3], "代码"] = ["N/A", "--"]
+    kept, dropped = drop_unknown_codes(compact_frame(raw))
+    assert dropped == 2
+    assert to_display(kept)["代码"].tolist() == normalize_codes(raw["代码"].drop([1, 3])).tolist()
@@ -0,0 +1,72 @@
+import os
+import re
+import time
+import pytest
+from http_cache import CacheMissError, HttpCache
+
+INDUSTRY = "850000.SI"
+
+def _from_cache(response):
+    # 网络响应是 requests.Response，没有 from_cache 属性
+    return getattr(response, "from_cache", False)
+
+def _url(standin, industry=INDUSTRY):
+    return f"{standin.url}/stockdata/index-composition?industryCode={industry}"
+
+@pytest.fixture
+def cache(tmp_path):
+    return HttpCache(str(tmp_path / "http_cache"), ttls=[(re.compile("index-composition"), 3600)])
+
+def test_fresh_entry_is_served_without_a_request(standin, cache):
+    first = cache.get(_url(standin))
+    requests = standin.state.stats["requests"]
+    second = cache.get(_url(standin))
+    assert (_from_cache(first), _from_cache(second)) == (False, True)
+    assert second.content == first.content
+    assert standin.state.stats["requests"] == requests
+
+def test_composition_pages_always_revalidate():
+    assert HttpCache().ttl_for("https://legulegu.com/stockdata/index-composition?industryCode=850000.SI") == 0
+
+def test_ttl_zero_revalidates_with_etag(standin, cache):
+    cache.get(_url(standin), ttl=0)
+    requests = standin.state.stats["requests"]
+    unchanged = cache.get(_url(standin), ttl=0)
+    # 每次都问服务端：没变时304，正文来自缓存
+    assert standin.state.stats["requests"] == requests + 1
+    assert _from_cache(unchanged)
+    standin.state.compositions[INDUSTRY] = b"<html>changed</html>"
+    changed = cache.get(_url(standin), ttl=0)
+    assert not _from_cache(changed)
+    assert changed.content == b"<html>changed</html>"
+    assert cache.get(_url(standin), ttl=0).content == b"<html>changed</html>"
+
+def test_lru_evicts_least_recently_used(standin, tmp_path):
+    industries = sorted(standin.state.compositions)[:4]
+    sizes = [len(standin.state.compositions[code]) for code in industries]
+    cache = HttpCache(str(tmp_path / "http_cache"), ttls=[(re.compile("index-composition"), 3600)],
+                      max_bytes=sum(sizes[:3]) + 1)
+    for code in industries[:3]:
+        cache.get(_url(standin, code))
+        time.sleep(0.01)
+    cache.get(_url(standin, industries[0]))   # 命中，刷新最近使用时间
+    time.sleep(0.01)
+    cache.get(_url(standin, industries[3]))   # 超出上限，淘汰最久未使用的 industries[1]
+    cached = {code for code in industries if os.path.exists(cache._paths(_url(standin, code))[0])}
+    assert industries[1] not in cached
+    assert {industries[0], industries[3]} <= cached
+    assert cache._current_total() <= cache.max_bytes
+
+def test_offline_serves_expired_entries_and_raises_on_miss(standin, cache):
+    cache.get(_url(standin), ttl=0)
+    cache.offline = True
+    requests = standin.state.stats["requests"]
+    assert _from_cache(cache.get(_url(standin), ttl=0))
+    with pytest.raises(CacheMissError):
+        cache.get(_url(standin, "850001.SI"))
+    assert standin.state.stats["requests"] == requests
+
+def test_use_cache_false_bypasses_disk(standin, cache):
+    response = cache.get(_url(standin), use_cache=False)
+    assert response.status_code == 200
+    assert not os.path.exists(cache.cache_dir)
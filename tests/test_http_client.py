@@ -0,0 +1,161 @@
+import pytest
+import requests
+import http_client
+from http_client import CircuitOpenError, RateLimiter, get_with_retry
+
+class FakeClock:
+    """替换 http_client 中的 time 模块：sleep 只推进时钟，测试不真正等待"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_client, "time", clock)
+    return clock
+
+def test_rate_cap_paces_requests(clock):
+    limiter = RateLimiter(rate=5, burst=1)
+    start = clock.now
+    for _ in range(11):
+        limiter.wait("a")
+    # 桶里的1个令牌立即可用，其余10次按每秒5次放行
+    assert clock.now - start == pytest.approx(2.0)
+
+def test_burst_passes_without_waiting(clock):
+    limiter = RateLimiter(rate=2, burst=3)
+    for _ in range(3):
+        limiter.wait("a")
+    assert clock.sleeps == []
+    limiter.wait("a")
+    assert sum(clock.sleeps) == pytest.approx(0.5)
+
+def test_hosts_have_separate_buckets(clock):
+    limiter = RateLimiter(rate=1, burst=1)
+    limiter.wait("a")
+    limiter.wait("b")
+    assert clock.sleeps == []
+
+def test_zero_rate_never_waits(clock):
+    limiter = RateLimiter(rate=0)
+    for _ in range(100):
+        limiter.wait("a")
+    assert clock.sleeps == []
+
+def test_failure_halves_rate_and_success_recovers(clock):
+    limiter = RateLimiter(rate=4, min_rate=0.5, failure_threshold=100)
+    limiter.record_failure("a")
+    assert limiter.current_rate("a") == pytest.approx(2.0)
+    for _ in range(5):
+        limiter.record_failure("a")
+    assert limiter.current_rate("a") == pytest.approx(0.5)
+    # 加性增：每次成功回升初始速率的5%，最多到 max_rate（默认为初始速率的2倍）
+    limiter.record_success("a")
+    assert limiter.current_rate("a") == pytest.approx(0.7)
+    for _ in range(100):
+        limiter.record_success("a")
+    assert limiter.current_rate("a") == pytest.approx(8.0)
+    assert limiter.current_rate("b") == pytest.approx(4.0)
+
+def test_circuit_opens_and_closes_after_cooldown(clock):
+    limiter = RateLimiter(rate=0, failure_threshold=3, cooldown=60)
+    for _ in range(2):
+        limiter.record_failure("a")
+    limiter.wait("a")
+    limiter.record_failure("a")
+    with pytest.raises(CircuitOpenError):
+        limiter.wait("a")
+    limiter.wait("b")
+    clock.now += 61
+    limiter.wait("a")
+
+def test_success_resets_failure_count(clock):
+    limiter = RateLimiter(rate=0, failure_threshold=3)
+    for _ in range(5):
+        limiter.record_failure("a")
+        limiter.record_failure("a")
+        limiter.record_success("a")
+    limiter.wait("a")
+
+# ====================== get_with_retry ======================
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = b"{}"
+
+def _scripted(*outcomes):
+    """按顺序返回响应或抛出异常的 get，记录调用次数"""
+    calls = []
+
+    def get(url, **kwargs):
+        outcome = outcomes[len(calls)]
+        calls.append(url)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    return get, calls
+
+def test_retries_5xx_with_backoff(clock, monkeypatch):
+    monkeypatch.setattr(http_client.random, "uniform", lambda a, b: 1.0)
+    get, calls = _scripted(FakeResponse(503), FakeResponse(502), FakeResponse(200))
+    r = get_with_retry(get, "http://example/x", backoff=0.5)
+    assert r.status_code == 200
+    assert len(calls) == 3
+    assert clock.sleeps == [0.5, 1.0]
+
+def test_retry_after_header_wins(clock):
+    get, calls = _scripted(FakeResponse(429, {"Retry-After": "7"}), FakeResponse(200))
+    assert get_with_retry(get, "http://example/x").status_code == 200
+    assert clock.sleeps == [7.0]
+
+def test_last_error_response_returned_after_retries(clock):
+    get, calls = _scripted(*[FakeResponse(500)] * 3)
+    assert get_with_retry(get, "http://example/x", retries=2).status_code == 500
+    assert len(calls) == 3
+
+def test_non_retry_status_returned_immediately(clock):
+    get, calls = _scripted(FakeResponse(404))
+    assert get_with_retry(get, "http://example/x").status_code == 404
+    assert clock.sleeps == []
+
+def test_timeout_raises_after_retries(clock):
+    get, calls = _scripted(*[requests.Timeout()] * 3)
+    with pytest.raises(requests.Timeout):
+        get_with_retry(get, "http://example/x", retries=2)
+    assert len(calls) == 3
+    assert len(clock.sleeps) == 2
+
+def test_failures_feed_limiter_and_open_circuit(clock):
+    limiter = RateLimiter(rate=0, failure_threshold=2, cooldown=30)
+    get, calls = _scripted(*[FakeResponse(503)] * 5)
+    # 第二次失败后熔断，第三次尝试前直接抛出，不再发请求
+    with pytest.raises(CircuitOpenError):
+        get_with_retry(get, "http://example/x", limiter=limiter, retries=3, backoff=0.01)
+    assert len(calls) == 2
+    # 其它host不受影响
+    ok, _ = _scripted(FakeResponse(200))
+    assert get_with_retry(ok, "http://other/x", limiter=limiter).status_code == 200
+
+def test_against_standin_error_rate(standin):
+    # 替身服务按 error_rate 随机返回 5xx，重试后仍应拿到全部成功响应
+    standin.state.error_rate = 0.3
+    session = http_client.make_session()
+    try:
+        for _ in range(10):
+            r = get_with_retry(session.get, f"{standin.url}/", retries=8, backoff=0.001, timeout=5)
+            assert r.status_code not in http_client.RETRY_STATUS
+    finally:
+        standin.state.error_rate = 0.0
+        session.close()
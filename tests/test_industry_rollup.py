@@ -0,0 +1,30 @@
+import pandas as pd
+from industry_rollup import load_members, update_rollups
+
+def _rows(code, name, level3, level1):
+    return pd.DataFrame({"代码": [code], "名称": [name], "最新价": [10.0], "总市值(亿)": [1000.0], "股息率(%)": [5.0],
+                         "申万1级": [level1], "申万2级": ["—"], "申万3级": [level3]})
+
+ROWS = {
+    "850001.SI": _rows("600036", "招商银行", "股份制银行Ⅲ", "银行"),
+    "850002.SI": _rows("601088", "中国神华", "煤炭开采", "煤炭"),
+}
+
+def test_failed_industry_keeps_members_and_version(tmp_path):
+    rollup_dir = str(tmp_path)
+    update_rollups(ROWS, {"850001.SI": "v1", "850002.SI": "v1"}, rollup_dir=rollup_dir)
+    # 850002 本次抓取失败，850001 重新抓取
+    members, rollup, n_changed = update_rollups({"850001.SI": ROWS["850001.SI"]}, {"850001.SI": "v2"},
+                                                rollup_dir=rollup_dir, failed=["850002.SI"])
+    assert n_changed == 1
+    versions = dict(zip(members["行业代码"], members["数据版本"]))
+    assert versions == {"850001.SI": "v2", "850002.SI": "v1"}
+    assert "煤炭开采" in set(rollup["行业"])
+    assert load_members(rollup_dir)["代码"].tolist() == members["代码"].tolist()
+
+def test_industry_missing_from_the_list_is_removed(tmp_path):
+    rollup_dir = str(tmp_path)
+    update_rollups(ROWS, {"850001.SI": "v1", "850002.SI": "v1"}, rollup_dir=rollup_dir)
+    members, rollup, _ = update_rollups({"850001.SI": ROWS["850001.SI"]}, {"850001.SI": "v1"}, rollup_dir=rollup_dir)
+    assert set(members["行业代码"]) == {"850001.SI"}
+    assert "煤炭" not in set(rollup["行业"])
@@ -0,0 +1,44 @@
+import glob
+import os
+import pytest
+from conftest import FIXTURES_DIR
+from legulegu_parser import (check_parity, parse_index_composition, parse_index_composition_read_html,
+                             parse_industry_overview, parse_industry_overview_bs4)
+
+# 保存的页面：bench/standin_server.py --dump 生成的行业概览页和成份股页，另加一页手写的边界情况
+# （千分位、空单元格、"--"、单元格内嵌标签、负市盈率）
+PAGES_DIR = os.path.join(FIXTURES_DIR, "legulegu")
+COMPOSITION_PAGES = sorted(glob.glob(os.path.join(PAGES_DIR, "index-composition-*.html")))
+OVERVIEW_PAGE = os.path.join(PAGES_DIR, "sw-industry-overview.html")
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+@pytest.mark.parametrize("path", COMPOSITION_PAGES, ids=os.path.basename)
+def test_index_composition_matches_read_html(path):
+    html = _read(path)
+    fast, legacy = parse_index_composition(html), parse_index_composition_read_html(html)
+    assert len(fast) > 0
+    assert list(fast.columns) == list(legacy.columns)
+    assert check_parity(fast, legacy) == []
+
+def test_industry_overview_matches_bs4():
+    html = _read(OVERVIEW_PAGE)
+    fast, legacy = parse_industry_overview(html), parse_industry_overview_bs4(html)
+    assert len(fast) > 0
+    assert list(fast.columns) == list(legacy.columns)
+    assert check_parity(fast, legacy) == []
+
+def test_edge_cases_are_cleaned():
+    df = parse_index_composition(_read(os.path.join(PAGES_DIR, "index-composition-edge-cases.html")))
+    assert df["市值"].tolist() == [26195.86, 2173.41, 9644.07]
+    assert df.loc[1, "股票简称"] == "平安银行"
+    assert df["股息率"].isna().tolist() == [False, True, False]
+    assert df["序号"].dtype.kind == "i"
+
+def test_missing_sections_raise_parse_error():
+    with pytest.raises(ValueError, match="level3Items"):
+        parse_industry_overview("<html><body><div id='other'></div></body></html>")
+    with pytest.raises(ValueError, match="No tables"):
+        parse_index_composition("<html><body><p>维护中</p></body></html>")
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_loader import compact_frame
+from portfolio import Portfolio
+
+SNAPSHOT = pd.DataFrame({
+    "代码": ["600036", "601398"],
+    "名称": ["招商银行", "工商银行"],
+    "最新价": [38.2412345678, 7.3512345678],
+    "总市值(亿)": [9644.07, 26195.86],
+    "股息率(%)": [7.8791234567, 4.1631234567],
+})
+HOLDINGS = pd.DataFrame({"代码": ["600036", "601398"], "持股数": [1000.0, 20000.0],
+                         "投入金额": [np.nan, np.nan], "成本价": [np.nan, np.nan]})
+
+def test_raw_snapshot_keeps_full_precision():
+    portfolio = Portfolio.from_frames(HOLDINGS, SNAPSHOT)
+    np.testing.assert_array_equal(portfolio.price, SNAPSHOT["最新价"].to_numpy())
+    np.testing.assert_array_equal(portfolio.yield_pct, SNAPSHOT["股息率(%)"].to_numpy())
+    expected = (HOLDINGS["持股数"] * SNAPSHOT["最新价"] * SNAPSHOT["股息率(%)"] / 100).sum()
+    assert portfolio.totals()["年分红"] == pytest.approx(expected, rel=1e-15)
+
+def test_compact_snapshot_restores_float32_columns():
+    portfolio = Portfolio.from_frames(HOLDINGS, compact_frame(SNAPSHOT))
+    # float32 只有约7位有效数字，还原为最短十进制表示
+    assert portfolio.price.tolist() == [38.241234, 7.3512344]
+    assert portfolio.price.dtype == np.float64
@@ -0,0 +1,24 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from refresh_daemon import RETRY_DELAY, TIER_WATCHLIST, RefreshDaemon
+
+def _daemon(monkeypatch):
+    daemon = RefreshDaemon(trading_hours_only=False)
+    daemon.trading = True
+    monkeypatch.setattr(daemon, "_ensure_session", lambda: None)
+    # 行情接口持续失败
+    monkeypatch.setattr(daemon, "fetch_batch", lambda batch: [(code, tier, None) for code, tier in batch])
+    return daemon
+
+def test_failed_codes_wait_for_retry_after_rebuild(monkeypatch):
+    daemon = _daemon(monkeypatch)
+    tiers = {"600036": TIER_WATCHLIST, "601398": TIER_WATCHLIST}
+    daemon.scheduler.rebuild(tiers, daemon.due_time)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        assert daemon.tick(executor) == 0
+    # 写盘后重新分层：失败的代码仍要等到重试时间
+    daemon.scheduler.rebuild(tiers, daemon.due_time)
+    now = time.time()
+    assert daemon.scheduler.pop_due(now, 10) == []
+    assert daemon.scheduler.next_due() >= now + RETRY_DELAY - 1
+    assert len(daemon.scheduler.pop_due(now + RETRY_DELAY + 1, 10)) == 2
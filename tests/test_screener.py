@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import FIXTURES_DIR
+from data_loader import compact_frame, read_source, to_display
+from screener import Screener
+
+# 申万快照抽样500行：只有3级行业有区分度，市盈率ttm有41个缺失值
+SNAPSHOT = os.path.join(FIXTURES_DIR, "snapshots", "shenwan.csv")
+
+@pytest.fixture(scope="module")
+def raw():
+    return read_source(SNAPSHOT)
+
+@pytest.fixture(scope="module")
+def screener(raw):
+    return Screener.from_frame(raw)
+
+@pytest.fixture(scope="module")
+def frame(raw):
+    # 与 Screener 内部行号一致的展示表，作为 pandas 逐行判断的对照
+    return to_display(compact_frame(raw).reset_index(drop=True))
+
+def _brute(frame, ranges=(), industries=None, min_cap=None, max_cap=None):
+    mask = pd.Series(True, index=frame.index)
+    for col, (low, high) in dict(ranges).items():
+        values = pd.to_numeric(frame[col], errors="coerce")
+        mask &= values.notna()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    if industries is not None:
+        mask &= frame["申万3级"].isin(industries)
+    if min_cap is not None:
+        mask &= frame["总市值(亿)"] >= min_cap
+    if max_cap is not None:
+        mask &= frame["总市值(亿)"] <= max_cap
+    return set(np.flatnonzero(mask.to_numpy()))
+
+CASES = [
+    dict(ranges={"股息率(%)": (3, None)}),
+    dict(ranges={"股息率(%)": (2, 6), "市盈率ttm": (0, 15)}),
+    dict(ranges={"市净率": (None, 1)}),
+    dict(min_cap=100),
+    dict(max_cap=50),
+    dict(min_cap=44.86, max_cap=181.575),
+    dict(ranges={"股息率(%)": (1, None)}, min_cap=50, max_cap=500),
+]
+
+@pytest.mark.parametrize("case", CASES)
+def test_query_matches_pandas(screener, frame, case):
+    rows = screener.query(k=None, **case)
+    assert len(rows) == len(set(rows))
+    assert set(rows) == _brute(frame, **case)
+
+def test_industry_filter_with_cap(screener, frame):
+    names = frame["申万3级"].value_counts().index[:3].tolist()
+    rows = screener.query(industries=names, level=3, min_cap=50, k=None)
+    assert set(rows) == _brute(frame, industries=names, min_cap=50)
+    assert set(screener.query(industries=names, k=None)) == _brute(frame, industries=names)
+
+def test_unknown_industry_matches_nothing(screener):
+    assert len(screener.query(industries=["不存在的行业"], k=None)) == 0
+
+def test_top_k_order(screener, frame):
+    rows = screener.query(ranges={"股息率(%)": (1, None)}, k=10)
+    expected = frame.loc[frame["股息率(%)"] >= 1, "股息率(%)"].nlargest(10)
+    assert frame["股息率(%)"].to_numpy()[rows].tolist() == expected.tolist()
+
+def test_nan_sorted_last(screener, frame):
+    rows = screener.query(sort_by="市盈率ttm", ascending=True, k=None)
+    assert len(rows) == len(frame)
+    values = frame["市盈率ttm"].to_numpy()[rows]
+    n_nan = int(np.isnan(values).sum())
+    assert n_nan > 0
+    assert np.isnan(values[-n_nan:]).all()
+    assert (np.diff(values[:-n_nan]) >= 0).all()
+    # 升序取前k时缺失值不会挤进结果
+    assert not np.isnan(frame["市盈率ttm"].to_numpy()[screener.query(sort_by="市盈率ttm", ascending=True, k=20)]).any()
@@ -0,0 +1,72 @@
+import os
+import stat
+import pandas as pd
+import pytest
+import industry_rollup
+from snapshot_writer import SnapshotWriter, atomic_write_csv
+
+COLUMNS = ["代码", "名称", "股息率(%)"]
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def _rows(n, offset=0):
+    return [{"代码": f"{600000 + (i + offset) % 7:06d}", "名称": f"股票{i}", "股息率(%)": float(i)} for i in range(n)]
+
+def test_replace_keeps_existing_mode(tmp_path):
+    path = str(tmp_path / "snapshot.csv")
+    atomic_write_csv(pd.DataFrame(_rows(3)), path)
+    os.chmod(path, 0o644)
+    atomic_write_csv(pd.DataFrame(_rows(4)), path)
+    assert _mode(path) == 0o644
+    rollup_path = str(tmp_path / "industry" / "rollup.parquet")
+    industry_rollup._write(pd.DataFrame(_rows(3)), rollup_path)
+    os.chmod(rollup_path, 0o640)
+    industry_rollup._write(pd.DataFrame(_rows(4)), rollup_path)
+    assert _mode(rollup_path) == 0o640
+
+def test_new_file_follows_umask(tmp_path):
+    old = os.umask(0o022)
+    try:
+        path = str(tmp_path / "snapshot.csv")
+        atomic_write_csv(pd.DataFrame(_rows(3)), path)
+    finally:
+        os.umask(old)
+    assert _mode(path) == 0o666 & ~old
+
+@pytest.mark.parametrize("chunk_size", [None, 5])
+def test_finalize_sorts_and_dedupes_across_chunks(tmp_path, chunk_size):
+    path = str(tmp_path / "snapshot.csv")
+    writer = SnapshotWriter(path, COLUMNS, chunk_size=chunk_size)
+    for row in _rows(12):
+        writer.add(row)
+    writer.add_frame(pd.DataFrame(_rows(3, offset=1)).assign(额外列="丢弃"))
+    if chunk_size:
+        assert len(writer._chunk_files) == 3
+    df = writer.finalize()
+    # 同一代码只保留股息率最高的一行，按股息率降序
+    assert df["代码"].is_unique and len(df) == 7
+    assert df["股息率(%)"].tolist() == sorted(df["股息率(%)"], reverse=True)
+    assert df.set_index("代码").loc["600000", "股息率(%)"] == 7.0
+    assert list(pd.read_csv(path, dtype={"代码": str}).columns) == COLUMNS
+    # 分块临时目录已清理
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".")] == []
+
+def test_failed_write_keeps_previous_snapshot(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.csv")
+    atomic_write_csv(pd.DataFrame(_rows(3)), path)
+    before = open(path, "rb").read()
+    # 没有数据时不覆盖原文件
+    assert SnapshotWriter(path, COLUMNS).finalize().empty
+
+    def disk_full(self, f, **kwargs):
+        f.write("代码,名称\n60")
+        raise OSError("No space left on device")
+    monkeypatch.setattr(pd.DataFrame, "to_csv", disk_full)
+    writer = SnapshotWriter(path, COLUMNS)
+    writer.add(_rows(1)[0])
+    with pytest.raises(OSError):
+        writer.finalize()
+    # 写了一半的临时文件已删除，读取方看到的仍是上一份完整快照
+    assert open(path, "rb").read() == before
+    assert os.listdir(tmp_path) == ["snapshot.csv"]
@@ -0,0 +1,43 @@
+from datetime import date
+import pandas as pd
+import pytest
+from stability import empty_state, metrics_frame, update_state
+
+def _snapshot(rows):
+    return pd.DataFrame(rows, columns=["代码", "股息率(%)", "最新价"])
+
+def _replay(snapshots, payers_only):
+    state = empty_state()
+    for day, rows in enumerate(snapshots, start=1):
+        state = update_state(state, _snapshot(rows), date(2024, 1, day), payers_only)
+    return metrics_frame(state).set_index("代码")
+
+# 600000 连续分红三期，000001 第一期后不再出现在快照中（申万快照只保留股息率>0的股票）
+SNAPSHOTS = [
+    [("600000", 3.0, 10.0), ("000001", 4.0, 20.0)],
+    [("600000", 3.0, 10.0)],
+    [("600000", 3.0, 10.0)],
+]
+
+def test_payer_dropping_out_resets_streak():
+    metrics = _replay(SNAPSHOTS, payers_only=True)
+    stopped = metrics.loc["000001"]
+    assert stopped["观测期数"] == 3
+    assert stopped["连续分红期数"] == 0
+    assert stopped["最长连续分红期数"] == 1
+    assert stopped["股息率均值"] == pytest.approx(4 / 3, abs=1e-3)
+    assert stopped["股息率波动"] > 0
+    assert stopped["更新日期"] == "2024-01-03"
+    assert metrics.loc["600000", "连续分红期数"] == 3
+
+def test_resumed_payer_starts_new_streak():
+    metrics = _replay(SNAPSHOTS + [[("600000", 3.0, 10.0), ("000001", 5.0, 21.0)]], payers_only=True)
+    assert metrics.loc["000001", "连续分红期数"] == 1
+    assert metrics.loc["000001", "观测期数"] == 4
+
+def test_full_snapshots_leave_absent_codes_untouched():
+    # 雪球快照不只包含分红股，不在快照中的代码可能只是本次没有抓取，不记为0
+    stopped = _replay(SNAPSHOTS, payers_only=False).loc["000001"]
+    assert stopped["观测期数"] == 1
+    assert stopped["连续分红期数"] == 1
+    assert stopped["更新日期"] == "2024-01-01"
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+from symbol_master import normalize_code, normalize_codes
+
+CASES = [
+    (937, "000937"),
+    (937.0, "000937"),
+    ("937.0", "000937"),
+    ("000937.SZ", "000937"),
+    ("SZ000937", "000937"),
+    (" sh600036 ", "600036"),
+    ("abc", ""),
+    ("", ""),
+]
+
+@pytest.mark.parametrize("raw, expected", CASES)
+def test_normalize_code(raw, expected):
+    assert normalize_code(raw) == expected
+
+def test_scalar_and_vector_rules_agree():
+    raw = [raw for raw, _ in CASES]
+    assert normalize_codes(pd.Series(raw, dtype=object)).tolist() == [normalize_code(x) for x in raw]
@@ -0,0 +1,41 @@
+import os
+import shutil
+import pandas as pd
+import pytest
+import update_data
+from conftest import ROOT_DIR
+from history_store import DATASETS, load_latest
+
+@pytest.fixture
+def sync(standin, workdir, monkeypatch):
+    """指向替身服务的雪球同步；run(universe, n) 抓取替身服务中的前 n 支股票"""
+    os.makedirs("data")
+    shutil.copy(os.path.join(ROOT_DIR, "data", "a_stock_codes.csv"), "data")
+    monkeypatch.setattr(update_data, "XQ_HOME_URL", f"{standin.url}/")
+    monkeypatch.setattr(update_data, "XQ_API_BASE", standin.url)
+    stocks = pd.DataFrame([{"code": q["code"], "name": q["name"]} for q in standin.state.quotes.values()])
+
+    def run(universe, n):
+        monkeypatch.setattr(update_data, "load_universe", lambda _: stocks.head(n).copy())
+        update_data.fetch_and_save_data(concurrency=2, rate_limit=0, universe=universe)
+    return run
+
+def test_full_market_has_its_own_dataset(sync):
+    sync("watchlist", 5)
+    sync("all", 40)
+    sync("watchlist", 5)
+    assert len(pd.read_csv(DATASETS["xueqiu"])) == 5
+    assert len(pd.read_csv(DATASETS["xueqiu_all"])) == 40
+    # 同一天交替运行，各自的历史分区互不覆盖
+    assert len(load_latest("xueqiu")) == 5
+    assert len(load_latest("xueqiu_all")) == 40
+
+@pytest.mark.parametrize("shard_index", [-1, 4])
+def test_shard_index_out_of_range(shard_index):
+    with pytest.raises(ValueError):
+        update_data.check_shards(4, "hash", shard_index)
+
+def test_exchange_shards_capped():
+    update_data.check_shards(3, "exchange", 2)
+    with pytest.raises(ValueError):
+        update_data.check_shards(4, "exchange")
@@ -0,0 +1,62 @@
+import time
+import pandas as pd
+import pytest
+import update_data_sw
+from legulegu_parser import parse_industry_overview
+from run_metrics import current_metrics
+from change_feed import load_feed
+from industry_rollup import load_members
+from stability import load_metrics
+
+@pytest.fixture
+def crawl(standin, workdir, monkeypatch):
+    monkeypatch.setattr(update_data_sw, "LEGULEGU_BASE", standin.url)
+
+    def run(**kwargs):
+        update_data_sw.fetch_and_save_dividend_data(download_workers=2, parse_workers=0, rate_limit=0, **kwargs)
+        return pd.read_csv("data/dividend_data_shenwan.csv", dtype={"代码": str})
+    return run
+
+def _industry_code(standin, name):
+    overview = parse_industry_overview(standin.state.overview.decode("utf-8"))
+    return overview.loc[overview["行业名称"] == name, "行业代码"].iloc[0]
+
+def test_failed_industry_keeps_stability_and_change_feed(standin, crawl):
+    snapshot = crawl()
+    before = load_metrics("shenwan").set_index("代码")
+    industry = snapshot["申万3级"].iloc[0]
+    members = snapshot.loc[snapshot["申万3级"] == industry, "代码"].tolist()
+    # 该行业的成份股页面返回404
+    del standin.state.compositions[_industry_code(standin, industry)]
+
+    feed_before = load_feed("shenwan")
+    partial = crawl()
+    assert not set(members) & set(partial["代码"])
+    assert load_feed("shenwan") == feed_before
+    # 行业汇总保留失败行业上次的成份股
+    assert set(members) <= set(load_members()["代码"])
+    after = load_metrics("shenwan").set_index("代码")
+    pd.testing.assert_frame_equal(after.loc[members], before.loc[members])
+    assert (after.loc[members, "连续分红期数"] > 0).all()
+
+def test_resume_reuses_checkpointed_industries(standin, crawl):
+    first = crawl()
+    requests = standin.state.stats["requests"]
+    resumed = crawl(resume=True)
+    # 只重新请求了行业列表，成份股页面全部来自checkpoint
+    assert standin.state.stats["requests"] == requests + 1
+    assert current_metrics().to_dict()["values"]["industries_reused"] == len(standin.state.compositions)
+    pd.testing.assert_frame_equal(resumed, first)
+
+def test_checkpoint_time_not_counted_in_fetch(standin, crawl, monkeypatch):
+    save_checkpoint = update_data_sw.save_checkpoint
+
+    def slow_save(industry_code, rows):
+        time.sleep(0.02)
+        save_checkpoint(industry_code, rows)
+    monkeypatch.setattr(update_data_sw, "save_checkpoint", slow_save)
+    crawl()
+    report = current_metrics().to_dict()
+    stages = report["stages_s"]
+    assert stages["checkpoint_save"] >= 0.02 * len(standin.state.compositions)
+    assert stages["fetch"] + stages["checkpoint_save"] <= report["duration_s"]
@@ -0,0 +1,36 @@
+import pytest
+from symbol_master import UNKNOWN_NAME
+from watchlist_store import WatchlistStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = WatchlistStore(str(tmp_path / "watchlist.db"), legacy_json=None)
+    store.set_items([("600036", "招商银行"), ("601398", "工商银行"), ("000001", "平安银行")])
+    yield store
+    store.close()
+
+def test_concurrent_sessions_keep_each_others_changes(store):
+    # 两个会话载入同一份清单后各自编辑
+    base = store.codes()
+    first = base + ["601088"]
+    second = [code for code in base if code != "000001"] + ["600900"]
+    store.apply_changes([(code, "") for code in first if code not in base], [c for c in base if c not in first])
+    merged = store.apply_changes([(code, "") for code in second if code not in base], [c for c in base if c not in second])
+    assert merged == ["600036", "601398", "601088", "600900"]
+    assert store.codes() == merged
+
+def test_apply_changes_keeps_existing_rows(store):
+    revision = store.revision()
+    assert store.apply_changes([("SH600036", "")], ["999999"]) == ["600036", "601398", "000001"]
+    assert store.items()[0] == {"code": "600036", "name": "招商银行"}
+    assert store.revision() == revision + 1
+
+def test_all_items_prefers_newest_real_name(store):
+    store.add("601088", UNKNOWN_NAME, name="高股息")
+    store.add("601088", "中国神华", name="能源")
+    store.add("601088", "", name="红利")
+    store.add("600036", UNKNOWN_NAME, name="高股息")
+    names = {item["code"]: item["name"] for item in store.all_items()}
+    assert names["601088"] == "中国神华"
+    assert names["600036"] == "招商银行"
+    assert sorted(names) == ["000001", "600036", "601088", "601398"]
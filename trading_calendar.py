@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import datetime, date, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import pandas as pd
+
+# ====================== A股交易日历与交易时段 ======================
+CALENDAR_FILE = "data/trade_calendar.csv"
+CALENDAR_MAX_AGE_DAYS = 30
+MARKET_TZ = ZoneInfo("Asia/Shanghai")
+# 连续竞价时段（北京时间）
+SESSIONS = [(dtime(9, 30), dtime(11, 30)), (dtime(13, 0), dtime(15, 0))]
+
+def _fetch_trade_dates():
+    import akshare as ak
+    df = ak.tool_trade_date_hist_sina()
+    return pd.to_datetime(df["trade_date"]).dt.date
+
+@lru_cache(maxsize=1)
+def load_trade_dates(path=CALENDAR_FILE):
+    """
+    交易日集合：本地文件超过30天或不覆盖今年时从新浪交易日历刷新
+    获取失败时返回None，调用方退化为"周一到周五均为交易日"
+    """
+    dates = None
+    if os.path.exists(path):
+        dates = pd.read_csv(path)["trade_date"].map(date.fromisoformat)
+        stale = time.time() - os.path.getmtime(path) > CALENDAR_MAX_AGE_DAYS * 86400
+        if not stale and dates.max().year >= datetime.now(MARKET_TZ).year:
+            return frozenset(dates)
+    try:
+        fetched = _fetch_trade_dates()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        pd.DataFrame({"trade_date": fetched.map(date.isoformat)}).to_csv(path, index=False)
+        dates = fetched
+    except Exception as e:
+        print(f"⚠️ 获取交易日历失败：{e}，{'使用本地旧日历' if dates is not None else '按工作日判断'}")
+    return frozenset(dates) if dates is not None else None
+
+def is_trade_day(day):
+    trade_dates = load_trade_dates()
+    if trade_dates is None:
+        return day.weekday() < 5
+    return day in trade_dates
+
+def now_market():
+    return datetime.now(MARKET_TZ)
+
+def is_trading_time(now=None):
+    """当前是否处于A股连续竞价时段"""
+    now = now or now_market()
+    if not is_trade_day(now.date()):
+        return False
+    return any(start <= now.time() < end for start, end in SESSIONS)
+
+def last_close(now=None):
+    """最近一次已经收盘的时段结束时间（含午间休市），用于判断数据是否已包含最新收盘价"""
+    now = now or now_market()
+    day = now.date()
+    for _ in range(30):
+        if is_trade_day(day):
+            for _, end in reversed(SESSIONS):
+                close = datetime.combine(day, end, MARKET_TZ)
+                if close <= now:
+                    return close
+        day -= timedelta(days=1)
+    return now - timedelta(days=1)
+
+def next_open(now=None):
+    """下一次开盘时间（包括午间休市后的下午开盘）"""
+    now = now or now_market()
+    day = now.date()
+    for _ in range(30):
+        if is_trade_day(day):
+            for start, _ in SESSIONS:
+                opening = datetime.combine(day, start, MARKET_TZ)
+                if opening > now:
+                    return opening
+        day += timedelta(days=1)
+    return now + timedelta(days=1)
@@ -1,16 +1,27 @@
 import pandas as pd
-import requests
-import time
 import warnings
-import json
 import os
+import argparse
+import subprocess
+import sys
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from akshare.stock.cons import xq_a_token
 import akshare as ak
+from http_client import DEFAULT_USER_AGENT, RateLimiter, make_session
+from http_cache import cached_get, set_offline
+from run_metrics import current_metrics, instrumented_run, set_report_dir
+from snapshot_writer import SnapshotWriter
+from history_store import DATASETS, save_history
+from stability import update_stability
+from change_feed import update_change_feed
+from symbol_master import get_symbol_master, exchange_of, normalize_code, normalize_codes
+from watchlist_store import DEFAULT_LIST, get_store
 
 warnings.filterwarnings("ignore")
 
 # ====================== 自选股持久化配置 ======================
-SELF_SELECTED_FILE = "self_selected_stocks.json"
+# 自选股保存在 SQLite 自选股库（见 watchlist_store.py），旧的 self_selected_stocks.json 首次打开时自动导入
 DEFAULT_STOCKS = [
     {"code": "600000", "name": "浦发银行"},
     {"code": "000001", "name": "平安银行"},
@@ -18,208 +29,387 @@ DEFAULT_STOCKS = [
 ]
 
 def load_self_selected_stocks():
-    """加载自选股数据（修复原生字符串replace参数）"""
+    """加载全部清单中的自选股（按代码去重），库为空时初始化默认标的"""
     try:
-        if os.path.exists(SELF_SELECTED_FILE):
-            with open(SELF_SELECTED_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, list) and len(data) > 0:
-                # 强制补全6位代码 + 清洗名称空格（修复：去掉regex=False）
-                for item in data:
-                    item["code"] = str(item["code"]).strip().zfill(6)
-                    if "name" in item:
-                        item["name"] = item["name"].replace(' ', '')  # 核心修复
-                # 按代码去重
-                df_temp = pd.DataFrame(data)
-                df_temp = df_temp.drop_duplicates(subset=['code'], keep='first')
-                data = df_temp.to_dict('records')
-                
-                print(f"✅ 成功加载本地自选股，去重后共 {len(data)} 支标的")
-                return data
-            else:
-                print("⚠️ 本地自选股文件格式异常，使用默认标的")
-                return DEFAULT_STOCKS
-        else:
-            save_self_selected_stocks(DEFAULT_STOCKS)
-            print("📄 本地自选股文件不存在，已初始化默认标的")
-            return DEFAULT_STOCKS
+        stocks = get_store().all_items()
+        if stocks:
+            print(f"✅ 成功加载自选股，去重后共 {len(stocks)} 支标的")
+            return stocks
+        save_self_selected_stocks(DEFAULT_STOCKS)
+        print("📄 自选股库为空，已初始化默认标的")
+        return DEFAULT_STOCKS
     except Exception as e:
         print(f"❌ 加载自选股失败：{e}，使用默认标的")
         return DEFAULT_STOCKS
 
-def save_self_selected_stocks(stocks):
-    """保存自选股（修复原生字符串replace参数）"""
+def save_self_selected_stocks(stocks, list_name=DEFAULT_LIST):
+    """把 stocks 设为指定清单的内容（只增删有变化的行）"""
     try:
-        # 统一补全6位代码 + 清洗名称空格（修复：去掉regex=False）
-        for item in stocks:
-            item["code"] = str(item["code"]).strip().zfill(6)
-            if "name" in item:
-                item["name"] = item["name"].replace(' ', '')  # 核心修复
-        # 去重后保存
-        df_temp = pd.DataFrame(stocks)
-        df_temp = df_temp.drop_duplicates(subset=['code'], keep='first')
-        stocks = df_temp.to_dict('records')
-        
-        with open(SELF_SELECTED_FILE, "w", encoding="utf-8") as f:
-            json.dump(stocks, f, ensure_ascii=False, indent=2)
-        print(f"✅ 自选股已保存到本地，去重后共 {len(stocks)} 支标的")
+        count = get_store().set_items([(stock["code"], stock.get("name", "")) for stock in stocks], list_name)
+        print(f"✅ 自选股已保存到清单「{list_name}」，去重后共 {count} 支标的")
         return True
     except Exception as e:
         print(f"❌ 保存自选股失败：{e}")
         return False
 
-def add_self_selected_stock(code, name):
-    """新增自选股（修复原生字符串replace参数）"""
-    code = str(code).strip().zfill(6)
-    name = name.replace(' ', '')  # 核心修复：去掉regex=False
-    stocks = load_self_selected_stocks()
-    for stock in stocks:
-        if stock["code"] == code:
-            print(f"⚠️ 标的 {code}({name}) 已在自选股中，无需重复添加")
-            return stocks
-    new_stock = {"code": code, "name": name}
-    stocks.append(new_stock)
-    save_self_selected_stocks(stocks)
-    print(f"✅ 新增自选股：{code}({name})")
-    return stocks
+def add_self_selected_stock(code, name, list_name=DEFAULT_LIST):
+    """新增自选股：单行插入，已存在时不变"""
+    code = normalize_code(code)
+    name = name.replace(' ', '')
+    if get_store().add(code, name, list_name):
+        print(f"✅ 新增自选股：{code}({name})")
+    else:
+        print(f"⚠️ 标的 {code}({name}) 已在自选股中，无需重复添加")
+    return get_store().items(list_name)
 
 # ====================== 其余代码完全不变 ======================
+# 数据源地址（可用环境变量指向本地替身服务，供离线基准测试使用）
+XQ_HOME_URL = os.environ.get("XQ_HOME_URL", "https://xueqiu.com/")
+XQ_API_BASE = os.environ.get("XQ_API_BASE", "https://stock.xueqiu.com")
+
 def get_xq_token():
     headers = {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "User-Agent": DEFAULT_USER_AGENT,
     }
     try:
-        r = requests.get("https://xueqiu.com/", headers=headers, timeout=10)
+        r = cached_get(XQ_HOME_URL, headers=headers, timeout=10)
         return r.cookies.get("xq_a_token")
     except:
         return None
 
-def fetch_and_save_data():
+def to_xq_symbol(code):
+    """精准判断雪球代码前缀，非A股代码返回None"""
+    return get_symbol_master().xq_symbol(code)
+
+def fetch_quote(session, symbol, limiter=None):
+    """抓取单支股票的雪球行情，返回 (quote字典, 错误信息)"""
+    url = f"{XQ_API_BASE}/v5/stock/quote.json?symbol={symbol}&extend=detail"
+    r = cached_get(url, session=session, limiter=limiter, timeout=5)
+    if r.status_code != 200:
+        return None, f"响应异常：状态码 {r.status_code}"
+    data = r.json()
+    if 'data' not in data or 'quote' not in data['data']:
+        return None, "数据格式异常"
+    return data['data']['quote'], None
+
+def fetch_quote_batch(session, symbols, limiter=None, use_cache=True):
+    """批量抓取多支股票的雪球行情（一次请求，逗号分隔），返回 {symbol: quote字典}；use_cache=False 时不经过磁盘缓存"""
+    url = f"{XQ_API_BASE}/v5/stock/batch/quote.json?symbol={','.join(symbols)}&extend=detail"
+    r = cached_get(url, session=session, limiter=limiter, use_cache=use_cache, timeout=10)
+    if r.status_code != 200:
+        raise ValueError(f"批量请求响应异常：状态码 {r.status_code}")
+    data = r.json()
+    if 'data' not in data or 'items' not in data['data']:
+        raise ValueError("批量请求数据格式异常")
+    quotes = {}
+    for item in data['data']['items'] or []:
+        quote_data = item.get('quote') or {}
+        if quote_data.get('symbol'):
+            quotes[quote_data['symbol']] = quote_data
+    return quotes
+
+def quote_to_row(code, name, quote_data):
+    """将雪球行情转换为CSV的一行，缺少价格/市值时返回None"""
+    dividend_yield = quote_data.get('dividend_yield', None)
+    current_price = quote_data.get('current', None)
+    market_cap = quote_data.get('market_capital', None)
+    # 放宽条件：即使股息率为0也保存
+    if current_price is None or market_cap is None:
+        return None
+    return {
+        "代码": code,
+        "名称": name,
+        "最新价": current_price,
+        "总市值(亿)": round(market_cap / 1e8, 2),
+        "股息率(%)": dividend_yield if dividend_yield is not None else 0
+    }
+
+def normalize_snapshot(df):
+    """快照清洗：去除名称空格 + 强制补全6位代码"""
+    df['名称'] = df['名称'].astype(str).str.replace(' ', '', regex=False)
+    df['代码'] = normalize_codes(df['代码'])
+    return df
+
+# ====================== 全市场分片 ======================
+# 自选股与全市场是两个数据集，各有自己的快照、历史分区、稳定性状态和变化流，交替运行互不覆盖
+CSV_FILE = DATASETS["xueqiu"]
+ALL_DATASET = "xueqiu_all"
+CSV_HEADERS = ["代码", "名称", "最新价", "总市值(亿)", "股息率(%)"]
+SHARD_DIR = "data/shards"
+SHARD_EXCHANGES = ["SH", "SZ", "BJ"]
+
+def shard_of(code, n_shards, shard_by="hash"):
+    """
+    确定性分片：同一代码在任何机器上都落在同一分片
+    shard_by="hash" 按代码crc32取模；"exchange" 按交易所（SH/SZ/BJ）取模
+    """
+    if shard_by == "exchange":
+        exchange = exchange_of(code)
+        key = SHARD_EXCHANGES.index(exchange) if exchange in SHARD_EXCHANGES else 0
+    else:
+        key = zlib.crc32(code.encode("utf-8"))
+    return key % n_shards
+
+def check_shards(n_shards, shard_by="hash", shard_index=None):
+    """
+    按交易所分片最多只有 SH/SZ/BJ 三个非空分片，分片数更多时多出的分片必然为空，直接拒绝
+    shard_index 必须在 [0, n_shards) 内，否则该进程不会抓取任何代码，只写出一个空的部分快照
+    """
+    if shard_by == "exchange" and n_shards > len(SHARD_EXCHANGES):
+        raise ValueError(f"按交易所分片时分片数不能超过 {len(SHARD_EXCHANGES)}（{'/'.join(SHARD_EXCHANGES)}），当前为 {n_shards}")
+    if shard_index is not None and not 0 <= shard_index < n_shards:
+        raise ValueError(f"分片序号应在 0 到 {n_shards - 1} 之间，当前为 {shard_index}")
+
+def dataset_of(universe):
+    """抓取范围对应的数据集：watchlist -> xueqiu，all -> xueqiu_all"""
+    return ALL_DATASET if universe == "all" else "xueqiu"
+
+def shard_file(shard_index, n_shards):
+    return os.path.join(SHARD_DIR, f"dividend_data.part{shard_index}of{n_shards}.csv")
+
+def load_universe(universe="watchlist"):
+    """抓取范围：watchlist 为自选股，all 为 data/a_stock_codes.csv 中的全部A股"""
+    if universe == "all":
+        return get_symbol_master().to_frame()
+    return pd.DataFrame(load_self_selected_stocks())
+
+@instrumented_run("xueqiu_merge")
+def merge_shards(n_shards):
+    """合并各分片的部分快照：统一去重、按股息率排序后原子写入全市场数据集"""
+    csv_file = DATASETS[ALL_DATASET]
+    writer = SnapshotWriter(csv_file, CSV_HEADERS)
+    missing = []
+    for i in range(n_shards):
+        path = shard_file(i, n_shards)
+        if not os.path.exists(path):
+            missing.append(i)
+            continue
+        writer.add_frame(pd.read_csv(path, dtype={'代码': str}))
+    if missing:
+        print(f"⚠️ 缺少分片 {missing}，合并结果不完整")
+    current_metrics().set("shards_missing", len(missing))
+    if len(writer) == 0:
+        current_metrics().status = "no_data"
+        print("⚠️ 没有可合并的分片数据（原数据文件保持不变）")
+        return pd.DataFrame(columns=CSV_HEADERS)
+    df_final = writer.finalize(normalize=normalize_snapshot)
+    save_history(df_final, ALL_DATASET)
+    update_stability(df_final, ALL_DATASET)
+    update_change_feed(df_final, ALL_DATASET)
+    print(f"🧩 已合并 {n_shards - len(missing)}/{n_shards} 个分片，共 {len(df_final)} 支，数据已存入 {csv_file}")
+    return df_final
+
+def run_all_shards(n_shards, shard_by="hash", extra_args=()):
+    """在本机为每个分片启动一个独立进程（各自独立限速），全部结束后合并"""
+    check_shards(n_shards, shard_by)
+    # 先清理上一轮的部分快照，避免某个分片失败时把旧数据合并进来
+    for i in range(n_shards):
+        if os.path.exists(shard_file(i, n_shards)):
+            os.remove(shard_file(i, n_shards))
+    processes = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), "--universe", "all",
+                          "--shards", str(n_shards), "--shard-index", str(i), "--shard-by", shard_by, *extra_args])
+        for i in range(n_shards)
+    ]
+    failed = [i for i, p in enumerate(processes) if p.wait() != 0]
+    if failed:
+        print(f"❌ 分片 {failed} 运行失败")
+    return merge_shards(n_shards)
+
+@instrumented_run("xueqiu")
+def fetch_and_save_data(concurrency=8, rate_limit=5.0, batch_size=50, chunk_size=None,
+                        universe="watchlist", n_shards=1, shard_index=0, shard_by="hash"):
+    """
+    抓取自选股（或全市场某个分片）的股息率并写入CSV
+    concurrency：并发线程数（1 即为原来的串行模式）
+    rate_limit：初始请求速率（次/秒，<=0 表示不限速），运行中按响应情况自适应升降
+    batch_size：每次批量请求的股票数（1 表示逐支请求）
+    chunk_size：写入器内存中最多缓存的行数，超出后分块落盘（None 表示全部放内存）
+    universe：watchlist 自选股（写入 xueqiu 数据集）/ all 全市场（写入 xueqiu_all 数据集）
+    n_shards、shard_index、shard_by：分片数、本进程负责的分片、分片方式；n_shards>1 时只用于全市场，写入部分快照，由 merge_shards 合并
+    运行结束后在 data/run_reports/ 写入运行报告（JSON + Prometheus textfile）
+    """
     print("🚀 启动数据源同步程序...")
+    metrics = current_metrics()
+    if n_shards > 1:
+        if universe != "all":
+            raise ValueError("分片只用于全市场（universe=all），合并结果写入全市场数据集")
+        check_shards(n_shards, shard_by, shard_index)
+        metrics.labels["shard"] = f"{shard_index}of{n_shards}"
     
-    token = get_xq_token() or xq_a_token
+    with metrics.stage("token"):
+        token = get_xq_token() or xq_a_token
     headers = {
         "Cookie": f"xq_a_token={token};",
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+        "User-Agent": DEFAULT_USER_AGENT,
     }
+    # 共享Session：所有线程复用keep-alive连接
+    session = make_session(pool_size=max(concurrency, 1), headers=headers)
+    limiter = RateLimiter(rate_limit)
 
-    # 加载自选股
-    self_selected_stocks = load_self_selected_stocks()
-    stock_list = pd.DataFrame(self_selected_stocks)
+    # 加载自选股 / 全市场代码
+    stock_list = load_universe(universe)
     # 强制补全6位代码 + 清洗名称空格（pandas的str.replace支持regex=False，保留）
-    stock_list['code'] = stock_list['code'].astype(str).str.zfill(6)
+    stock_list['code'] = normalize_codes(stock_list['code'])
     stock_list['name'] = stock_list['name'].str.replace(' ', '', regex=False)
-    stock_list = stock_list.to_dict('records') 
-    
-    csv_file = "data/dividend_data.csv"
-    csv_headers = ["代码", "名称", "最新价", "总市值(亿)", "股息率(%)"]
     
-    # 初始化CSV文件
-    if not os.path.exists(csv_file):
-        pd.DataFrame(columns=csv_headers).to_csv(
-            csv_file, index=False, encoding='utf-8-sig'
-        )
-        print(f"📄 初始化CSV文件，已写入表头：{csv_headers}")
-    else:
-        try:
-            df_check = pd.read_csv(csv_file, nrows=1)
-            if list(df_check.columns) != csv_headers:
-                df_old = pd.read_csv(csv_file, header=None)
-                df_old.columns = csv_headers
-                df_old.to_csv(csv_file, index=False, encoding='utf-8-sig')
-                print(f"🔧 修复CSV表头，已更新为：{csv_headers}")
-        except:
-            pd.DataFrame(columns=csv_headers).to_csv(
-                csv_file, index=False, encoding='utf-8-sig'
-            )
-            print(f"🔧 CSV文件异常，重新初始化并写入表头：{csv_headers}")
+    dataset = dataset_of(universe)
+    csv_file = DATASETS[dataset]
+    csv_headers = CSV_HEADERS
+    if n_shards > 1:
+        in_shard = stock_list['code'].map(lambda code: shard_of(code, n_shards, shard_by) == shard_index)
+        stock_list = stock_list[in_shard]
+        csv_file = shard_file(shard_index, n_shards)
+        print(f"🧩 分片 {shard_index}/{n_shards}（按{'交易所' if shard_by == 'exchange' else '代码哈希'}），本分片 {len(stock_list)} 支")
+    stock_list = stock_list.to_dict('records')
     
-    # 清空旧数据
-    pd.DataFrame(columns=csv_headers).to_csv(
-        csv_file, index=False, encoding='utf-8-sig'
-    )
+    # 所有行先缓存在内存，结束时一次性排序去重并原子替换，抓取过程中看板读到的始终是上一份完整快照
+    writer = SnapshotWriter(csv_file, csv_headers, chunk_size=chunk_size)
     
-    success_count = 0
-    valid_codes = 0
-    print(f"📥 正在抓取 {len(stock_list)} 支自选股的股息率指标...")
-
-    for i, stock in enumerate(stock_list):
+    # 筛选有效A股代码
+    tasks = []
+    for stock in stock_list:
         code = stock['code'].strip()
-        # 精准判断雪球代码前缀
-        if code.startswith(('60', '68')):
-            symbol = f"SH{code}"
-        elif code.startswith(('00', '30')):
-            symbol = f"SZ{code}"
-        elif code.startswith('8'):
-            symbol = f"BJ{code}"
-        else:
+        symbol = to_xq_symbol(code)
+        if symbol is None:
             print(f"⚠️ 跳过非A股代码：{code}")
             continue
-        
-        valid_codes += 1
-        url = f"https://stock.xueqiu.com/v5/stock/quote.json?symbol={symbol}&extend=detail"
-        
+        tasks.append((code, stock['name'], symbol))
+    valid_codes = len(tasks)
+    
+    def fetch_single(task):
+        code, name, symbol = task
         try:
-            r = requests.get(url, headers=headers, timeout=5)
-            if r.status_code != 200:
-                print(f"❌ 股票 {code} 响应异常：状态码 {r.status_code}")
-                continue
-            data = r.json()
-            if 'data' not in data or 'quote' not in data['data']:
-                print(f"❌ 股票 {code} 数据格式异常")
+            quote_data, error = fetch_quote(session, symbol, limiter)
+        except Exception as e:
+            metrics.incr("item_errors", type="request_failed")
+            return code, None, f"请求失败：{str(e)[:50]}"
+        if error:
+            metrics.incr("item_errors", type="bad_response")
+            return code, None, error
+        return code, quote_to_row(code, name, quote_data), None
+
+    def worker(batch):
+        # 单支请求 或 批量请求失败时，逐支回退
+        if len(batch) == 1:
+            return [fetch_single(batch[0])]
+        try:
+            quotes = fetch_quote_batch(session, [task[2] for task in batch], limiter)
+        except Exception as e:
+            metrics.incr("item_errors", type="batch_fallback")
+            print(f"⚠️ 批量请求失败（{str(e)[:50]}），回退为逐支请求 {len(batch)} 支")
+            return [fetch_single(task) for task in batch]
+        results = []
+        for task in batch:
+            code, name, symbol = task
+            if symbol in quotes:
+                results.append((code, quote_to_row(code, name, quotes[symbol]), None))
+            else:
+                # 批量结果中缺失的代码单独补抓
+                results.append(fetch_single(task))
+        return results
+
+    batch_size = max(batch_size, 1)
+    batches = [tasks[i:i + batch_size] for i in range(0, len(tasks), batch_size)]
+
+    success_count = 0
+    processed = 0
+    failed_codes = []
+    print(f"📥 正在抓取 {valid_codes} 支股票的股息率指标（{len(batches)} 个批次，并发 {concurrency}，限速 {rate_limit}/秒）...")
+
+    # 写入器只在主线程使用，工作线程只负责网络请求
+    with metrics.stage("fetch"), ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+        futures = [executor.submit(worker, batch) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                metrics.incr("item_errors", type="batch_failed")
+                print(f"❌ 处理批次失败：{str(e)[:50]}")
                 continue
-            
-            quote_data = data['data']['quote']
-            dividend_yield = quote_data.get('dividend_yield', None)
-            current_price = quote_data.get('current', None)
-            market_cap = quote_data.get('market_capital', None)
-            
-            # 放宽条件：即使股息率为0也保存
-            if current_price is not None and market_cap is not None:
-                single_data = pd.DataFrame({
-                    "代码": [code],
-                    "名称": [stock['name']],
-                    "最新价": [current_price],
-                    "总市值(亿)": [round(market_cap / 1e8, 2)],
-                    "股息率(%)": [dividend_yield if dividend_yield is not None else 0]
-                })
-                single_data.to_csv(
-                    csv_file, 
-                    mode='a', 
-                    index=False, 
-                    header=False,
-                    encoding='utf-8-sig'
-                )
-                success_count += 1
-            
-            time.sleep(0.2)
-            
-            if i % 10 == 0 and i > 0:
-                print(f"✅ 已处理 {i} 支股票，有效A股 {valid_codes} 支，成功抓取 {success_count} 支数据...")
+            for code, row, error in results:
+                processed += 1
+                if error:
+                    failed_codes.append(code)
+                    print(f"❌ 股票 {code} {error}")
+                elif row is not None:
+                    writer.add(row)
+                    success_count += 1
+                else:
+                    metrics.incr("item_errors", type="missing_fields")
                 
-        except Exception as e:
-            print(f"❌ 处理股票 {code} 失败：{str(e)[:50]}")
-            continue
+                if processed % 10 == 0:
+                    print(f"✅ 已处理 {processed} 支股票，有效A股 {valid_codes} 支，成功抓取 {success_count} 支数据...")
+    session.close()
+    metrics.set("items_total", valid_codes)
+    metrics.set("items_fetched", success_count)
+    metrics.set("items_failed", len(failed_codes))
+    if failed_codes:
+        print(f"⚠️ 重试后仍有 {len(failed_codes)} 支抓取失败：{', '.join(failed_codes[:20])}{' ...' if len(failed_codes) > 20 else ''}")
 
     # 最终排序+去重
-    if os.path.exists(csv_file) and success_count > 0:
-        df_final = pd.read_csv(csv_file)
-        # 1. 清洗名称：去除所有空格（pandas的str.replace保留regex=False）
-        df_final['名称'] = df_final['名称'].str.replace(' ', '', regex=False)
-        # 2. 强制补全6位代码
-        df_final['代码'] = df_final['代码'].astype(str).str.zfill(6)
-        # 3. 按代码去重
-        df_final = df_final.sort_values(by='股息率(%)', ascending=False)
-        df_final = df_final.drop_duplicates(subset=['代码'], keep='first')
-        # 4. 重新保存
-        df_final.to_csv(csv_file, index=False, encoding='utf-8-sig')
+    if success_count > 0:
+        df_final = writer.finalize(normalize=normalize_snapshot)
+        # 分片的部分快照不归档，合并后再写入历史库
+        if n_shards == 1:
+            save_history(df_final, dataset)
+            update_stability(df_final, dataset)
+            update_change_feed(df_final, dataset)
         print(f"\n✨ 任务完成！")
         print(f"📊 统计：有效A股 {valid_codes} 支，去重后实际保存 {len(df_final)} 支数据。")
         print(f"📁 数据已存入 {csv_file}，可在Streamlit看板中查看")
     else:
-        print("⚠️ 未抓取到有效数据，请检查Token/网络/自选股代码")
+        metrics.status = "no_data"
+        print("⚠️ 未抓取到有效数据，请检查Token/网络/自选股代码（原数据文件保持不变）")
 
 if __name__ == "__main__":
     # add_self_selected_stock("000858", "五粮液")
     # add_self_selected_stock("600519", "贵州茅台")
-    fetch_and_save_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="雪球股息率同步（自选股 / 全市场分片）")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发线程数，1为串行")
+    parser.add_argument("--rps", type=float, default=5.0, help="初始每秒请求数（按响应自适应升降），<=0不限速")
+    parser.add_argument("--batch-size", type=int, default=50, help="每个批量请求包含的股票数，1为逐支请求")
+    parser.add_argument("--offline", action="store_true", help="只使用本地HTTP缓存，不访问网络")
+    parser.add_argument("--universe", choices=["watchlist", "all"], default="watchlist", help="抓取范围：自选股 / 全市场")
+    parser.add_argument("--shards", type=int, default=1, help="全市场分片总数")
+    parser.add_argument("--shard-index", type=int, default=None, help="本进程负责的分片（0开始）；不指定则在本机为每个分片启动一个进程")
+    parser.add_argument("--shard-by", choices=["hash", "exchange"], default="hash", help="分片方式")
+    parser.add_argument("--merge", action="store_true", help="只合并已有的分片结果")
+    parser.add_argument("--report-dir", default=None, help="运行报告（JSON + Prometheus textfile）输出目录，默认 data/run_reports")
+    parser.add_argument("--daemon", action="store_true", help="常驻模式：按优先级持续原地刷新快照中的行")
+    parser.add_argument("--top-n", type=int, default=100, help="常驻模式：股息率排名前N的股票与自选股同频刷新")
+    parser.add_argument("--hot-interval", type=int, default=300, help="常驻模式：自选股和前N名的刷新间隔（秒）")
+    parser.add_argument("--tail-interval", type=int, default=3600, help="常驻模式：其余股票的刷新间隔（秒）")
+    parser.add_argument("--ignore-trading-hours", action="store_true", help="常驻模式：非交易时段也按间隔刷新")
+    parser.add_argument("--run-seconds", type=float, default=None, help="常驻模式：运行指定秒数后退出（默认一直运行）")
+    args = parser.parse_args()
+    try:
+        check_shards(args.shards, args.shard_by, args.shard_index)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.shards > 1 and args.shard_index is not None and args.universe != "all":
+        parser.error("--shard-index 只用于全市场分片，请同时指定 --universe all")
+    if args.offline:
+        set_offline(True)
+    if args.report_dir:
+        set_report_dir(args.report_dir)
+    if args.daemon:
+        from refresh_daemon import run_daemon
+        run_daemon(run_seconds=args.run_seconds, concurrency=args.concurrency, rate_limit=args.rps,
+                   batch_size=args.batch_size, top_n=args.top_n,
+                   intervals=(args.hot_interval, args.hot_interval, args.tail_interval),
+                   universe="all" if args.universe == "all" else "snapshot",
+                   trading_hours_only=not args.ignore_trading_hours)
+    elif args.merge:
+        merge_shards(args.shards)
+    elif args.shards > 1 and args.shard_index is None:
+        extra_args = ["--concurrency", str(args.concurrency), "--rps", str(args.rps), "--batch-size", str(args.batch_size)]
+        if args.offline:
+            extra_args.append("--offline")
+        if args.report_dir:
+            extra_args += ["--report-dir", args.report_dir]
+        run_all_shards(args.shards, args.shard_by, extra_args)
+    else:
+        fetch_and_save_data(concurrency=args.concurrency, rate_limit=args.rps, batch_size=args.batch_size,
+                            universe=args.universe, n_shards=args.shards, shard_index=args.shard_index or 0,
+                            shard_by=args.shard_by)
\ No newline at end of file
@@ -1,225 +1,298 @@
 import pandas as pd
-import requests
-import time
 import warnings
 import os
-from io import StringIO
-from bs4 import BeautifulSoup
+import json
+import time
+import argparse
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from akshare.utils.cons import headers
+from legulegu_parser import parse_index_composition, parse_industry_overview
+from http_client import RateLimiter, make_session
+from http_cache import cached_get, set_offline
+from snapshot_writer import SnapshotWriter, atomic_write_csv
+from history_store import save_history
+from stability import update_stability
+from change_feed import update_change_feed
+from industry_rollup import save_rollups
+from symbol_master import normalize_codes
+from run_metrics import current_metrics, instrumented_run, set_report_dir
 
 warnings.filterwarnings("ignore")
 
+# 数据源地址（可用环境变量指向本地替身服务，供离线基准测试使用）
+LEGULEGU_BASE = os.environ.get("LEGULEGU_BASE", "https://legulegu.com")
+
 def sw_index_third_info() -> pd.DataFrame:
     """获取所有申万三级行业代码（用于遍历抓取全A股）"""
-    url = "https://legulegu.com/stockdata/sw-industry-overview"
-    r = requests.get(url, headers=headers)
-    soup = BeautifulSoup(r.text, features="lxml")
-    code_raw = soup.find(name="div", attrs={"id": "level3Items"}).find_all(
-        name="div", attrs={"class": "lg-industries-item-chinese-title"}
-    )
-    name_raw = soup.find(name="div", attrs={"id": "level3Items"}).find_all(
-        name="div", attrs={"class": "lg-industries-item-number"}
-    )
-    value_raw = soup.find(name="div", attrs={"id": "level3Items"}).find_all(
-        name="div", attrs={"class": "lg-sw-industries-item-value"}
-    )
-    code = [item.get_text() for item in code_raw]
-    name = [item.get_text().split("(")[0] for item in name_raw]
-    parent_name = [
-        item.find("span").get_text().split("(")[0][1:-1] for item in name_raw
-    ]
-    num = [item.get_text().split("(")[1].split(")")[0] for item in name_raw]
-    num_1 = [
-        item.find_all("span", attrs={"class": "value"})[0].get_text().strip()
-        for item in value_raw
-    ]
-    num_2 = [
-        item.find_all("span", attrs={"class": "value"})[1].get_text().strip()
-        for item in value_raw
-    ]
-    num_3 = [
-        item.find_all("span", attrs={"class": "value"})[2].get_text().strip()
-        for item in value_raw
-    ]
-    num_4 = [
-        item.find_all("span", attrs={"class": "value"})[3].get_text().strip()
-        for item in value_raw
-    ]
-    temp_df = pd.DataFrame([code, name, parent_name, num, num_1, num_2, num_3, num_4]).T
-    temp_df.columns = [
-        "行业代码",
-        "行业名称",
-        "上级行业",
-        "成份个数",
-        "静态市盈率",
-        "TTM(滚动)市盈率",
-        "市净率",
-        "静态股息率",
-    ]
-    temp_df["成份个数"] = pd.to_numeric(temp_df["成份个数"], errors="coerce")
-    temp_df["静态市盈率"] = pd.to_numeric(temp_df["静态市盈率"], errors="coerce")
-    temp_df["TTM(滚动)市盈率"] = pd.to_numeric(temp_df["TTM(滚动)市盈率"], errors="coerce")
-    temp_df["市净率"] = pd.to_numeric(temp_df["市净率"], errors="coerce")
-    temp_df["静态股息率"] = pd.to_numeric(temp_df["静态股息率"], errors="coerce")
-    return temp_df
+    url = f"{LEGULEGU_BASE}/stockdata/sw-industry-overview"
+    r = cached_get(url, headers=headers, timeout=10)
+    return parse_industry_overview(r.text)
+
+def index_composition_url(symbol: str) -> str:
+    return f"{LEGULEGU_BASE}/stockdata/index-composition?industryCode={symbol}"
 
 def sw_index_third_cons(symbol: str = "801120.SI") -> pd.DataFrame:
     """抓取指定申万三级行业下的所有个股数据（含股息率）"""
     try:
-        url = f"https://legulegu.com/stockdata/index-composition?industryCode={symbol}"
-        r = requests.get(url, headers=headers, timeout=10)
-        temp_df = pd.read_html(StringIO(r.text))[0]
-        temp_df.columns = [
-            "序号",
-            "股票代码",
-            "股票简称",
-            "纳入时间",
-            "申万1级",
-            "申万2级",
-            "申万3级",
-            "价格",
-            "市盈率",
-            "市盈率ttm",
-            "市净率",
-            "股息率",
-            "市值",
-            "归母净利润同比增长(09-30)",
-            "归母净利润同比增长(06-30)",
-            "营业收入同比增长(09-30)",
-            "营业收入同比增长(06-30)",
-        ]
-        # 数据清洗
-        temp_df["价格"] = pd.to_numeric(temp_df["价格"], errors="coerce")
-        temp_df["市盈率"] = pd.to_numeric(temp_df["市盈率"], errors="coerce")
-        temp_df["市盈率ttm"] = pd.to_numeric(temp_df["市盈率ttm"], errors="coerce")
-        temp_df["市净率"] = pd.to_numeric(temp_df["市净率"], errors="coerce")
-        # 处理股息率（去掉%并转数字）
-        temp_df["股息率"] = temp_df["股息率"].astype(str).str.strip("%")
-        temp_df["股息率"] = pd.to_numeric(temp_df["股息率"], errors="coerce")
-        temp_df["市值"] = pd.to_numeric(temp_df["市值"], errors="coerce")
-        
-        # 清理同比增长字段
-        for col in ["归母净利润同比增长(09-30)", "归母净利润同比增长(06-30)",
-                    "营业收入同比增长(09-30)", "营业收入同比增长(06-30)"]:
-            temp_df[col] = temp_df[col].astype(str).str.strip("%")
-            temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
-        
-        return temp_df
+        r = cached_get(index_composition_url(symbol), headers=headers, timeout=10)
+        return parse_index_composition(r.text)
     except Exception as e:
         print(f"❌ 抓取行业 {symbol} 失败：{e}")
         return pd.DataFrame()
 
-def fetch_and_save_dividend_data():
-    """主函数：遍历所有申万三级行业，抓取全A股股息率并追加写入CSV"""
+SW_CSV_HEADERS = ["代码", "名称", "最新价", "总市值(亿)", "股息率(%)",
+                  "申万1级", "申万2级", "申万3级", "市盈率ttm", "市净率"]
+
+def cons_to_rows(stock_df) -> pd.DataFrame:
+    """将行业成份股表转换为快照的列，只保留有股息率且大于0的记录"""
+    stock_df = stock_df[stock_df["股息率"].notna() & (stock_df["股息率"] > 0)]
+    return pd.DataFrame({
+        "代码": normalize_codes(stock_df["股票代码"]),
+        "名称": stock_df["股票简称"],
+        "最新价": stock_df["价格"],
+        "总市值(亿)": stock_df["市值"].round(2).fillna(0),
+        "股息率(%)": stock_df["股息率"],
+        "申万1级": stock_df["申万1级"],
+        "申万2级": stock_df["申万2级"],
+        "申万3级": stock_df["申万3级"],
+        "市盈率ttm": stock_df["市盈率ttm"],
+        "市净率": stock_df["市净率"],
+    })
+
+def parse_industry_rows(html: str) -> pd.DataFrame:
+    """解析页面并直接转换为快照行（供进程池调用，只回传需要的列以减少序列化开销）"""
+    return cons_to_rows(parse_index_composition(html))
+
+def parse_industry_rows_timed(html: str):
+    """同 parse_industry_rows，另外返回解析耗时（秒），供主进程汇总 parse 阶段"""
+    start = time.perf_counter()
+    rows = parse_industry_rows(html)
+    return rows, time.perf_counter() - start
+
+# ====================== 断点续抓（checkpoint）======================
+CHECKPOINT_DIR = "data/sw_checkpoint"
+CHECKPOINT_JOURNAL = os.path.join(CHECKPOINT_DIR, "journal.jsonl")
+
+def load_checkpoint_journal():
+    """读取checkpoint日志，返回 {行业代码: 最近一次完成时间(datetime)}"""
+    journal = {}
+    if not os.path.exists(CHECKPOINT_JOURNAL):
+        return journal
+    with open(CHECKPOINT_JOURNAL, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                journal[entry["industry"]] = datetime.fromisoformat(entry["finished_at"])
+            except Exception:
+                continue  # 崩溃时可能留下写了一半的最后一行，忽略即可
+    return journal
+
+def _checkpoint_rows_file(industry_code):
+    return os.path.join(CHECKPOINT_DIR, f"{industry_code}.csv")
+
+def save_checkpoint(industry_code, rows):
+    """先原子写入该行业的结果，再追加日志，保证日志中的行业一定有对应的数据文件"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    atomic_write_csv(rows, _checkpoint_rows_file(industry_code))
+    entry = {"industry": industry_code, "finished_at": datetime.now().isoformat(timespec="seconds"), "rows": len(rows)}
+    with open(CHECKPOINT_JOURNAL, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def load_checkpoint_rows(industry_code):
+    """读取某个行业已保存的结果，不存在或损坏时返回None"""
+    try:
+        return pd.read_csv(_checkpoint_rows_file(industry_code), dtype={"代码": str})
+    except Exception:
+        return None
+
+def compact_checkpoint_journal(journal):
+    """任务完成后压缩日志：每个行业只保留最新一条记录"""
+    lines = [
+        json.dumps({"industry": code, "finished_at": ts.isoformat(timespec="seconds")}, ensure_ascii=False)
+        for code, ts in journal.items()
+    ]
+    tmp_file = CHECKPOINT_JOURNAL + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + ("\n" if lines else ""))
+    os.replace(tmp_file, CHECKPOINT_JOURNAL)
+
+@instrumented_run("shenwan")
+def fetch_and_save_dividend_data(chunk_size=None, resume=False, max_age_hours=12,
+                                 download_workers=4, parse_workers=None, rate_limit=3.0):
+    """
+    主函数：遍历所有申万三级行业，抓取全A股股息率并写入CSV
+    chunk_size：写入器内存中最多缓存的行数，超出后分块落盘（None 表示全部放内存）
+    resume：是否复用checkpoint中的行业结果（默认 False，全部重新抓取；中断后续跑时显式开启）
+    max_age_hours：checkpoint中完成时间在 N 小时以内的行业直接复用，更早的重新抓取
+    download_workers：并发下载线程数（共享同一个限速器和连接池）
+    parse_workers：解析HTML的进程数（None 为CPU核数，0 表示在下载线程中直接解析）
+    rate_limit：初始请求速率（次/秒，<=0 表示不限速），运行中按响应情况自适应升降
+    运行结束后在 data/run_reports/ 写入运行报告（JSON + Prometheus textfile）
+    """
     print("🚀 启动乐咕乐股A股股息率抓取程序...")
-    csv_file = "dividend_data_shenwan.csv"
-    csv_headers = ["代码", "名称", "最新价", "总市值(亿)", "股息率(%)", 
-                   "申万1级", "申万2级", "申万3级", "市盈率ttm", "市净率"]
-    
-    # 初始化CSV文件（保证表头存在）
-    if not os.path.exists(csv_file):
-        pd.DataFrame(columns=csv_headers).to_csv(
-            csv_file, index=False, encoding='utf-8-sig'
-        )
-        print(f"📄 初始化CSV文件，表头：{csv_headers}")
-    else:
-        # 检查表头是否匹配
-        try:
-            df_check = pd.read_csv(csv_file, nrows=1)
-            if list(df_check.columns) != csv_headers:
-                df_old = pd.read_csv(csv_file, header=None)
-                df_old.columns = csv_headers
-                df_old.to_csv(csv_file, index=False, encoding='utf-8-sig')
-                print(f"🔧 修复CSV表头为：{csv_headers}")
-        except:
-            pd.DataFrame(columns=csv_headers).to_csv(
-                csv_file, index=False, encoding='utf-8-sig'
-            )
-            print(f"🔧 重置CSV文件并写入表头：{csv_headers}")
+    metrics = current_metrics()
+    csv_file = "data/dividend_data_shenwan.csv"
+    if parse_workers is None:
+        parse_workers = os.cpu_count() or 1
     
-    # 记录已抓取的股票代码（去重）
+    # 所有行先缓存在内存，结束时一次性排序去重并原子替换
+    writer = SnapshotWriter(csv_file, SW_CSV_HEADERS, chunk_size=chunk_size)
+    # 本次运行中已抓取的股票代码（同一股票可能出现在多个行业中）
     crawled_codes = set()
-    if os.path.exists(csv_file):
-        try:
-            df_exist = pd.read_csv(csv_file)
-            crawled_codes = set(df_exist["代码"].dropna().astype(str).tolist())
-        except:
-            crawled_codes = set()
-    print(f"📌 已抓取过的股票数量：{len(crawled_codes)}")
+    # 各行业去重前的成份股，用于行业汇总
+    industry_rows = {}
+    
+    journal = load_checkpoint_journal() if resume else {}
+    fresh_after = datetime.now() - timedelta(hours=max_age_hours)
     
     # 获取所有申万三级行业代码
-    third_industry_df = sw_index_third_info()
+    with metrics.stage("industry_list"):
+        third_industry_df = sw_index_third_info()
     third_industry_codes = third_industry_df["行业代码"].tolist()
-    print(f"📥 共获取 {len(third_industry_codes)} 个申万三级行业，开始遍历抓取...")
     
     success_count = 0
     total_processed = 0
-    
-    for i, industry_code in enumerate(third_industry_codes):
-        # 抓取该行业下的个股数据
-        stock_df = sw_index_third_cons(symbol=industry_code)
-        if stock_df.empty:
-            time.sleep(0.5)  # 失败时延长等待
-            continue
-        
-        # 遍历该行业下的个股
-        for _, row in stock_df.iterrows():
-            code = str(row["股票代码"]).strip()
-            # 跳过已抓取的股票（去重）
-            if code in crawled_codes:
-                continue
-            
-            # 提取核心字段
-            name = row["股票简称"]
-            current_price = row["价格"]
-            market_cap = row["市值"]
-            dividend_yield = row["股息率"]
-            sw1 = row["申万1级"]
-            sw2 = row["申万2级"]
-            sw3 = row["申万3级"]
-            pe_ttm = row["市盈率ttm"]
-            pb = row["市净率"]
-            
-            # 只保留有股息率且大于0的记录
-            if pd.notna(dividend_yield) and dividend_yield > 0:
-                single_data = pd.DataFrame({
-                    "代码": [code],
-                    "名称": [name],
-                    "最新价": [current_price],
-                    "总市值(亿)": [round(market_cap, 2) if pd.notna(market_cap) else 0],
-                    "股息率(%)": [dividend_yield],
-                    "申万1级": [sw1],
-                    "申万2级": [sw2],
-                    "申万3级": [sw3],
-                    "市盈率ttm": [pe_ttm],
-                    "市净率": [pb]
-                })
-                # 追加写入CSV
-                single_data.to_csv(
-                    csv_file,
-                    mode='a',
-                    index=False,
-                    header=False,
-                    encoding='utf-8-sig'
-                )
-                success_count += 1
-                crawled_codes.add(code)  # 标记为已抓取
-        
+    reused_count = 0
+
+    def add_rows(industry_code, rows):
+        # 跳过已抓取的股票（去重）
+        nonlocal success_count, total_processed
+        rows = rows.assign(代码=normalize_codes(rows["代码"]))
+        industry_rows[industry_code] = rows
+        rows = rows[~rows["代码"].isin(crawled_codes)].drop_duplicates(subset=["代码"])
+        writer.add_frame(rows)
+        crawled_codes.update(rows["代码"])
+        success_count += len(rows)
         total_processed += 1
         # 打印进度
-        if i % 10 == 0:
-            print(f"✅ 已处理 {total_processed}/{len(third_industry_codes)} 个行业，新增 {success_count} 支有股息的股票...")
-        time.sleep(0.3)  # 防反爬
+        if total_processed % 10 == 0:
+            print(f"✅ 已处理 {total_processed}/{len(third_industry_codes)} 个行业（复用checkpoint {reused_count} 个），新增 {success_count} 支有股息的股票...")
+    
+    # checkpoint中足够新的行业直接复用，不再下载页面
+    to_crawl = []
+    oldest_reused = None
+    with metrics.stage("checkpoint_load"):
+        for industry_code in third_industry_codes:
+            rows = None
+            if journal.get(industry_code, datetime.min) >= fresh_after:
+                rows = load_checkpoint_rows(industry_code)
+            if rows is None:
+                to_crawl.append(industry_code)
+            else:
+                reused_count += 1
+                oldest_reused = min(oldest_reused or journal[industry_code], journal[industry_code])
+                add_rows(industry_code, rows)
+    if reused_count:
+        age_hours = (datetime.now() - oldest_reused).total_seconds() / 3600
+        print(f"♻️ 复用checkpoint：{reused_count} 个行业沿用之前抓取的页面，最早的完成于 "
+              f"{oldest_reused:%Y-%m-%d %H:%M}（{age_hours:.1f} 小时前）；需要最新数据请去掉 --resume")
+    print(f"📥 共获取 {len(third_industry_codes)} 个申万三级行业，其中 {len(to_crawl)} 个需要抓取"
+          f"（下载线程 {download_workers}，解析进程 {parse_workers}，限速 {rate_limit}/秒）...")
+
+    # 流水线：多线程并发下载（I/O密集）-> 进程池解析（CPU密集）-> 主线程写入
+    session = make_session(pool_size=max(download_workers, 1), headers=headers)
+    limiter = RateLimiter(rate_limit)
+
+    def download(industry_code):
+        r = cached_get(index_composition_url(industry_code), session=session, limiter=limiter, timeout=10)
+        r.raise_for_status()
+        if parse_workers == 0:
+            return parse_industry_rows_timed(r.text)
+        return r.text
+
+    # 解析进程在下载线程运行期间按需启动：用 spawn 而不是默认的 fork，
+    # fork 会把其他线程持有的锁（连接池、日志等）原样复制到子进程，可能导致子进程死锁
+    parse_pool = ProcessPoolExecutor(max_workers=parse_workers, mp_context=multiprocessing.get_context("spawn")) \
+        if parse_workers > 0 and to_crawl else None
+    failed_industries = []
+    # fetch 阶段为整个流水线的耗时，扣除主线程写checkpoint的时间（单独记为 checkpoint_save 阶段，不重复计入）
+    fetch_start = time.perf_counter()
+    checkpoint_seconds = 0.0
+    try:
+        with ThreadPoolExecutor(max_workers=max(download_workers, 1)) as download_pool:
+            stages = {download_pool.submit(download, code): ("download", code) for code in to_crawl}
+            pending = set(stages)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, industry_code = stages.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed_industries.append(industry_code)
+                        metrics.incr("item_errors", type=f"{stage}_failed")
+                        print(f"❌ 抓取行业 {industry_code} 失败：{str(e)[:80]}")
+                        continue
+                    if stage == "download" and parse_pool is not None:
+                        parse_future = parse_pool.submit(parse_industry_rows_timed, result)
+                        stages[parse_future] = ("parse", industry_code)
+                        pending.add(parse_future)
+                        continue
+                    # parse 阶段为各解析进程/线程的累计耗时
+                    rows, parse_seconds = result
+                    metrics.add_stage_time("parse", parse_seconds)
+                    checkpoint_start = time.perf_counter()
+                    save_checkpoint(industry_code, rows)
+                    elapsed = time.perf_counter() - checkpoint_start
+                    metrics.add_stage_time("checkpoint_save", elapsed)
+                    checkpoint_seconds += elapsed
+                    journal[industry_code] = datetime.now()
+                    add_rows(industry_code, rows)
+    finally:
+        metrics.add_stage_time("fetch", time.perf_counter() - fetch_start - checkpoint_seconds)
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        session.close()
+    metrics.set("industries_total", len(third_industry_codes))
+    metrics.set("industries_reused", reused_count)
+    metrics.set("industries_failed", len(failed_industries))
+    metrics.set("items_fetched", success_count)
     
     # 最终排序（按股息率降序）
-    if os.path.exists(csv_file) and success_count > 0:
-        df_final = pd.read_csv(csv_file)
-        df_final = df_final.sort_values(by='股息率(%)', ascending=False).drop_duplicates(subset=["代码"], keep="first")
-        df_final.to_csv(csv_file, index=False, encoding='utf-8-sig')
-        print(f"\n✨ 任务完成！累计抓取 {len(df_final)} 支有股息的A股（去重后）。")
+    if success_count > 0:
+        df_final = writer.finalize()
+        compact_checkpoint_journal(journal)
+        save_history(df_final, "shenwan")
+        if failed_industries:
+            # 申万快照只含分红股：失败行业的成份股不在快照里，会被记为停止分红，增量状态因此被永久改写；
+            # 变化流同理会把它们报为移出快照、下次又报为新进快照，基准也会被不完整的快照覆盖
+            print(f"⚠️ {len(failed_industries)} 个行业抓取失败，快照不完整，本次不更新稳定性指标和变化流")
+        else:
+            update_stability(df_final, "shenwan")
+            update_change_feed(df_final, "shenwan")
+        # 行业数据版本为checkpoint完成时间：复用的行业版本不变，只重算本次重新抓取的行业；
+        # 抓取失败的行业沿用上次的成份股，不当作已从行业列表中移除
+        with metrics.stage("industry_rollup"):
+            versions = {code: journal[code].isoformat(timespec="seconds") for code in industry_rows if code in journal}
+            save_rollups(industry_rows, versions, third_industry_df, failed_industries)
+        print(f"\n✨ 任务完成！累计抓取 {len(df_final)} 支有股息的A股（去重后），其中 {reused_count} 个行业复用checkpoint。")
         print(f"📁 数据已存入 {csv_file}，按股息率降序排列")
     else:
-        print("⚠️ 未抓取到有效数据，请检查网络或接口是否正常。")
+        metrics.status = "no_data"
+        print("⚠️ 未抓取到有效数据，请检查网络或接口是否正常（原数据文件保持不变）。")
 
 if __name__ == "__main__":
-    fetch_and_save_dividend_data()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="乐咕乐股申万行业股息率抓取")
+    parser.add_argument("--resume", action="store_true", help="续跑：复用checkpoint中较新的行业结果（默认全部重新抓取）")
+    parser.add_argument("--max-age-hours", type=float, default=12, help="--resume 时只重新抓取完成时间早于N小时的行业")
+    parser.add_argument("--download-workers", type=int, default=4, help="并发下载线程数")
+    parser.add_argument("--parse-workers", type=int, default=None, help="解析进程数，默认CPU核数，0为不使用进程池")
+    parser.add_argument("--rps", type=float, default=3.0, help="初始每秒请求数（按响应自适应升降），<=0不限速")
+    parser.add_argument("--offline", action="store_true", help="只使用本地HTTP缓存，不访问网络")
+    parser.add_argument("--report-dir", default=None, help="运行报告（JSON + Prometheus textfile）输出目录，默认 data/run_reports")
+    args = parser.parse_args()
+    if args.offline:
+        set_offline(True)
+    if args.report_dir:
+        set_report_dir(args.report_dir)
+    fetch_and_save_dividend_data(
+        resume=args.resume,
+        max_age_hours=args.max_age_hours,
+        download_workers=args.download_workers,
+        parse_workers=args.parse_workers,
+        rate_limit=args.rps,
+    )
@@ -0,0 +1,288 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from symbol_master import UNKNOWN_NAME, normalize_code
+
+# ====================== 自选股存储（SQLite，WAL模式） ======================
+# 多个看板会话、抓取脚本、常驻刷新进程同时读写自选股：
+# - 每次增删只改一行（主键 清单+代码），不再整文件读出再整文件重写
+# - WAL 模式下读不阻塞写，写事务用 BEGIN IMMEDIATE 串行化，不会互相覆盖
+# - 支持多个命名清单、按用户区分；按代码的索引用于"哪些清单包含该股票"的查询
+# 首次打开时自动把旧的 self_selected_stocks.json 导入默认清单（只导入一次）
+DB_FILE = os.environ.get("DIVIDEND_WATCHLIST_DB", "data/watchlist.db")
+LEGACY_JSON_FILE = "self_selected_stocks.json"
+DEFAULT_OWNER = ""
+DEFAULT_LIST = "默认"
+BUSY_TIMEOUT_MS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlists (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE (owner, name)
+);
+CREATE TABLE IF NOT EXISTS watchlist_items (
+    watchlist_id INTEGER NOT NULL REFERENCES watchlists(id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    name TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL,
+    added_at TEXT NOT NULL,
+    PRIMARY KEY (watchlist_id, code)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_watchlist_items_code ON watchlist_items(code);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+class WatchlistStore:
+    """
+    自选股清单存储：每个线程一个连接（SQLite 连接不能跨线程共享），写操作都在一个短事务内完成
+    每次写入同时递增 meta.revision，其他进程只需比较 revision 就知道清单是否变化
+    """
+
+    def __init__(self, path=DB_FILE, legacy_json=LEGACY_JSON_FILE):
+        self.path = path
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        if legacy_json:
+            self.migrate_json(legacy_json)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None：由本类显式 BEGIN/COMMIT 控制事务
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """写事务：BEGIN IMMEDIATE 一开始就拿到写锁，避免读后写时的升级冲突；提交前递增 revision"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute(
+                "INSERT INTO meta(key, value) VALUES('revision', '1') "
+                "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---------- 清单 ----------
+    def _watchlist_id(self, conn, name, owner, create=False):
+        row = conn.execute("SELECT id FROM watchlists WHERE owner = ? AND name = ?", (owner, name)).fetchone()
+        if row is not None:
+            return row[0]
+        if not create:
+            return None
+        return conn.execute("INSERT INTO watchlists(owner, name, created_at) VALUES(?, ?, ?)",
+                            (owner, name, _now())).lastrowid
+
+    def create_watchlist(self, name, owner=DEFAULT_OWNER):
+        with self._write() as conn:
+            return self._watchlist_id(conn, name, owner, create=True)
+
+    def delete_watchlist(self, name, owner=DEFAULT_OWNER):
+        with self._write() as conn:
+            return conn.execute("DELETE FROM watchlists WHERE owner = ? AND name = ?", (owner, name)).rowcount > 0
+
+    def list_watchlists(self, owner=DEFAULT_OWNER):
+        """某个用户的清单名称（按创建顺序）"""
+        rows = self._conn().execute("SELECT name FROM watchlists WHERE owner = ? ORDER BY id", (owner,)).fetchall()
+        return [row[0] for row in rows]
+
+    # ---------- 成员 ----------
+    def items(self, name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        """清单成员 [{"code", "name"}]，按加入顺序"""
+        rows = self._conn().execute(
+            "SELECT i.code, i.name FROM watchlist_items i JOIN watchlists w ON w.id = i.watchlist_id "
+            "WHERE w.owner = ? AND w.name = ? ORDER BY i.position", (owner, name)
+        ).fetchall()
+        return [{"code": code, "name": stock_name} for code, stock_name in rows]
+
+    def codes(self, name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        return [item["code"] for item in self.items(name, owner)]
+
+    def all_items(self):
+        """
+        全部清单的成员（按代码去重），供抓取脚本确定抓取范围
+        同一代码在多个清单中名称不同时，取最近加入的有效名称（空名称和"未知名称"排在最后）
+        """
+        rows = self._conn().execute(
+            "SELECT code, name FROM ("
+            "  SELECT code, name, MIN(added_at) OVER (PARTITION BY code) AS first_added,"
+            "         ROW_NUMBER() OVER (PARTITION BY code ORDER BY name IN ('', ?), added_at DESC) AS rank"
+            "  FROM watchlist_items"
+            ") WHERE rank = 1 ORDER BY first_added, code", (UNKNOWN_NAME,)
+        ).fetchall()
+        return [{"code": code, "name": stock_name} for code, stock_name in rows]
+
+    def contains(self, code, name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        row = self._conn().execute(
+            "SELECT 1 FROM watchlist_items i JOIN watchlists w ON w.id = i.watchlist_id "
+            "WHERE w.owner = ? AND w.name = ? AND i.code = ?", (owner, name, normalize_code(code))
+        ).fetchone()
+        return row is not None
+
+    def lists_containing(self, code):
+        """包含该代码的 (用户, 清单) 列表（走代码索引）"""
+        rows = self._conn().execute(
+            "SELECT w.owner, w.name FROM watchlist_items i JOIN watchlists w ON w.id = i.watchlist_id "
+            "WHERE i.code = ? ORDER BY w.id", (normalize_code(code),)
+        ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def add(self, code, stock_name="", name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        """加入一只股票，已存在时不变；返回是否新加入"""
+        code = normalize_code(code)
+        with self._write() as conn:
+            watchlist_id = self._watchlist_id(conn, name, owner, create=True)
+            return conn.execute(
+                "INSERT OR IGNORE INTO watchlist_items(watchlist_id, code, name, position, added_at) "
+                "SELECT ?, ?, ?, COALESCE(MAX(position), 0) + 1, ? FROM watchlist_items WHERE watchlist_id = ?",
+                (watchlist_id, code, str(stock_name).replace(" ", ""), _now(), watchlist_id)
+            ).rowcount > 0
+
+    def remove(self, code, name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        """移除一只股票；返回是否存在"""
+        with self._write() as conn:
+            watchlist_id = self._watchlist_id(conn, name, owner)
+            if watchlist_id is None:
+                return False
+            return conn.execute("DELETE FROM watchlist_items WHERE watchlist_id = ? AND code = ?",
+                                (watchlist_id, normalize_code(code))).rowcount > 0
+
+    def set_items(self, items, name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        """
+        把清单设为 items（[(代码, 名称)]，按给定顺序）：在一个事务内只删除多出的行、插入新增的行、更新顺序，
+        同一清单的并发编辑不会丢失对方已提交的其他清单的修改
+        """
+        items = list({normalize_code(code): str(stock_name or "").replace(" ", "") for code, stock_name in items}.items())
+        with self._write() as conn:
+            watchlist_id = self._watchlist_id(conn, name, owner, create=True)
+            existing = {row[0] for row in conn.execute(
+                "SELECT code FROM watchlist_items WHERE watchlist_id = ?", (watchlist_id,))}
+            keep = {code for code, _ in items}
+            conn.executemany("DELETE FROM watchlist_items WHERE watchlist_id = ? AND code = ?",
+                             [(watchlist_id, code) for code in existing - keep])
+            now = _now()
+            conn.executemany(
+                "INSERT INTO watchlist_items(watchlist_id, code, name, position, added_at) VALUES(?, ?, ?, ?, ?) "
+                "ON CONFLICT(watchlist_id, code) DO UPDATE SET position = excluded.position, "
+                "name = CASE WHEN excluded.name != '' THEN excluded.name ELSE watchlist_items.name END",
+                [(watchlist_id, code, stock_name, position, now) for position, (code, stock_name) in enumerate(items, 1)]
+            )
+        return len(items)
+
+    def apply_changes(self, add=(), remove=(), name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        """
+        在一个事务内增删：add 为 [(代码, 名称)]（追加到末尾，已存在的不变），remove 为代码列表
+        编辑会话只提交自己相对载入时的改动，其他会话同时加入/移除的股票不会被覆盖；返回改动后的代码列表
+        """
+        add = {normalize_code(code): str(stock_name or "").replace(" ", "") for code, stock_name in add}
+        remove = {normalize_code(code) for code in remove} - set(add)
+        with self._write() as conn:
+            watchlist_id = self._watchlist_id(conn, name, owner, create=True)
+            conn.executemany("DELETE FROM watchlist_items WHERE watchlist_id = ? AND code = ?",
+                             [(watchlist_id, code) for code in remove if code])
+            position = conn.execute("SELECT COALESCE(MAX(position), 0) FROM watchlist_items WHERE watchlist_id = ?",
+                                    (watchlist_id,)).fetchone()[0]
+            now = _now()
+            conn.executemany(
+                "INSERT OR IGNORE INTO watchlist_items(watchlist_id, code, name, position, added_at) VALUES(?, ?, ?, ?, ?)",
+                [(watchlist_id, code, stock_name, position + i, now)
+                 for i, (code, stock_name) in enumerate(((c, n) for c, n in add.items() if c), 1)]
+            )
+        return self.codes(name, owner)
+
+    def revision(self):
+        """写入计数：任何清单被修改后都会变化"""
+        row = self._conn().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    # ---------- 迁移 ----------
+    def migrate_json(self, json_path=LEGACY_JSON_FILE, name=DEFAULT_LIST, owner=DEFAULT_OWNER):
+        """把旧的JSON自选股文件导入为默认清单（只执行一次，JSON文件保留不动）；返回导入的数量"""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone() or not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            items = [(item["code"], item.get("name", "")) for item in data if "code" in item]
+        except Exception as e:
+            print(f"⚠️ 读取旧自选股文件失败：{e}")
+            return 0
+        with self._write() as conn:
+            # 并发打开时只有第一个拿到写锁的进程执行导入
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated_json'").fetchone():
+                return 0
+            watchlist_id = self._watchlist_id(conn, name, owner, create=True)
+            now = _now()
+            conn.executemany(
+                "INSERT OR IGNORE INTO watchlist_items(watchlist_id, code, name, position, added_at) VALUES(?, ?, ?, ?, ?)",
+                [(watchlist_id, normalize_code(code), str(stock_name).replace(" ", ""), position, now)
+                 for position, (code, stock_name) in enumerate(items, 1)]
+            )
+            conn.execute("INSERT INTO meta(key, value) VALUES('migrated_json', ?)", (now,))
+        print(f"📦 已把 {json_path} 中的 {len(items)} 支自选股导入 {self.path}")
+        return len(items)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_store(path=DB_FILE):
+    """进程内按路径共享一个存储对象（各线程仍使用各自的连接）"""
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = WatchlistStore(path)
+        return _stores[path]
+
+if __name__ == "__main__":
+    import argparse
+    from symbol_master import get_symbol_master
+    parser = argparse.ArgumentParser(description="自选股清单（SQLite）")
+    parser.add_argument("--list", default=DEFAULT_LIST, help="清单名称")
+    parser.add_argument("--user", default=DEFAULT_OWNER, help="用户")
+    parser.add_argument("--add", nargs="*", default=[], help="加入的代码")
+    parser.add_argument("--remove", nargs="*", default=[], help="移除的代码")
+    parser.add_argument("--find", help="查询包含该代码的清单")
+    args = parser.parse_args()
+
+    store = get_store()
+    for code in args.add:
+        added = store.add(code, get_symbol_master().name(code), name=args.list, owner=args.user)
+        print(f"➕ {normalize_code(code)}：{'已加入' if added else '已在清单中'}")
+    for code in args.remove:
+        print(f"➖ {normalize_code(code)}：{'已移除' if store.remove(code, name=args.list, owner=args.user) else '不在清单中'}")
+    if args.find:
+        print(f"🔎 {normalize_code(args.find)} 所在清单：{store.lists_containing(args.find)}")
+    print(f"📋 {args.user or '默认用户'} 的清单：{store.list_watchlists(args.user)}")
+    for item in store.items(args.list, args.user):
+        print(f"   {item['code']} {item['name']}")